@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Aligns the articles (or points) of two acts by the similarity of their text
+#
+# e.g. which articles of the GDPR succeed those of the Data Protection
+# Directive (dpd/dpd.ttl), which are otherwise paired by hand. The text of
+# each article (its title and the descriptions of its points and subpoints)
+# or of each point is taken from the RDF of an act, as written by
+# generate_rdf_pairings.py or batch_build.py, and turned into a TF-IDF
+# vector, with the vocabulary and document frequencies shared by all acts
+# being aligned. Vectors are rows of SciPy sparse matrices, normalised so
+# that their product is the cosine similarity, which is computed for a
+# batch of rows at a time, from which the top k of each row are taken with
+# NumPy, so that there is no loop over pairs in Python.
+#
+# Every pair of the acts given is aligned, and every match of at least the
+# threshold is written as a correspondence in the Alignment format
+#   <alignment#cell-(hash of both)> a align:Cell ;
+#       align:entity1 dpd:article6 ; align:entity2 gdpr:article5 ;
+#       align:measure 0.63 ; align:relation "=" .
+# and the best match of each item also as skos:closeMatch, which is what
+# can be browsed or queried without knowing the Alignment format.
+#
+# Needs NumPy and SciPy.
+
+##############################################################################
+import collections
+import hashlib
+import os
+import re
+
+import numpy as np
+from rdflib import Graph, Literal, Namespace, RDF, URIRef, XSD
+from rdflib.namespace import SKOS
+from rdflib.util import guess_format
+from scipy import sparse
+
+import generate_rdf_pairings as pairings
+
+ALIGN = Namespace(
+    'http://knowledgeweb.semanticweb.org/heterogeneity/alignment#')
+ALIGNMENT = 'https://w3id.org/GDPRtEXT/alignment'
+LEVELS = ('article', 'point')
+# words of at least three letters, in any script
+TOKEN = re.compile(r'[^\W\d_]{3,}')
+ARTICLE_ID = re.compile(r'article\d+')
+
+
+def local_id(iri):
+    '''minted id of iri, e.g. article17-3-b'''
+    return re.split('[#/]', str(iri))[-1]
+
+
+def documents(path, level='article'):
+    '''returns (iris, texts) of the articles or points in the RDF at path
+    the text of an article includes that of its points and subpoints, and
+    the text of a point that of its subpoints'''
+    g = Graph()
+    g.parse(path, format=guess_format(path) or 'nt')
+    texts = collections.OrderedDict()
+    for predicate in (pairings.TITLE, pairings.DESC):
+        for subject, object in sorted(g.subject_objects(predicate)):
+            id = local_id(subject)
+            if not ARTICLE_ID.match(id):
+                continue
+            if level == 'article':
+                key = ARTICLE_ID.match(id).group()
+            elif id.count('-') >= 1:
+                key = '-'.join(id.split('-')[:2])
+            else:
+                continue
+            iri = str(subject)[:-len(id)] + key
+            texts.setdefault(iri, []).append(str(object))
+    return list(texts), [' '.join(text) for text in texts.values()]
+
+
+def vectorize(corpora):
+    '''returns a TF-IDF matrix for each list of texts in corpora, with rows
+    of unit length, and columns for the vocabulary of all of them'''
+    vocabulary = {}
+    counts = []
+    for texts in corpora:
+        rows, columns = [], []
+        for row, text in enumerate(texts):
+            for token in TOKEN.findall(text.lower()):
+                rows.append(row)
+                columns.append(vocabulary.setdefault(token, len(vocabulary)))
+        counts.append((rows, columns, len(texts)))
+    matrices = []
+    for rows, columns, size in counts:
+        # duplicate entries are summed into term frequencies
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, columns)),
+            shape=(size, len(vocabulary)))
+        matrix.sum_duplicates()
+        matrices.append(matrix)
+    frequency = sum(
+        np.bincount(matrix.indices, minlength=len(vocabulary))
+        for matrix in matrices)
+    total = sum(matrix.shape[0] for matrix in matrices)
+    idf = np.log((1 + total) / (1 + frequency)) + 1
+    for matrix in matrices:
+        matrix.data = np.log1p(matrix.data) * idf[matrix.indices]
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)))
+        norms[norms == 0] = 1
+        matrix.data /= np.repeat(norms.ravel(), np.diff(matrix.indptr))
+    return matrices
+
+
+def top_k(left, right, k=3, threshold=0.2, batch=1024):
+    '''returns (rows, columns, scores) of the k most similar rows of right
+    for each row of left, with a cosine similarity of at least threshold'''
+    k = min(k, right.shape[0])
+    right_t = right.T.tocsc()
+    results = ([], [], [])
+    for start in range(0, left.shape[0], batch):
+        scores = (left[start:start + batch] @ right_t).toarray()
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        rows, ranks = np.nonzero(best_scores >= threshold)
+        results[0].append(rows + start)
+        results[1].append(best[rows, ranks])
+        results[2].append(best_scores[rows, ranks])
+    return tuple(np.concatenate(result) for result in results)
+
+
+def alignment_triples(left_iris, right_iris, matches, alignment=ALIGNMENT):
+    '''yields the triples of the matches (rows, columns, scores) between
+    left_iris and right_iris, which are sorted by row and score'''
+    previous = None
+    for row, column, score in zip(*matches):
+        left, right = URIRef(left_iris[row]), URIRef(right_iris[column])
+        cell = URIRef('{}#cell-{}'.format(alignment, hashlib.sha1(
+            '{} {}'.format(left, right).encode('utf-8')).hexdigest()[:16]))
+        yield cell, RDF.type, ALIGN.Cell
+        yield URIRef(alignment), ALIGN.map, cell
+        yield cell, ALIGN.entity1, left
+        yield cell, ALIGN.entity2, right
+        yield cell, ALIGN.measure, Literal(
+            '{:.4f}'.format(score), datatype=XSD.float)
+        yield cell, ALIGN.relation, Literal('=')
+        if row != previous:
+            yield left, SKOS.closeMatch, right
+            previous = row
+
+
+def align(paths, destination, level='article', k=3, threshold=0.2,
+          alignment=ALIGNMENT):
+    '''aligns every pair of the acts in paths, and writes the matches to
+    destination as N-Triples
+    returns [(left path, right path, number of matches)]'''
+    corpora = [documents(path, level) for path in paths]
+    matrices = vectorize([texts for _, texts in corpora])
+    report = []
+    temp_path = '{}.{}.tmp'.format(destination, os.getpid())
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as fd:
+            writer = pairings.NTriplesWriter(fd)
+            writer.add((URIRef(alignment), RDF.type, ALIGN.Alignment))
+            for i in range(len(paths)):
+                for j in range(i + 1, len(paths)):
+                    matches = top_k(matrices[i], matrices[j], k, threshold)
+                    for triple in alignment_triples(
+                            corpora[i][0], corpora[j][0], matches,
+                            alignment):
+                        writer.add(triple)
+                    report.append((paths[i], paths[j], len(matches[0])))
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(
+        description='aligns articles of acts by the similarity of text')
+    parser.add_argument(
+        'acts', nargs='*',
+        default=['../dpd/dpd.ttl', '../deliverables/gdpr.nt'],
+        help='RDF of each act (default: the DPD and the GDPR)')
+    parser.add_argument(
+        '--output', default='../deliverables/alignment.nt',
+        help='N-Triples to write the correspondences to')
+    parser.add_argument('--level', choices=LEVELS, default='article')
+    parser.add_argument(
+        '-k', type=int, default=3, help='matches to keep for each item')
+    parser.add_argument(
+        '--threshold', type=float, default=0.2,
+        help='lowest cosine similarity to keep')
+    parser.add_argument(
+        '--alignment', default=ALIGNMENT, help='IRI of the alignment')
+    args = parser.parse_args()
+    if len(args.acts) < 2:
+        parser.error('at least two acts are needed')
+
+    start = time.perf_counter()
+    for left, right, matches in align(
+            args.acts, args.output, args.level, args.k, args.threshold,
+            args.alignment):
+        print('{} -> {}: {} matches'.format(left, right, matches))
+    print('total {:.3f}s'.format(time.perf_counter() - start))
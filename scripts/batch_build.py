@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Builds several acts and languages of them in one job
+#
+# The manifest is a JSON list of entries such as
+#   {"act": "gdpr", "language": "de", "source": "gdpr_de.json",
+#    "base": "http://purl.org/adaptcentre/resources/GDPRtEXT/de#"}
+# where source is either a JSON file in the format of gdpr.json, or the
+# XHTML of the act from EUR-Lex, which is parsed into that JSON with
+# parse_gdpr.py (with the metadata of the entry, if any), which is then
+# generated with generate_rdf_pairings.py with its IRIs minted under base,
+# or an RDF file (e.g. dpd/dpd.ttl), which is taken as is. Paths are
+# relative to the manifest. Every entry is built in its own worker process
+# and written to <act>.<language>.nt, with its text (titles, descriptions)
+# as literals tagged with its language instead of xsd:string. The act itself
+# is described by the metadata of its JSON (title, dates, etc.) and of the
+# entry, rather than as the GDPR.
+#
+# All entries are then combined into dataset.nq, with one named graph per
+# entry (graph in the entry, or by default base/<language>, or base if it
+# already ends in the language), and the ontology from generate_owl.py in
+# its own named graph, which is generated only once for the whole dataset.
+
+##############################################################################
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from rdflib import Graph, Literal, RDF, URIRef, XSD
+from rdflib.util import guess_format
+
+import generate_rdf_pairings as pairings
+import instrumentation
+import parse_gdpr
+
+# properties whose values are text in the language of the act, rather than
+# generated by generate_rdf_pairings.py in English (e.g. 'Article 17')
+TEXT_PROPERTIES = {
+    pairings.TITLE, pairings.DESC,
+    pairings.DCTERMS.title, pairings.DCTERMS.abstract,
+    pairings.DCTERMS.description,
+}
+
+
+class LanguageTagger(object):
+    '''stand-in for graph that tags text with language before adding
+    triples to graph'''
+
+    def __init__(self, graph, language):
+        self.graph = graph
+        self.language = language
+
+    def __len__(self):
+        return len(self.graph)
+
+    def add(self, triple):
+        subject, predicate, object = triple
+        if predicate == pairings.DCTERMS.language:
+            object = Literal(self.language, datatype=XSD.language)
+        elif predicate in TEXT_PROPERTIES and isinstance(object, Literal) \
+                and object.datatype in (None, XSD.string):
+            object = Literal(str(object), lang=self.language)
+        self.graph.add((subject, predicate, object))
+
+    def flush(self):
+        self.graph.flush()
+
+
+def date(text):
+    '''xsd:date of a date in gdpr.json, e.g. 27/04/2016'''
+    day, month, year = text.split('/')
+    return Literal('{}-{}-{}'.format(year, month, day), datatype=XSD.date)
+
+
+def graph_act(gdpr_json, entry):
+    '''adds the act itself to pairings.graph, described by the metadata in
+    gdpr_json and in the entry (which takes precedence), rather than by
+    that of the GDPR in graph_gdpr()'''
+    metadata = dict(gdpr_json)
+    metadata.update(entry.get('metadata', {}))
+    graph, act = pairings.graph, pairings.gdpr
+    graph.add((act, RDF.type, pairings.ELI.LR))
+    graph.add((act, pairings.DCTERMS.language, Literal(
+        entry['language'], datatype=XSD.language)))
+    for key, predicate, datatype in (
+            ('title', pairings.DCTERMS.title, None),
+            ('about', pairings.DCTERMS.abstract, None),
+            ('abbrv', pairings.DCTERMS.title_alternative, XSD.string),
+            ('regulation', pairings.DCTERMS.identifier, XSD.string)):
+        if metadata.get(key):
+            graph.add((act, predicate, Literal(
+                metadata[key], datatype=datatype)))
+    for key, predicates in (
+            ('dated', (pairings.ELI.date_document, pairings.DCTERMS.date)),
+            ('updated', (
+                pairings.ELI.date_publication, pairings.DCTERMS.issued))):
+        if metadata.get(key):
+            for predicate in predicates:
+                graph.add((act, predicate, date(metadata[key])))
+
+
+def graph_name(entry):
+    '''IRI of the named graph for entry'''
+    if 'graph' in entry:
+        return entry['graph']
+    # the base may already be the language's, e.g. .../GDPRtEXT/de#
+    base = entry['base'].rstrip('#/')
+    if base.rsplit('/', 1)[-1] == entry['language']:
+        return base
+    return '{}/{}'.format(base, entry['language'])
+
+
+def build_entry(entry, destination):
+    '''builds entry to destination/<act>.<language>.nt
+    returns the path, number of triples, and time taken in seconds'''
+    start = time.perf_counter()
+    path = '{}/{}.{}.nt'.format(destination, entry['act'], entry['language'])
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as fd:
+            writer = pairings.NTriplesWriter(fd)
+            tagger = LanguageTagger(writer, entry['language'])
+            if entry['source'].endswith(('.json', '.html', '.xhtml')):
+                if entry['source'].endswith('.json'):
+                    gdpr_json = pairings.load_json(entry['source'])
+                else:
+                    gdpr_json = parse_gdpr.parse(
+                        entry['source'], entry.get('metadata', {}))
+                pairings.set_base(entry['base'])
+                pairings.graph = tagger
+                pairings.graph_all(
+                    gdpr_json, flush=tagger.flush,
+                    head=lambda: graph_act(gdpr_json, entry))
+            else:
+                g = Graph()
+                g.parse(entry['source'], format=guess_format(entry['source']))
+                for triple in g:
+                    tagger.add(triple)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return path, len(writer), time.perf_counter() - start
+
+
+def load_manifest(path):
+    '''loads the manifest at path, with paths relative to it resolved'''
+    with open(path) as fd:
+        entries = json.load(fd)
+    folder = os.path.dirname(os.path.abspath(path))
+    for entry in entries:
+        entry['source'] = os.path.join(folder, entry['source'])
+        if 'base' not in entry and 'graph' not in entry:
+            raise ValueError('{} {} needs a base or graph'.format(
+                entry['act'], entry['language']))
+    return entries
+
+
+def combine(built, destination):
+    '''writes the N-Triples of each (entry, path) in built, in the named
+    graph of the entry, and the ontology to destination as N-Quads'''
+    import generate_owl
+    temp_path = '{}.{}.tmp'.format(destination, os.getpid())
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as stream:
+            ontology = pairings.NTriplesWriter(
+                stream, context=generate_owl.GDPRtEXT_URI.rstrip('#'))
+            for triple in generate_owl.graph:
+                ontology.add(triple)
+            for entry, path in built:
+                suffix = ' {} .\n'.format(URIRef(graph_name(entry)).n3())
+                with open(path, encoding='utf-8') as fd:
+                    for line in fd:
+                        # N-Triples lines end in ' .\n'
+                        stream.write(line[:-3] + suffix)
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def build(manifest, destination, jobs=None):
+    '''builds every entry of the manifest at path manifest in destination,
+    with jobs processes, and combines them into dataset.nq
+    returns [(entry, path, triples, seconds)]'''
+    entries = load_manifest(manifest)
+    os.makedirs(destination, exist_ok=True)
+    with ProcessPoolExecutor(
+            max_workers=jobs, initializer=instrumentation.detach) as executor:
+        futures = [
+            executor.submit(build_entry, entry, destination)
+            for entry in entries]
+        results = [
+            (entry,) + future.result()
+            for entry, future in zip(entries, futures)]
+    combine(
+        [(entry, path) for entry, path, _, _ in results],
+        destination + '/dataset.nq')
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='builds every act and language in a manifest')
+    parser.add_argument(
+        '--manifest', default='batch_manifest.json',
+        help='JSON list of act, language, source, and base')
+    parser.add_argument(
+        '--output', default=pairings.DELIVERABLES + '/batch',
+        help='folder to write output to')
+    parser.add_argument(
+        '--jobs', type=int, default=None,
+        help='number of processes (default: all cores)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for entry, path, triples, seconds in build(
+            args.manifest, args.output, args.jobs):
+        print('{:<6} {:<3} {:>7} triples {:>8.3f}s  {}'.format(
+            entry['act'], entry['language'], triples, seconds, path))
+    print('total {:.3f}s'.format(time.perf_counter() - start))
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Benchmark suite for generating, serializing, and loading GDPRtEXT
+#
+# Measures, each with warmup runs and repetitions:
+#   load/json          loading gdpr.json
+#   build/<type>       adding each type of item (chapters, sections,
+#                      articles, points, subpoints, recitals, citations,
+#                      cites) to an empty graph, each on its own
+#   build/all          generating the whole graph
+#   serialize/<ext>    writing the whole graph in each format
+#   reload/<file>      parsing each shipped distribution with rdflib
+#   generate/owl       running generate_owl.py
+#   scale/<n>x         generating (and serializing) the GDPR replicated n
+#                      times under different base IRIs
+# In-process benchmarks report wall and CPU time, and the peak memory
+# allocated by Python (tracemalloc) in one extra run. Those that run in a
+# separate process (generate/owl, scale) report wall time and peak RSS.
+#
+# Results are printed and, with --output, written as JSON, which can then
+# be passed to --compare on a later run to see what got faster or slower.
+
+##############################################################################
+import argparse
+import copy
+import gc
+import hashlib
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from rdflib import Graph
+import rdflib
+from rdflib.util import guess_format
+
+import generate_rdf_pairings as pairings
+import peak_memory
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# shipped distributions, relative to the root of the repository
+SHIPPED = (
+    'gdpr.ttl', 'gdpr.rdf', 'gdpr.n3', 'gdpr.nt', 'gdpr.jsonld', 'gdpr.owl',
+    'dpd/dpd.ttl')
+
+
+def summary(times):
+    return {
+        'runs': times,
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def measure(run, setup=None, repeat=5, warmup=1, memory=True):
+    '''times run(setup()) repeat times after warmup runs; only run is timed
+    returns the summary of wall times, with CPU times and peak memory'''
+    walls, cpus = [], []
+    for i in range(warmup + repeat):
+        state = setup() if setup is not None else None
+        gc.collect()
+        start, start_cpu = time.perf_counter(), time.process_time()
+        run(state)
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - start_cpu
+        if i >= warmup:
+            walls.append(wall)
+            cpus.append(cpu)
+    result = summary(walls)
+    result['cpu_median'] = statistics.median(cpus)
+    if memory:
+        state = setup() if setup is not None else None
+        gc.collect()
+        tracemalloc.start()
+        run(state)
+        result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return result
+
+
+def run_process(args, cwd=None):
+    '''runs the script args[0] with the arguments args[1:]; returns wall
+    time in seconds, peak RSS in MB, and its output'''
+    return peak_memory.run(args, cwd, subprocess.PIPE)
+
+
+def measure_process(args, cwd=None, repeat=5, warmup=1):
+    '''runs args in a new process repeat times after warmup runs'''
+    results = [run_process(args, cwd) for _ in range(warmup + repeat)]
+    results = results[warmup:]
+    result = summary([wall for wall, _, _ in results])
+    result['rss_mb'] = max(rss for _, rss, _ in results)
+    return result, [output for _, _, output in results]
+
+
+def new_graph(_=None):
+    '''replaces pairings.graph with an empty graph, and returns it'''
+    pairings.graph = Graph()
+    return pairings.graph
+
+
+def numbered(gdpr_json):
+    '''copy of gdpr_json with unnumbered points and subpoints numbered, as
+    generating it does in place'''
+    gdpr_json = copy.deepcopy(gdpr_json)
+    graph_backup = pairings.graph
+    pairings.graph = pairings.NTriplesWriter(io.StringIO())
+    try:
+        pairings.graph_all(gdpr_json)
+    finally:
+        pairings.graph = graph_backup
+    return gdpr_json
+
+
+def calls(gdpr_json):
+    '''returns a dict of type -> [(function, args)] that adds each item of
+    that type, without its contents, to pairings.graph'''
+    GDPR = pairings.GDPR
+    gdpr_json = numbered(gdpr_json)
+    result = {
+        'chapters': [], 'sections': [], 'articles': [], 'points': [],
+        'subpoints': [], 'recitals': [], 'citations': [], 'cites': []}
+
+    def without(item, key):
+        item = dict(item)
+        item[key] = []
+        return item
+
+    for chapter in gdpr_json['chapters']:
+        result['chapters'].append((
+            pairings.graph_chapter_head, (chapter,)))
+        node_chapter = GDPR['chapter{}'.format(chapter['number'])]
+        contents = chapter['contents']
+        if contents[0]['type'] == 'section':
+            sections = contents
+        else:
+            sections = [None]
+        for section in sections:
+            if section is None:
+                node_section = None
+                articles = contents
+            else:
+                node_section = GDPR['chapter{}-{}'.format(
+                    chapter['number'], section['number'])]
+                articles = section['contents']
+                result['sections'].append((
+                    pairings.graph_section_head,
+                    (section, node_chapter, chapter['number'])))
+            for article in articles:
+                number = article['number']
+                node_article = GDPR['article{}'.format(number)]
+                result['articles'].append((
+                    pairings.graph_article,
+                    (without(article, 'contents'), node_section,
+                     node_chapter)))
+                for point in article['contents']:
+                    node_point = GDPR['article{}-{}'.format(
+                        number, point['number'])]
+                    result['points'].append((
+                        pairings.graph_point,
+                        (without(point, 'subpoints'), number, node_article,
+                         node_section, node_chapter)))
+                    for subpoint in point['subpoints']:
+                        result['subpoints'].append((
+                            pairings.graph_subpoint,
+                            (subpoint, number, point['number'], node_point,
+                             node_article, node_section, node_chapter)))
+    for recital in gdpr_json['recitals']:
+        result['recitals'].append((pairings.graph_recital, (recital,)))
+    for citation in gdpr_json['citations'].values():
+        result['citations'].append((pairings.graph_citation, (citation,)))
+    result['cites'].append((pairings.graph_cites, (gdpr_json,)))
+    return result
+
+
+def build_copies(gdpr_json, copies):
+    '''adds gdpr_json to pairings.graph copies times, each under its own
+    base IRI'''
+    previous = None
+    try:
+        for i in range(copies):
+            base = str(pairings.GDPR_URI)
+            if i:
+                base = '{}-copy{}#'.format(base.rstrip('#'), i)
+            base = pairings.set_base(base)
+            if previous is None:
+                previous = base
+            pairings.graph_all(copy.deepcopy(gdpr_json))
+    finally:
+        if previous is not None:
+            pairings.set_base(previous)
+
+
+def scale_child(json_path, copies, formats):
+    '''generates copies of the GDPR and serializes them in formats to a
+    temporary folder; prints the times taken as JSON'''
+    gdpr_json = pairings.load_json(json_path)
+    new_graph()
+    start = time.perf_counter()
+    build_copies(gdpr_json, copies)
+    result = {'triples': len(pairings.graph),
+              'build': time.perf_counter() - start}
+    with tempfile.TemporaryDirectory() as folder:
+        result['serialize'] = pairings.serialize(folder, formats, jobs=1)
+    print(json.dumps(result))
+
+
+def benchmarks(args):
+    '''yields (name, function returning the result) for every benchmark
+    selected by args'''
+    options = {'repeat': args.repeat, 'warmup': args.warmup}
+    yield 'load/json', lambda: measure(
+        lambda _: pairings.load_json(args.json), **options)
+
+    gdpr_json = pairings.load_json(args.json)
+    for kind, kind_calls in calls(gdpr_json).items():
+        def run(_, kind_calls=kind_calls):
+            for function, function_args in kind_calls:
+                function(*function_args)
+        yield 'build/' + kind, lambda run=run: measure(
+            run, new_graph, **options)
+    # generating numbers unnumbered items in place, so each run gets a copy
+    yield 'build/all', lambda: measure(
+        lambda gdpr_copy: pairings.graph_all(gdpr_copy),
+        lambda: (new_graph(), copy.deepcopy(gdpr_json))[1], **options)
+
+    for extension, format in pairings.FORMATS.items():
+        def serialize(format=format):
+            new_graph()
+            pairings.graph_all(copy.deepcopy(gdpr_json))
+            with tempfile.TemporaryDirectory() as folder:
+                return measure(
+                    lambda _: pairings.graph.serialize(
+                        destination=folder + '/gdpr', format=format),
+                    **options)
+        yield 'serialize/' + extension, serialize
+
+    for name in SHIPPED:
+        path = os.path.join(args.root, name)
+        yield 'reload/' + name, lambda path=path: measure(
+            lambda _: Graph().parse(path, format=guess_format(path)),
+            **options)
+
+    def generate_owl():
+        # generate_owl.py writes to ../deliverables from where it is run
+        with tempfile.TemporaryDirectory() as folder:
+            os.makedirs(os.path.join(folder, 'scripts'))
+            os.makedirs(os.path.join(folder, 'deliverables'))
+            result, _ = measure_process(
+                [os.path.join(HERE, 'generate_owl.py')],
+                cwd=os.path.join(folder, 'scripts'), **options)
+        return result
+    yield 'generate/owl', generate_owl
+
+    for copies in args.scale:
+        def scale(copies=copies):
+            result, outputs = measure_process(
+                [__file__, '--json', args.json,
+                 '--scale-formats', ','.join(args.scale_formats),
+                 '--child-scale', str(copies)],
+                **options)
+            outputs = [json.loads(output) for output in outputs]
+            result['triples'] = outputs[0]['triples']
+            result['build'] = summary([o['build'] for o in outputs])
+            result['serialize'] = {
+                extension: summary([o['serialize'][extension]
+                                    for o in outputs])
+                for extension in args.scale_formats}
+            return result
+        yield 'scale/{}x'.format(copies), scale
+
+
+def metadata(args):
+    with open(args.json, 'rb') as fd:
+        json_hash = hashlib.sha1(fd.read()).hexdigest()
+    return {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'rdflib': rdflib.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'json_sha1': json_hash,
+        'repeat': args.repeat,
+        'warmup': args.warmup,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='benchmarks generating, serializing, and loading '
+        'GDPRtEXT')
+    parser.add_argument(
+        '--json', default=pairings.GDPR_JSON, help='path to gdpr.json')
+    parser.add_argument(
+        '--root', default='..',
+        help='root of the repository, with the shipped distributions')
+    parser.add_argument(
+        '--repeat', type=int, default=5, help='number of timed runs')
+    parser.add_argument(
+        '--warmup', type=int, default=1, help='number of untimed runs')
+    parser.add_argument(
+        '--only', default=None,
+        help='only run benchmarks whose name matches this regex')
+    parser.add_argument(
+        '--scale', default='10',
+        help='comma separated numbers of copies of the GDPR to generate, '
+        'e.g. 10,100 (empty for none)')
+    parser.add_argument(
+        '--scale-formats', default='nt,ttl',
+        help='comma separated file extensions to write when scaling')
+    parser.add_argument(
+        '--output', default=None, help='file to write results to as JSON')
+    parser.add_argument(
+        '--compare', default=None,
+        help='results of an earlier run (from --output) to compare with')
+    parser.add_argument('--child-scale', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.scale = [int(n) for n in args.scale.split(',') if n]
+    args.scale_formats = args.scale_formats.split(',')
+    if args.child_scale is not None:
+        scale_child(args.json, args.child_scale, args.scale_formats)
+        sys.exit()
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as fd:
+            previous = json.load(fd)['results']
+    results = {}
+    print('{:<22} {:>10} {:>10} {:>10}{}'.format(
+        'benchmark', 'median (s)', 'min (s)', 'memory MB',
+        '   vs before' if previous else ''))
+    for name, function in benchmarks(args):
+        if args.only and not re.search(args.only, name):
+            continue
+        result = results[name] = function()
+        line = '{:<22} {:>10.4f} {:>10.4f} {:>10.1f}'.format(
+            name, result['median'], result['min'],
+            result.get('peak_mb', result.get('rss_mb', 0.0)))
+        if name in previous:
+            line += '   {:>+9.1%}'.format(
+                result['median'] / previous[name]['median'] - 1)
+        print(line, flush=True)
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump({'meta': metadata(args), 'results': results}, fd,
+                      indent=2)
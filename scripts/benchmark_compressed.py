@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Compares the size of the distributions with and without compression, and
+# the time to read the triples of a resource from the block compressed
+# gdpr.nt (see compressed.py) against reading them from the uncompressed
+# gdpr.nt, and from gdpr.nt compressed as a whole, which both have to be
+# read up to the end to find every triple of the resource.
+
+##############################################################################
+import argparse
+import gzip
+import os
+import random
+import statistics
+import time
+
+import compressed
+import generate_rdf_pairings as pairings
+
+
+def scan(fd, subject):
+    '''N-Triples lines of fd about subject'''
+    return [line for line in fd if line.startswith(subject)]
+
+
+def lookups(name, function, ids, repeat):
+    '''prints the median and maximum time of function(id) for ids'''
+    times = []
+    for _ in range(repeat):
+        for id in ids:
+            start = time.perf_counter()
+            function(id)
+            times.append(time.perf_counter() - start)
+    print('{:<14} {:>10.3f} {:>10.3f}'.format(
+        name, 1000 * statistics.median(times), 1000 * max(times)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='benchmarks compressed blocks against whole files')
+    parser.add_argument(
+        '--folder', default=pairings.DELIVERABLES,
+        help='folder with the gdpr.* files')
+    parser.add_argument(
+        '--lookups', type=int, default=50, help='number of ids to look up')
+    parser.add_argument(
+        '--repeat', type=int, default=3, help='number of runs of each')
+    args = parser.parse_args()
+    nt_path = args.folder + '/gdpr.nt'
+    compressed.write_all(nt_path, args.folder + '/gdpr.intervals.json')
+
+    print('{:<10} {:>10} {:>10} {:>10}'.format(
+        'file', 'bytes', 'gzip', 'zstd'))
+    totals = [0, 0, 0]
+    for extension in pairings.FORMATS:
+        path = '{}/gdpr.{}'.format(args.folder, extension)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'rb') as fd:
+            data = fd.read()
+        sizes = [len(data)] + [
+            len(codec[0](data)) if codec else 0
+            for codec in (
+                compressed.CODECS['gz'], compressed.CODECS.get('zst'))]
+        totals = [total + size for total, size in zip(totals, sizes)]
+        print('{:<10} {:>10} {:>10} {:>10}'.format(extension, *sizes))
+    print('{:<10} {:>10} {:>10} {:>10}'.format('total', *totals))
+    print('{:<10} {:>10} {:>10} {:>10}'.format(
+        'nt blocks', '', *(
+            os.path.getsize('{}.{}'.format(nt_path, extension))
+            if extension in compressed.CODECS else 0
+            for extension in ('gz', 'zst'))))
+
+    blocks = {
+        extension: compressed.Blocks('{}.{}'.format(nt_path, extension))
+        for extension in compressed.CODECS}
+    ids = random.Random(0).sample(
+        sorted(blocks['gz'].ids), min(args.lookups, len(blocks['gz'].ids)))
+    prefix = '<{}'.format(pairings.GDPR_URI)
+    with open(nt_path + '.whole.gz', 'wb') as fd:
+        with open(nt_path, 'rb') as source:
+            fd.write(gzip.compress(source.read()))
+
+    def plain(id):
+        with open(nt_path, encoding='utf-8') as fd:
+            return scan(fd, '{}{}> '.format(prefix, id))
+
+    def whole(id):
+        with gzip.open(nt_path + '.whole.gz', 'rt', encoding='utf-8') as fd:
+            return scan(fd, '{}{}> '.format(prefix, id))
+
+    print('{:<14} {:>10} {:>10}'.format('lookup', 'p50 (ms)', 'max (ms)'))
+    lookups('nt scan', plain, ids, args.repeat)
+    lookups('nt.gz whole', whole, ids, args.repeat)
+    for extension, reader in sorted(blocks.items()):
+        lookups('nt.{} block'.format(extension), reader.triples, ids,
+                args.repeat)
+        reader.close()
+    os.remove(nt_path + '.whole.gz')
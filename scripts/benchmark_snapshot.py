@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Compares the cold load time and peak memory (RSS) of the binary snapshot
+# (see snapshot.py) against parsing each of the textual distributions with
+# rdflib. Each load runs in a new process, so that it is measured from a
+# cold start including imports, and its peak RSS is measured in that
+# process (see peak_memory.py).
+
+##############################################################################
+import argparse
+import sys
+
+import peak_memory
+
+
+def child(kind, path, nt_path):
+    '''loads path in this process'''
+    if kind.startswith('snapshot'):
+        import snapshot
+        loaded = snapshot.open_snapshot(path, nt_path)
+        if loaded is None:
+            sys.exit('{} is missing or stale'.format(path))
+        if kind == 'snapshot-decode':
+            for _ in loaded.triples():
+                pass
+        loaded.close()
+    else:
+        from rdflib import Graph
+        from rdflib.util import guess_format
+        Graph().parse(path, format=guess_format(path))
+
+
+def run(kind, path, nt_path):
+    '''loads path as kind in a new process
+    returns wall time in seconds and peak RSS in MB'''
+    wall, rss, _ = peak_memory.run(
+        [__file__, '--child', kind, path, nt_path])
+    return wall, rss
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        child(*sys.argv[2:5])
+        sys.exit()
+
+    import generate_rdf_pairings as pairings
+    parser = argparse.ArgumentParser(
+        description='benchmarks loading the snapshot against rdflib')
+    parser.add_argument(
+        '--folder', default=pairings.DELIVERABLES,
+        help='folder with the gdpr.* files and gdpr.snapshot')
+    parser.add_argument(
+        '--repeat', type=int, default=3, help='number of loads of each')
+    args = parser.parse_args()
+    nt_path = args.folder + '/gdpr.nt'
+
+    loads = [
+        (extension, 'rdflib', '{}/gdpr.{}'.format(args.folder, extension))
+        for extension in pairings.FORMATS]
+    loads.append(
+        ('snapshot', 'snapshot', args.folder + '/gdpr.snapshot'))
+    loads.append(
+        ('snapshot+', 'snapshot-decode', args.folder + '/gdpr.snapshot'))
+    print('{:<10} {:>10} {:>10}'.format('file', 'time (s)', 'RSS (MB)'))
+    for name, kind, path in loads:
+        results = [run(kind, path, nt_path) for _ in range(args.repeat)]
+        print('{:<10} {:>10.3f} {:>10.1f}'.format(
+            name,
+            min(wall for wall, _ in results),
+            max(rss for _, rss in results)))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Compares the Graph based build of generate_rdf_pairings.py against its
+# streaming (--stream) mode in terms of wall time and peak memory (RSS).
+# Each run is a separate process so that the peak RSS of one does not
+# affect the other (see peak_memory.py). Both runs only write gdpr.nt, to
+# temporary folders, and the sorted N-Triples outputs are compared to check
+# they are identical.
+
+##############################################################################
+import argparse
+import os
+import subprocess
+import tempfile
+
+import peak_memory
+
+SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'generate_rdf_pairings.py')
+
+
+def run(args):
+    '''runs generate_rdf_pairings.py with args
+    returns wall time in seconds and peak RSS in MB'''
+    wall, rss, _ = peak_memory.run(
+        [SCRIPT] + args, stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL)
+    return wall, rss
+
+
+def sorted_lines(path):
+    with open(path, 'rb') as fd:
+        return sorted(fd)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='benchmarks Graph based build against streaming build')
+    parser.add_argument(
+        '--json', default='../deliverables/gdpr.json',
+        help='path to gdpr.json')
+    parser.add_argument(
+        '--repeat', type=int, default=3, help='number of runs of each mode')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as graph_dir, \
+            tempfile.TemporaryDirectory() as stream_dir:
+        # only gdpr.nt is written in both, so that the runs do the same work
+        common = ['--json', args.json, '--no-snapshot', '--no-index']
+        modes = (
+            ('graph', common + [
+                '--output', graph_dir, '--formats', 'nt', '--jobs', '1']),
+            ('stream', common + ['--output', stream_dir, '--stream']),
+        )
+        print('{:<8} {:>10} {:>10}'.format('mode', 'time (s)', 'RSS (MB)'))
+        for name, mode_args in modes:
+            results = [run(mode_args) for _ in range(args.repeat)]
+            print('{:<8} {:>10.3f} {:>10.1f}'.format(
+                name,
+                min(wall for wall, _ in results),
+                max(rss for _, rss in results)))
+        identical = sorted_lines(graph_dir + '/gdpr.nt') == \
+            sorted_lines(stream_dir + '/gdpr.nt')
+        print('sorted gdpr.nt identical:', identical)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Loads N-Triples into a SPARQL store (Fuseki, Oxigraph, etc.) in batches
+#
+# Rather than one large POST of gdpr.ttl, gdpr.nt is split into chunks of
+# a number of triples, which are uploaded concurrently over a pool of
+# keep-alive HTTP connections, either with the Graph Store Protocol
+# (POST ?graph=) or with SPARQL UPDATE (INSERT DATA), into a named graph.
+#
+# The graph is replaced: the first chunk is uploaded on its own with PUT
+# (or DROP and INSERT DATA in one update), and only then the rest; with no
+# triples, the graph is replaced with an empty one. A load that fails can
+# thus simply be run again. Chunks that fail with a server error (5xx, 429)
+# or a dropped connection are retried with exponential backoff and jitter,
+# which is safe as adding triples that are already there changes nothing.
+# Only a few chunks more than the number of connections are read ahead, so
+# memory does not grow with the file.
+#
+# With --stand-in, the load is made against an in-process stand-in of a
+# store (which fails some requests on purpose, to exercise the retries), and
+# the graph it ends up with is checked to have exactly the triples loaded.
+
+##############################################################################
+import http.client
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.parse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROTOCOLS = ('gsp', 'update')
+GRAPH = 'http://purl.org/adaptcentre/resources/GDPRtEXT'
+
+
+class RetryableError(Exception):
+    pass
+
+
+class ConnectionPool(object):
+    '''keep-alive connections to the host of url, shared by threads'''
+
+    def __init__(self, url, size, timeout=60):
+        parts = urllib.parse.urlsplit(url)
+        self.connection_class = http.client.HTTPSConnection \
+            if parts.scheme == 'https' else http.client.HTTPConnection
+        self.netloc = parts.netloc
+        self.timeout = timeout
+        self.idle = queue.LifoQueue(maxsize=size)
+
+    def request(self, method, path, body, headers):
+        '''returns (status, body) of a request over a pooled connection'''
+        try:
+            connection = self.idle.get_nowait()
+        except queue.Empty:
+            connection = self.connection_class(
+                self.netloc, timeout=self.timeout)
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            try:
+                self.idle.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+        return response.status, data
+
+    def close(self):
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+
+
+def chunks(nt_path, size):
+    '''yields lists of up to size lines of the N-Triples at nt_path'''
+    chunk = []
+    with open(nt_path, encoding='utf-8') as fd:
+        for line in fd:
+            if line.strip():
+                chunk.append(line)
+                if len(chunk) == size:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+
+class Loader(object):
+    '''uploads chunks of N-Triples into graph at endpoint'''
+
+    def __init__(self, endpoint, graph=GRAPH, protocol='gsp',
+                 connections=4, retries=5, backoff=0.2):
+        self.endpoint = endpoint
+        self.graph = graph
+        self.protocol = protocol
+        self.connections = connections
+        self.retries = retries
+        self.backoff = backoff
+        self.pool = ConnectionPool(endpoint, connections)
+        parts = urllib.parse.urlsplit(endpoint)
+        self.path = parts.path or '/'
+        self.query = parts.query
+        self.lock = threading.Lock()
+        self.retried = 0
+        self.latencies = []
+
+    def request(self, lines, replace):
+        '''(method, path, body, headers) uploading lines'''
+        data = ''.join(lines)
+        if self.protocol == 'gsp':
+            query = urllib.parse.urlencode({'graph': self.graph})
+            if self.query:
+                query = self.query + '&' + query
+            return (
+                'PUT' if replace else 'POST',
+                '{}?{}'.format(self.path, query), data.encode('utf-8'),
+                {'Content-Type': 'application/n-triples'})
+        update = 'INSERT DATA {{ GRAPH <{}> {{\n{}}} }}'.format(
+            self.graph, data)
+        if replace:
+            update = 'DROP SILENT GRAPH <{}> ;\n{}'.format(self.graph, update)
+        path = self.path if not self.query else \
+            '{}?{}'.format(self.path, self.query)
+        return (
+            'POST', path, update.encode('utf-8'),
+            {'Content-Type': 'application/sparql-update'})
+
+    def upload(self, lines, replace=False):
+        '''uploads lines, retrying with backoff
+        returns the number of triples uploaded'''
+        method, path, body, headers = self.request(lines, replace)
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                status, data = self.pool.request(method, path, body, headers)
+                if status == 429 or status >= 500:
+                    raise RetryableError('{} {}'.format(status, data[:200]))
+                if status >= 300:
+                    raise RuntimeError('{} {} failed with {}: {}'.format(
+                        method, path, status, data[:200]))
+                with self.lock:
+                    self.latencies.append(time.perf_counter() - start)
+                return len(lines)
+            except (OSError, http.client.HTTPException, RetryableError):
+                if attempt == self.retries:
+                    raise
+                with self.lock:
+                    self.retried += 1
+                time.sleep(self.backoff * 2 ** attempt * random.uniform(1, 2))
+
+    def load(self, nt_path, size=5000):
+        '''replaces the graph with the N-Triples at nt_path, uploaded in
+        chunks of size triples
+        returns a dict of what was uploaded and how fast'''
+        start = time.perf_counter()
+        triples = chunk_count = 0
+        sent = os.path.getsize(nt_path)
+        with ThreadPoolExecutor(max_workers=self.connections) as executor:
+            pending = set()
+            for index, chunk in enumerate(chunks(nt_path, size)):
+                if index == 0:
+                    # replaces the graph before anything is added to it
+                    triples += self.upload(chunk, replace=True)
+                else:
+                    pending.add(executor.submit(self.upload, chunk))
+                chunk_count += 1
+                if len(pending) >= 2 * self.connections:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    triples += sum(future.result() for future in done)
+            triples += sum(future.result() for future in pending)
+        if chunk_count == 0:
+            # no triples, the graph is still replaced (with an empty one)
+            self.upload([], replace=True)
+            chunk_count = 1
+        self.pool.close()
+        seconds = time.perf_counter() - start
+        latencies = sorted(self.latencies)
+        return {
+            'triples': triples,
+            'chunks': chunk_count,
+            'retried': self.retried,
+            'seconds': seconds,
+            'triples_per_second': triples / seconds,
+            'megabytes_per_second': sent / 2 ** 20 / seconds,
+            'p50': latencies[len(latencies) // 2] if latencies else None,
+            'max': latencies[-1] if latencies else None,
+        }
+
+
+class StandIn(ThreadingHTTPServer):
+    '''in-process stand-in for a SPARQL store, supporting the Graph Store
+    Protocol with N-Triples at /store, and the updates Loader sends at
+    /update, which fails fail_rate of the requests with 503'''
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), fail_rate=0.1, seed=0):
+        super().__init__(address, StandInHandler)
+        self.graphs = {}
+        self.lock = threading.Lock()
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self, method):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        parts = urllib.parse.urlsplit(self.path)
+        with server.lock:
+            server.requests += 1
+            if method != 'GET' and server.random.random() < server.fail_rate:
+                return self.reply(503, b'try again')
+            if parts.path == '/update':
+                return self.update(body.decode('utf-8'))
+            graph = urllib.parse.parse_qs(parts.query).get('graph', [''])[0]
+            if method == 'GET':
+                return self.reply(200, ''.join(sorted(
+                    server.graphs.get(graph, ()))).encode('utf-8'))
+            if method in ('PUT', 'DELETE'):
+                server.graphs.pop(graph, None)
+            if method in ('PUT', 'POST'):
+                server.graphs.setdefault(graph, set()).update(
+                    body.decode('utf-8').splitlines(True))
+            self.reply(204 if method != 'PUT' else 201)
+
+    def update(self, text):
+        graphs = self.server.graphs
+        for graph in re.findall(r'DROP SILENT GRAPH <([^>]*)>', text):
+            graphs.pop(graph, None)
+        match = re.search(
+            r'INSERT DATA \{ GRAPH <([^>]*)> \{\n(.*)\} \}', text, re.S)
+        if match is not None:
+            graphs.setdefault(match.group(1), set()).update(
+                match.group(2).splitlines(True))
+        self.reply(204)
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(
+        description='loads N-Triples into a SPARQL store in batches')
+    parser.add_argument(
+        '--nt', default='../deliverables/gdpr.nt', help='N-Triples to load')
+    parser.add_argument(
+        '--endpoint', default='http://localhost:3030/gdpr/data',
+        help='Graph Store Protocol endpoint, or SPARQL UPDATE endpoint with '
+        '--protocol update')
+    parser.add_argument('--protocol', choices=PROTOCOLS, default='gsp')
+    parser.add_argument(
+        '--graph', default=GRAPH, help='named graph to replace')
+    parser.add_argument(
+        '--batch', type=int, default=5000, help='triples per request')
+    parser.add_argument(
+        '--connections', type=int, default=4,
+        help='number of concurrent connections')
+    parser.add_argument(
+        '--retries', type=int, default=5,
+        help='times to retry a failed request')
+    parser.add_argument(
+        '--stand-in', action='store_true',
+        help='load into an in-process stand-in store, and check it')
+    args = parser.parse_args()
+
+    endpoint = args.endpoint
+    stand_in = None
+    if args.stand_in:
+        stand_in = StandIn().start()
+        endpoint = stand_in.url + (
+            '/store' if args.protocol == 'gsp' else '/update')
+        # what was there before is replaced
+        stand_in.graphs[args.graph] = {'<a:stale> <a:stale> <a:stale> .\n'}
+    loader = Loader(
+        endpoint, args.graph, args.protocol, args.connections, args.retries)
+    report = loader.load(args.nt, args.batch)
+    print('{triples} triples in {chunks} chunks, {retried} retried'.format(
+        **report))
+    print('{:.3f}s, {:.0f} triples/s, {:.2f} MB/s'.format(
+        report['seconds'], report['triples_per_second'],
+        report['megabytes_per_second']))
+    if report['p50'] is not None:
+        print('request p50 {:.1f} ms, max {:.1f} ms'.format(
+            1000 * report['p50'], 1000 * report['max']))
+    if stand_in is not None:
+        with open(args.nt, encoding='utf-8') as fd:
+            expected = {line for line in fd if line.strip()}
+        loaded = stand_in.graphs.get(args.graph, set())
+        stand_in.shutdown()
+        print('stand-in has {} triples after {} requests: {}'.format(
+            len(loaded), stand_in.requests,
+            'as expected' if loaded == expected else 'DIFFERENT'))
+        if loaded != expected:
+            sys.exit(1)
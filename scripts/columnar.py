@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Columnar form of the RDF for GDPR text, for counts and joins over triples
+#
+# The triples of gdpr.nt are dictionary encoded: every distinct term, in its
+# N-Triples form, is given an id in a term dictionary (sorted, as in
+# snapshot.py), and the triples become three integer columns, subject,
+# predicate, and object, sorted by subject. These are written to a folder
+#   as NumPy arrays: terms.txt (one term per line), s.npy, p.npy, o.npy
+#   or as Parquet (if pyarrow is installed): terms.parquet, triples.parquet
+# which can be read by NumPy, pandas, DuckDB, Spark, etc. without an RDF
+# library.
+#
+# Columns is a small query helper over them: terms are looked up once, and
+# filtering by subject, predicate, or object, and counting grouped by a
+# column, are done on the whole arrays by NumPy, e.g. points per article
+#   columns = Columns.load('../deliverables/gdpr.columns')
+#   columns.count('s', p=GDPRtEXT + 'hasPoint')
+# or the edges of the graph of recitals citing the footnotes
+#   columns.pairs(ELI + 'cites', s_prefix=GDPR + 'recital')
+
+##############################################################################
+import bisect
+import os
+import shutil
+
+import numpy as np
+
+import snapshot
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMATS = ('npy', 'parquet')
+COLUMNS = ('s', 'p', 'o')
+
+
+def nt_term(term):
+    '''term in N-Triples form, where IRIs may be given without <>'''
+    if term.startswith(('<', '"', '_:')):
+        return term
+    return '<{}>'.format(term)
+
+
+def encode(nt_path):
+    '''returns (terms, triples) of the N-Triples at nt_path, where terms
+    are sorted and triples is an array of (s, p, o) ids sorted by subject'''
+    triples = set()
+    with open(nt_path, encoding='utf-8') as fd:
+        for line in fd:
+            if line.strip():
+                triples.add(snapshot.parse_nt_line(line))
+    terms = sorted({term for triple in triples for term in triple})
+    ids = {term: i for i, term in enumerate(terms)}
+    encoded = np.array(
+        [[ids[s], ids[p], ids[o]] for s, p, o in triples],
+        dtype=np.uint32).reshape(-1, 3)
+    encoded = encoded[np.lexsort(encoded.T[::-1])]
+    return terms, encoded
+
+
+def write(nt_path, folder, format=None):
+    '''writes the columnar form of the N-Triples at nt_path to folder, as
+    Parquet if format is None and pyarrow is installed
+    returns the format written'''
+    if format is None:
+        format = 'parquet' if pyarrow is not None else 'npy'
+    terms, triples = encode(nt_path)
+    temp_folder = '{}.{}.tmp'.format(folder.rstrip('/'), os.getpid())
+    os.makedirs(temp_folder)
+    try:
+        if format == 'parquet':
+            pyarrow.parquet.write_table(
+                pyarrow.table({'term': terms}),
+                os.path.join(temp_folder, 'terms.parquet'))
+            pyarrow.parquet.write_table(
+                pyarrow.table({
+                    name: triples[:, i] for i, name in enumerate(COLUMNS)}),
+                os.path.join(temp_folder, 'triples.parquet'))
+        else:
+            with open(os.path.join(temp_folder, 'terms.txt'), 'w',
+                      encoding='utf-8') as fd:
+                # N-Triples terms cannot contain newlines
+                fd.writelines(term + '\n' for term in terms)
+            for i, name in enumerate(COLUMNS):
+                np.save(
+                    os.path.join(temp_folder, name + '.npy'),
+                    np.ascontiguousarray(triples[:, i]))
+        if os.path.exists(folder):
+            shutil.rmtree(folder)
+        os.replace(temp_folder, folder)
+    except BaseException:
+        shutil.rmtree(temp_folder, ignore_errors=True)
+        raise
+    return format
+
+
+class Columns(object):
+    '''term dictionary and subject, predicate, and object columns'''
+
+    def __init__(self, terms, s, p, o):
+        self.terms = terms
+        self.s, self.p, self.o = s, p, o
+
+    @classmethod
+    def load(cls, folder):
+        '''loads the columnar form written to folder, in either format'''
+        if os.path.exists(os.path.join(folder, 'triples.parquet')):
+            terms = pyarrow.parquet.read_table(
+                os.path.join(folder, 'terms.parquet'))
+            triples = pyarrow.parquet.read_table(
+                os.path.join(folder, 'triples.parquet'))
+            return cls(
+                terms.column('term').to_pylist(),
+                *(triples.column(name).to_numpy() for name in COLUMNS))
+        with open(os.path.join(folder, 'terms.txt'), encoding='utf-8') as fd:
+            terms = fd.read().splitlines()
+        return cls(terms, *(
+            np.load(os.path.join(folder, name + '.npy'), mmap_mode='r')
+            for name in COLUMNS))
+
+    def __len__(self):
+        return len(self.s)
+
+    def id(self, term):
+        '''id of term (in N-Triples form, or an IRI), or -1 if it is not
+        present, which matches nothing'''
+        term = nt_term(term)
+        i = bisect.bisect_left(self.terms, term)
+        if i < len(self.terms) and self.terms[i] == term:
+            return i
+        return -1
+
+    def prefixed(self, prefix):
+        '''(first, last) ids of IRIs starting with prefix, which are
+        contiguous as terms are sorted'''
+        prefix = '<' + prefix
+        return (
+            bisect.bisect_left(self.terms, prefix),
+            bisect.bisect_left(self.terms, prefix + '\U0010ffff'))
+
+    def mask(self, s=None, p=None, o=None, s_prefix=None, o_prefix=None):
+        '''boolean array of the triples matching the given terms, and
+        whose subject or object IRIs start with the given prefixes'''
+        mask = np.ones(len(self), dtype=bool)
+        for column, term in ((self.s, s), (self.p, p), (self.o, o)):
+            if term is not None:
+                mask &= column == self.id(term)
+        for column, prefix in ((self.s, s_prefix), (self.o, o_prefix)):
+            if prefix is not None:
+                first, last = self.prefixed(prefix)
+                mask &= (column >= first) & (column < last)
+        return mask
+
+    def pairs(self, p, **where):
+        '''(subject ids, object ids) of the triples with predicate p'''
+        mask = self.mask(p=p, **where)
+        return self.s[mask], self.o[mask]
+
+    def count(self, by='s', **where):
+        '''[(term, number of triples)] of the triples matching where,
+        grouped by the column by, the most frequent first'''
+        column = getattr(self, by)[self.mask(**where)]
+        ids, counts = np.unique(column, return_counts=True)
+        order = np.argsort(-counts, kind='stable')
+        return [
+            (self.terms[ids[i]], int(counts[i])) for i in order]
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(
+        description='writes or queries the columnar form of gdpr.nt')
+    parser.add_argument(
+        '--nt', default='../deliverables/gdpr.nt', help='path to gdpr.nt')
+    parser.add_argument(
+        '--columns', default='../deliverables/gdpr.columns',
+        help='folder of the columnar form')
+    parser.add_argument(
+        '--format', choices=FORMATS, default=None,
+        help='format to write (default: parquet if pyarrow is installed)')
+    parser.add_argument(
+        '--write', action='store_true',
+        help='write the columnar form even if it exists')
+    parser.add_argument(
+        '--count-by', choices=COLUMNS, default=None,
+        help='count the triples matching the filters by this column')
+    for name in COLUMNS:
+        parser.add_argument(
+            '-' + name, default=None, help='filter by this term or IRI')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.write or not os.path.exists(args.columns):
+        print('wrote', write(args.nt, args.columns, args.format))
+    start = time.perf_counter()
+    columns = Columns.load(args.columns)
+    print('{} terms, {} triples, loaded in {:.1f}ms'.format(
+        len(columns.terms), len(columns),
+        (time.perf_counter() - start) * 1000))
+    if args.count_by:
+        start = time.perf_counter()
+        counts = columns.count(
+            args.count_by, s=args.s, p=args.p, o=args.o)
+        for term, count in counts[:args.top]:
+            print('{:>6} {}'.format(count, term))
+        print('{} groups in {:.1f}ms'.format(
+            len(counts), (time.perf_counter() - start) * 1000))
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Compressed distributions of gdpr.nt with random access by resource id
+#
+# gdpr.nt is written compressed as gdpr.nt.gz, and as gdpr.nt.zst if the
+# zstandard package is installed, in blocks that can each be decompressed
+# on their own: every block is a gzip member or a zstd frame, and as both
+# formats allow members (frames) to follow one another, the files are still
+# read as a whole by zcat, zstdcat, rdflib, etc.
+#
+# The triples are grouped by subject, and the subjects are put in the order
+# of the interval index (see nested_sets.py), i.e. in document order with
+# every item before its contents, so that the triples of an item and of
+# everything inside it are contiguous. Subjects are packed into blocks of
+# about BLOCK_SIZE bytes (before compression), and a subject is never split
+# over two blocks. The sidecar index, gdpr.nt.gz.json (or .zst.json), has
+#   blocks: [offset, length, uncompressed length] of each block
+#   ids: id -> [block, offset, length] of its triples within the block
+# so that the triples of article17 are read by decompressing one block, and
+# those of chapterIII and its contents by decompressing a range of blocks.
+#
+# Usage:
+#   blocks = Blocks('../deliverables/gdpr.nt.gz')
+#   blocks.triples('article17')
+#   blocks.subtree('chapterIII', index)
+
+##############################################################################
+import gzip
+import json
+import os
+
+import generate_rdf_pairings as pairings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BLOCK_SIZE = 64 * 1024
+# extension -> (compress, decompress)
+CODECS = {
+    'gz': (
+        lambda data: gzip.compress(data, compresslevel=9, mtime=0),
+        gzip.decompress),
+}
+if zstandard is not None:
+    CODECS['zst'] = (
+        lambda data: zstandard.ZstdCompressor(level=19).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data))
+
+
+def subjects(nt_path, order=()):
+    '''returns [(id, lines)] of the N-Triples at nt_path grouped by subject
+    where ids in order come first in that order, followed by the rest
+    sorted; subjects outside the namespace of the resources have their
+    N-Triples term as id'''
+    prefix = '<{}'.format(pairings.GDPR_URI)
+    lines = {}
+    with open(nt_path, encoding='utf-8') as fd:
+        for line in fd:
+            if not line.strip():
+                continue
+            subject = line.split(' ', 1)[0]
+            if subject.startswith(prefix):
+                subject = subject[len(prefix):-1]
+            lines.setdefault(subject, []).append(line)
+    # a few ids are minted twice in the text (e.g. article4-1), and their
+    # triples are kept where the id is first
+    ordered, seen = [], set()
+    for id in order:
+        if id in lines and id not in seen:
+            ordered.append(id)
+            seen.add(id)
+    ordered.extend(sorted(id for id in lines if id not in seen))
+    return [(id, lines[id]) for id in ordered]
+
+
+def pack(grouped, block_size=BLOCK_SIZE):
+    '''yields (block, {id: (offset, length)}) packing the grouped lines of
+    subjects into blocks of about block_size bytes'''
+    block, ids = bytearray(), {}
+    for id, lines in grouped:
+        data = ''.join(lines).encode('utf-8')
+        if block and len(block) + len(data) > block_size:
+            yield bytes(block), ids
+            block, ids = bytearray(), {}
+        ids[id] = (len(block), len(data))
+        block += data
+    if block:
+        yield bytes(block), ids
+
+
+def write(nt_path, destination, extension='gz', order=(),
+          block_size=BLOCK_SIZE):
+    '''writes the N-Triples at nt_path compressed with the codec of
+    extension in blocks to destination, and the index of the blocks to
+    destination.json
+    returns the number of blocks'''
+    compress = CODECS[extension][0]
+    index = {'format': extension, 'blocks': [], 'ids': {}}
+    temp_path = '{}.{}.tmp'.format(destination, os.getpid())
+    temp_index = '{}.json.{}.tmp'.format(destination, os.getpid())
+    try:
+        with open(temp_path, 'wb') as fd:
+            offset = 0
+            for number, (raw, ids) in enumerate(
+                    pack(subjects(nt_path, order), block_size)):
+                data = compress(raw)
+                fd.write(data)
+                index['blocks'].append([offset, len(data), len(raw)])
+                offset += len(data)
+                for id, (start, length) in ids.items():
+                    index['ids'][id] = [number, start, length]
+        with open(temp_index, 'w') as fd:
+            json.dump(index, fd, separators=(',', ':'))
+        os.replace(temp_path, destination)
+        os.replace(temp_index, destination + '.json')
+    except BaseException:
+        for path in (temp_path, temp_index):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return len(index['blocks'])
+
+
+def write_all(nt_path, intervals_path=None, extensions=None,
+              block_size=BLOCK_SIZE):
+    '''writes nt_path.gz and, if available, nt_path.zst, ordered by the
+    interval index at intervals_path, if any
+    returns {path: number of blocks}'''
+    order = ()
+    if intervals_path is not None and os.path.exists(intervals_path):
+        with open(intervals_path) as fd:
+            order = json.load(fd)['ids']
+    return {
+        '{}.{}'.format(nt_path, extension): write(
+            nt_path, '{}.{}'.format(nt_path, extension), extension, order,
+            block_size)
+        for extension in (extensions or CODECS)}
+
+
+class Blocks(object):
+    '''reads the triples of resources from a file written by write()'''
+
+    def __init__(self, path):
+        with open(path + '.json') as fd:
+            index = json.load(fd)
+        self.blocks = index['blocks']
+        self.ids = index['ids']
+        self.decompress = CODECS[index['format']][1]
+        self.fd = open(path, 'rb')
+
+    def __contains__(self, id):
+        return id in self.ids
+
+    def close(self):
+        self.fd.close()
+
+    def read(self, first, last):
+        '''uncompressed bytes of blocks first to last (inclusive)'''
+        start = self.blocks[first][0]
+        end = self.blocks[last][0] + self.blocks[last][1]
+        self.fd.seek(start)
+        data = self.fd.read(end - start)
+        return b''.join(
+            self.decompress(data[offset - start:offset - start + length])
+            for offset, length, _ in self.blocks[first:last + 1])
+
+    def triples(self, id):
+        '''N-Triples (as text) about the resource id, or None'''
+        if id not in self.ids:
+            return None
+        block, offset, length = self.ids[id]
+        return self.read(block, block)[offset:offset + length].decode(
+            'utf-8')
+
+    def subtree(self, id, index):
+        '''N-Triples (as text) about the resource id and everything inside
+        it, using the IntervalIndex index the file was ordered by'''
+        present = [
+            i for i in [id] + index.descendants(id) if i in self.ids]
+        if not present:
+            return None
+        first, start, _ = self.ids[present[0]]
+        last, offset, length = self.ids[present[-1]]
+        data = self.read(first, last)
+        end = sum(self.blocks[b][2] for b in range(first, last)) + \
+            offset + length
+        return data[start:end].decode('utf-8')
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    import nested_sets
+    parser = argparse.ArgumentParser(
+        description='writes or reads compressed blocks of gdpr.nt')
+    parser.add_argument(
+        '--nt', default='../deliverables/gdpr.nt', help='path to gdpr.nt')
+    parser.add_argument(
+        '--intervals', default='../deliverables/gdpr.intervals.json',
+        help='interval index to order the resources by')
+    parser.add_argument(
+        '--format', choices=sorted(CODECS), default='gz',
+        help='compressed file to read')
+    parser.add_argument(
+        '--block-size', type=int, default=BLOCK_SIZE,
+        help='bytes of N-Triples in each block before compression')
+    parser.add_argument(
+        '--write', action='store_true',
+        help='write the compressed files even if they exist')
+    parser.add_argument(
+        '--subtree', action='store_true',
+        help='print the triples of everything inside the ids as well')
+    parser.add_argument('ids', nargs='*', help='ids to print the triples of')
+    args = parser.parse_args()
+
+    path = '{}.{}'.format(args.nt, args.format)
+    if args.write or not os.path.exists(path + '.json'):
+        for written, count in write_all(
+                args.nt, args.intervals, block_size=args.block_size).items():
+            print('{}: {} blocks, {} bytes'.format(
+                written, count, os.path.getsize(written)))
+    blocks = Blocks(path)
+    for id in args.ids:
+        start = time.perf_counter()
+        if args.subtree:
+            text = blocks.subtree(
+                id, nested_sets.IntervalIndex.load(args.intervals))
+        else:
+            text = blocks.triples(id)
+        if text is None:
+            print('{}: not found'.format(id))
+            continue
+        print(text, end='')
+        print('# {} triples in {:.2f}ms'.format(
+            text.count('\n'), (time.perf_counter() - start) * 1000))
+    blocks.close()
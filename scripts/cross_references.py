@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Extracts citations and cross-references from the GDPR text
+#
+# Two kinds of references are found:
+#   - footnotes, such as 'Directive 95/46/EC ... (4)', which cite the
+#     citation with that number. Footnotes are numbered in the order they
+#     appear in the text (recitals first, then articles), so only the next
+#     expected number is taken to be a footnote; this keeps references such
+#     as 'Article 22(1) and (4)' from being mistaken for one.
+#   - references to other parts of the text, such as 'Article 6(1)(a)',
+#     'Articles 15 to 22', 'point (b) of paragraph 2', 'paragraph 3 of
+#     Article 42', or 'Chapter VIII'. Paragraphs and points without an
+#     article are relative to the article the text is in.
+# All patterns are alternatives of one compiled regular expression, so each
+# text is scanned once, and the time taken is linear in the size of the
+# text. References to other acts ('Article 8 of the Charter', 'Article 16
+# TFEU') are skipped, and a reference is resolved to the most specific item
+# that exists, e.g. 'Article 6(1)' to article6-1 or, failing that, article6.
+#
+# Footnotes are emitted as eli:cites, and the others as eli:refers_to.
+# CASES are examples of both kinds of references, checked with
+#   python3 cross_references.py --check [gdpr.json]
+
+##############################################################################
+import re
+
+import gdpr_text
+
+# separators between items in a list, e.g. 'Articles 15, 16 and 17'
+SEP = r'(?:,\ |,\ and\ |\ and\ |,\ or\ |\ or\ |\ to\ )'
+# an article with its paragraphs and points, e.g. '6(1)(a)', or only a
+# paragraph of the previous article, e.g. '(4)', or a point of the previous
+# paragraph, e.g. '(f)' in '6(1)(a) and (f)'
+ARTICLE = r'(?:\d+|\(\w{1,4}\))(?:\(\w{1,4}\))*'
+# text after a reference which means it is to another act, possibly after
+# more articles, as in 'Article 25(6) or Article 26(4) of Directive ...'
+EXTERNAL = re.compile(
+    '(?:' + SEP + r'Articles?\ (?>' + ARTICLE + '))*' +
+    r'(?:\ of\ (?:Directive|Regulation|Decision|Council|Commission|the|'
+    r'that|Protocol)\b|\ T[FE]?EU\b|\ thereof\b)')
+# numbers and lists are atomic groups (Python 3.11+), so that the match
+# is always the whole reference, which is then skipped if EXTERNAL follows
+# it; otherwise 'Article 16 TFEU' could match as 'Article 1'
+REFERENCE = re.compile(r'''
+    points?\ (?P<points>(?>\(\w{1,4}\)(?:''' + SEP + r'''\(\w{1,4}\))*))
+        (?:\ of\ (?:the\ \w+\ subparagraph\ of\ )?
+         (?:paragraph\ (?P<point_paragraph>\d++)
+          |Article\ (?P<point_article>(?>\d+(?:\(\d+\))?))))?
+    |paragraphs?\ (?P<paragraphs>(?>\d+(?:''' + SEP + r'''\d+)*))
+        (?:\ of\ Article\ (?P<paragraph_article>\d++))?
+    |Articles?\ (?P<articles>(?>''' + ARTICLE + '(?:' + SEP + ARTICLE +
+                                r''')*))
+    |Chapters?\ (?P<chapters>[IVX]+(?:''' + SEP + r'''[IVX]+)*)\b
+    |\((?P<footnote>\d+)\)
+''', re.VERBOSE)
+# chapters are numbered with roman numerals
+NUMERALS = [
+    'I', 'II', 'III', 'IV', 'V', 'VI', 'VII', 'VIII', 'IX', 'X', 'XI']
+SPLIT = re.compile('(' + SEP + ')')
+PART = re.compile(r'\((\w+)\)')
+# a lettered point, e.g. '(a)', or at the end of an article, e.g. '6(1)(a)'
+LETTER = re.compile(r'\(([a-z])\)$')
+
+
+def items(text):
+    '''splits a list such as '15, 16 to 18' into items, expanding ranges
+    of numbers, numerals, and letters, e.g. (a) to (f) or 58(2)(a) to (h)'''
+    tokens = SPLIT.split(text)
+    result = [tokens[0]]
+    for separator, item in zip(tokens[1::2], tokens[2::2]):
+        start = result[-1]
+        if separator != ' to ':
+            result.append(item)
+        elif start.isdigit() and item.isdigit():
+            result.extend(
+                str(n) for n in range(int(start) + 1, int(item) + 1))
+        elif start in NUMERALS and item in NUMERALS:
+            result.extend(
+                NUMERALS[NUMERALS.index(start) + 1:
+                         NUMERALS.index(item) + 1])
+        elif LETTER.search(start) and LETTER.fullmatch(item):
+            result.extend(
+                '({})'.format(chr(n)) for n in range(
+                    ord(LETTER.search(start).group(1)) + 1,
+                    ord(item[1]) + 1))
+        else:
+            result.append(item)
+    return result
+
+
+def article_parts(text, previous=None):
+    '''splits '6(1)(a)' into ['6', '1', 'a'], with '(4)' being a
+    paragraph of the article, and '(f)' a point of the paragraph, of the
+    parts previous of the item before it'''
+    head = text.split('(', 1)[0]
+    parts = PART.findall(text)
+    if head:
+        return [head] + parts
+    if previous is None:
+        return None
+    if parts[0].isdigit():
+        return previous[:1] + parts
+    if len(previous) < 2:
+        return None
+    return previous[:2] + parts
+
+
+def resolve(gdpr, parts):
+    '''id of the most specific item in gdpr for the parts of an article'''
+    while parts:
+        id = 'article' + '-'.join(parts)
+        if id in gdpr:
+            return id
+        parts = parts[:-1]
+    return None
+
+
+def references(gdpr, text, article):
+    '''yields (kind, target) for matches in text, where kind is 'footnote'
+    (with the footnote number as target) or 'reference' (with the id of
+    the item referred to); article is the number of the article text is
+    in, or None'''
+    for match in REFERENCE.finditer(text):
+        if match.group('footnote') is not None:
+            yield 'footnote', match.group('footnote')
+        elif EXTERNAL.match(text, match.end()):
+            continue
+        elif match.group('points') is not None:
+            if match.group('point_article') is not None:
+                base = article_parts(match.group('point_article'))
+            elif match.group('point_paragraph') is not None and article:
+                base = [article, match.group('point_paragraph')]
+            else:
+                continue
+            for point in items(match.group('points')):
+                yield 'reference', resolve(gdpr, base + [point.strip('()')])
+        elif match.group('paragraphs') is not None:
+            base = match.group('paragraph_article') or article
+            if base is None:
+                continue
+            for paragraph in items(match.group('paragraphs')):
+                yield 'reference', resolve(gdpr, [base, paragraph])
+        elif match.group('articles') is not None:
+            previous = None
+            for item in items(match.group('articles')):
+                parts = article_parts(item, previous)
+                if parts is None:
+                    continue
+                previous = parts
+                yield 'reference', resolve(gdpr, parts)
+        else:
+            for chapter in items(match.group('chapters')):
+                yield 'reference', 'chapter' + chapter
+
+
+def extract(gdpr, first_footnote=4):
+    '''yields (source id, predicate, target id) for every citation and
+    cross-reference in GDPRText gdpr, without duplicates
+    footnotes before first_footnote are those of the preamble, which is
+    not part of gdpr.json'''
+    # footnotes are numbered in the order of the published text
+    nodes = list(gdpr.recitals)
+    for chapter in gdpr.chapters:
+        nodes.extend(chapter.descendants())
+    expected = first_footnote
+    seen = set()
+    for node in nodes:
+        if node.text is None:
+            continue
+        article = None
+        for ancestor in node.ancestors():
+            if isinstance(ancestor, gdpr_text.Article):
+                article = ancestor.number
+        for kind, target in references(gdpr, node.text, article):
+            if kind == 'footnote':
+                if target != str(expected):
+                    continue
+                expected += 1
+                edge = node.id, 'cites', 'citation' + target
+            else:
+                if target is None or target == node.id or target not in gdpr:
+                    continue
+                edge = node.id, 'refers_to', target
+            if edge not in seen:
+                seen.add(edge)
+                yield edge
+
+
+# (text, article it is in, ids it refers to), checked by check()
+CASES = [
+    ('Article 16 TFEU', None, []),
+    ('Article 263 TFEU', None, []),
+    ('Articles 15 and 16 TFEU', None, []),
+    ('Article 52 of the Charter', None, []),
+    ('Article 8(1) of the Charter', None, []),
+    ('Article 114 of Directive 2002/58/EC', None, []),
+    ('Article 25(6) of Directive 95/46/EC', None, []),
+    ('Article 25(6) or Article 26(4) of Directive 95/46/EC', None, []),
+    ('paragraph 3 of Article 42 of Directive 95/46/EC', None, []),
+    ('Articles 12 to 15 of that Directive', None, []),
+    ('Article 6(1)(a)', None, ['article6-1-a']),
+    ('Articles 15 to 17', None, ['article15', 'article16', 'article17']),
+    ('Article 6(1)(a) and (f)', None, ['article6-1-a', 'article6-1-f']),
+    ('Article 58(2)(a) to (h) and (j)', None,
+     ['article58-2-' + point for point in 'abcdefghj']),
+    ('Article 22(1) and (4)', None, ['article22-1', 'article22-4']),
+    ('points (a) to (c) of Article 6(1)', None,
+     ['article6-1-a', 'article6-1-b', 'article6-1-c']),
+    ('paragraph 3 of Article 42', None, ['article42-3']),
+    ('point (b) of paragraph 2', '58', ['article58-2-b']),
+    ('Chapter V', None, ['chapterV']),
+]
+
+
+def check(gdpr):
+    '''returns the CASES whose references in gdpr differ, with what was
+    found instead'''
+    failed = []
+    for text, article, expected in CASES:
+        found = [
+            target for kind, target in references(gdpr, text, article)
+            if kind == 'reference']
+        if found != expected:
+            failed.append((text, expected, found))
+    return failed
+
+
+if __name__ == '__main__':
+    import sys
+    if sys.argv[1:2] == ['--check']:
+        failed = check(gdpr_text.load(*sys.argv[2:3]))
+        for text, expected, found in failed:
+            print('{!r}: expected {}, found {}'.format(text, expected, found))
+        print('{} of {} cases failed'.format(len(failed), len(CASES)))
+        sys.exit(1 if failed else 0)
+    gdpr = gdpr_text.load(*sys.argv[1:2])
+    for source, predicate, target in extract(gdpr):
+        print(source, predicate, target)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Difference between two versions of gdpr.json, as a patch to the RDF
+#
+# When the text is corrected, only the triples of the items that changed
+# need to be removed from and added to a triple store, rather than reloading
+# all of them. Both versions are aligned by the ids minted for their items
+# (article17-3-b, recital71, etc., see gdpr_text.py), and:
+#   each item is hashed, giving the items that were added, removed, changed
+#   (number, title, or text), or moved (to another parent), as a summary
+#   each block of incremental_build.py is hashed, and only the blocks whose
+#   hash differs are generated in both versions, giving the triples that
+#   were removed and added
+# Both take time linear in the size of the text. Blocks partition the
+# triples, and the triples of a block depend only on what it is hashed
+# from, so the triples of unchanged blocks are the same in both versions.
+# The cites between items are a single block that is generated again if
+# anything changed, as a change anywhere can add or remove a reference.
+#
+# The patch is written as RDF Patch (https://afs.github.io/rdf-patch/):
+#   TX .
+#   D <s> <p> <o> .
+#   A <s> <p> <o> .
+#   TC .
+# or as SPARQL UPDATE (DELETE DATA followed by INSERT DATA), optionally
+# into a named graph. apply() applies an RDF Patch to an N-Triples file.
+
+##############################################################################
+import hashlib
+import json
+import os
+
+import generate_rdf_pairings as pairings
+import gdpr_text
+import incremental_build
+
+FORMATS = ('rdfpatch', 'sparql')
+
+
+def node_hashes(gdpr_json):
+    '''{id: (hash, parent id)} of every item in gdpr_json'''
+    hashes = {}
+    for node in gdpr_text.from_json(gdpr_json):
+        material = json.dumps(
+            [type(node).__name__, node.number, node.title, node.text])
+        hashes[node.id] = (
+            hashlib.sha1(material.encode('utf-8')).hexdigest(),
+            node.parent.id if node.parent is not None else None)
+    return hashes
+
+
+def compare_nodes(old, new):
+    '''summary of items added, removed, changed, and moved between the
+    node_hashes old and new'''
+    changed, moved = [], []
+    for id, (hash, parent) in new.items():
+        if id not in old:
+            continue
+        if old[id][0] != hash:
+            changed.append(id)
+        if old[id][1] != parent:
+            moved.append(id)
+    return {
+        'added': [id for id in new if id not in old],
+        'removed': [id for id in old if id not in new],
+        'changed': changed,
+        'moved': moved,
+    }
+
+
+def block_keys(gdpr_json):
+    '''{block id: (key, function, args)} of the blocks of gdpr_json'''
+    # keys are computed for every block before any is generated, as
+    # generating an article numbers its unnumbered points in place
+    return {
+        block_id: (
+            incremental_build.block_key('', block_id, material),
+            function, args)
+        for block_id, material, function, args
+        in incremental_build.blocks(gdpr_json)}
+
+
+def lines(blocks, block_ids):
+    '''set of N-Triples lines generated by block_ids of blocks'''
+    generated = set()
+    for block_id in block_ids:
+        _, function, args = blocks[block_id]
+        generated.update(
+            incremental_build.emit(function, args).splitlines())
+    return generated
+
+
+def diff(old_json, new_json):
+    '''returns (removed, added, summary) between two versions of gdpr.json
+    where removed and added are sorted lists of N-Triples lines'''
+    summary = compare_nodes(node_hashes(old_json), node_hashes(new_json))
+    old_blocks, new_blocks = block_keys(old_json), block_keys(new_json)
+    stale = [
+        block_id for block_id in old_blocks
+        if block_id not in new_blocks or
+        new_blocks[block_id][0] != old_blocks[block_id][0]]
+    fresh = [
+        block_id for block_id in new_blocks
+        if block_id not in old_blocks or
+        new_blocks[block_id][0] != old_blocks[block_id][0]]
+    old_lines = lines(old_blocks, stale)
+    new_lines = lines(new_blocks, fresh)
+    removed = sorted(old_lines - new_lines)
+    added = sorted(new_lines - old_lines)
+    summary['blocks'] = {
+        'old': len(old_blocks), 'new': len(new_blocks),
+        'generated': len(stale) + len(fresh)}
+    summary['triples'] = {'removed': len(removed), 'added': len(added)}
+    return removed, added, summary
+
+
+def quad(line, graph):
+    '''N-Triples line (without its ' .') in graph, if any'''
+    if graph is None:
+        return line[:-2]
+    return '{} <{}>'.format(line[:-2], graph)
+
+
+def rdf_patch(removed, added, graph=None):
+    '''yields the lines of an RDF Patch removing and adding triples'''
+    yield 'TX .\n'
+    for line in removed:
+        yield 'D {} .\n'.format(quad(line, graph))
+    for line in added:
+        yield 'A {} .\n'.format(quad(line, graph))
+    yield 'TC .\n'
+
+
+def sparql_update(removed, added, graph=None):
+    '''yields the lines of a SPARQL UPDATE removing and adding triples'''
+    for operation, triples in (('DELETE', removed), ('INSERT', added)):
+        if not triples:
+            continue
+        yield '{} DATA {{\n'.format(operation)
+        if graph is not None:
+            yield 'GRAPH <{}> {{\n'.format(graph)
+        for line in triples:
+            yield line + '\n'
+        if graph is not None:
+            yield '}\n'
+        yield '};\n'
+
+
+def write(removed, added, path, format='rdfpatch', graph=None):
+    '''writes the patch in format to path'''
+    patch = rdf_patch if format == 'rdfpatch' else sparql_update
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as fd:
+            fd.writelines(patch(removed, added, graph))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def apply(nt_path, patch_path, destination):
+    '''applies the RDF Patch at patch_path (of triples, without graphs) to
+    the N-Triples at nt_path, and writes the result to destination'''
+    removed, added = set(), []
+    with open(patch_path, encoding='utf-8') as fd:
+        for line in fd:
+            if line.startswith('D '):
+                removed.add(line[2:])
+            elif line.startswith('A '):
+                added.append(line[2:])
+    temp_path = '{}.{}.tmp'.format(destination, os.getpid())
+    try:
+        with open(nt_path, encoding='utf-8') as source, \
+                open(temp_path, 'w', encoding='utf-8') as fd:
+            for line in source:
+                if line not in removed:
+                    fd.write(line)
+            fd.writelines(added)
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(
+        description='patch to the RDF between two versions of gdpr.json')
+    parser.add_argument('old', help='previous gdpr.json')
+    parser.add_argument('new', help='corrected gdpr.json')
+    parser.add_argument(
+        '--output', default='../deliverables/gdpr.patch',
+        help='file to write the patch to')
+    parser.add_argument(
+        '--format', choices=FORMATS, default='rdfpatch',
+        help='RDF Patch or SPARQL UPDATE')
+    parser.add_argument(
+        '--graph', default=None,
+        help='named graph the triples are in (default: the default graph)')
+    parser.add_argument(
+        '--summary', default=None,
+        help='file to write the summary to as JSON')
+    parser.add_argument(
+        '--compact', action='store_true',
+        help='patch the compact output (see nested_sets.py)')
+    args = parser.parse_args()
+
+    pairings.COMPACT = args.compact
+    start = time.perf_counter()
+    removed, added, summary = diff(
+        pairings.load_json(args.old), pairings.load_json(args.new))
+    write(removed, added, args.output, args.format, args.graph)
+    if args.summary:
+        with open(args.summary, 'w') as fd:
+            json.dump(summary, fd, indent=2)
+    for key in ('added', 'removed', 'changed', 'moved'):
+        print('{:<8} {:>5} items  {}'.format(
+            key, len(summary[key]), ' '.join(summary[key][:8]) +
+            (' ...' if len(summary[key]) > 8 else '')))
+    print('triples  {removed} removed, {added} added'.format(
+        **summary['triples']))
+    print('blocks   {generated} of {old}/{new} generated'.format(
+        **summary['blocks']))
+    print('total {:.3f}s'.format(time.perf_counter() - start))
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Precomputed per-resource fragments of the GDPR text, for serve.py
+#
+# For every resource in gdpr.nt (the GDPR, chapters, sections, articles,
+# points, subpoints, recitals, citations) the triples about it are written
+# as Turtle, N-Triples, and JSON-LD, and the element with its id is taken
+# from gdpr.html, whose ids are the older ones (A17-1a for article17-1-a,
+# R3 for recital3, section2 within a chapter, and so on). Every fragment is
+# stored both as is and gzip compressed, along with a strong ETag (the SHA-1
+# of the body), so that serving a request is only a lookup.
+#
+# The fragments are packed into one file, gdpr.fragments, with an index in
+# gdpr.fragments.json of:
+#   id -> extension -> [offset, length, gzip offset, gzip length, etag]
+# Formats that are rarely asked for (RDF/XML, N3) are not stored; serve.py
+# produces them from the N-Triples fragment when asked, and caches them.
+
+##############################################################################
+import gzip
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+
+from rdflib import Graph
+
+import generate_rdf_pairings as pairings
+import instrumentation
+import shards
+
+# file extension -> media type; the first ones are precomputed
+MEDIA_TYPES = {
+    'ttl': 'text/turtle',
+    'nt': 'application/n-triples',
+    'jsonld': 'application/ld+json',
+    'html': 'text/html',
+    'rdf': 'application/rdf+xml',
+    'n3': 'text/n3',
+}
+PRECOMPUTED = ('ttl', 'nt', 'jsonld', 'html')
+# ids in gdpr.html
+HTML_ARTICLE = re.compile(r'A(\d+)(?:-(\d+)([a-z]+)?)?')
+HTML_RECITAL = re.compile(r'R(\d+)')
+HTML_CITATION = re.compile(r'citation-(\d+)')
+HTML_SECTION = re.compile(r'section(\d+)')
+# elements that have no end tag
+VOID = {'br', 'hr', 'img', 'input', 'link', 'meta'}
+
+
+def minted_id(html_id, chapter):
+    '''id of the resource for the element with html_id in gdpr.html, or
+    None; chapter is the id of the chapter the element is in'''
+    match = HTML_ARTICLE.fullmatch(html_id)
+    if match:
+        return 'article' + '-'.join(p for p in match.groups() if p)
+    match = HTML_RECITAL.fullmatch(html_id)
+    if match:
+        return 'recital' + match.group(1)
+    match = HTML_CITATION.fullmatch(html_id)
+    if match:
+        return 'citation' + match.group(1)
+    match = HTML_SECTION.fullmatch(html_id)
+    if match and chapter is not None:
+        return '{}-{}'.format(chapter, match.group(1))
+    if html_id == 'pre-text':
+        return 'description'
+    if html_id.startswith(('chapter', 'article')):
+        return html_id
+    return None
+
+
+class FragmentParser(HTMLParser):
+    '''finds the source of every element with an id in gdpr.html'''
+
+    def __init__(self, html):
+        super().__init__(convert_charrefs=True)
+        self.html = html
+        self.line_starts = [0]
+        for match in re.finditer('\n', html):
+            self.line_starts.append(match.end())
+        self.fragments = {}
+        self.chapter = None
+        # tag -> number of open elements; open elements with an id as
+        # (tag, depth, id, start offset)
+        self.depth = {}
+        self.open = []
+
+    def source_offset(self):
+        line, column = self.getpos()
+        return self.line_starts[line - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID:
+            return
+        self.depth[tag] = self.depth.get(tag, 0) + 1
+        html_id = dict(attrs).get('id')
+        if html_id is None:
+            return
+        offset = self.source_offset()
+        if html_id.startswith('chapter'):
+            # chapterII is not closed in gdpr.html, so a chapter also ends
+            # where the next one begins
+            for entry in self.open:
+                if entry[2] == self.chapter:
+                    self.open.remove(entry)
+                    self.fragments[entry[2]] = \
+                        self.html[entry[3]:offset].rstrip()
+                    break
+            self.chapter = html_id
+        id = minted_id(html_id, self.chapter)
+        if id is not None:
+            self.open.append((tag, self.depth[tag], id, offset))
+
+    def handle_endtag(self, tag):
+        if tag in VOID or not self.depth.get(tag):
+            return
+        if self.open and self.open[-1][:2] == (tag, self.depth[tag]):
+            _, _, id, start = self.open.pop()
+            end = self.html.index('>', self.source_offset()) + 1
+            self.fragments[id] = self.html[start:end]
+        self.depth[tag] -= 1
+
+
+def html_fragments(path):
+    '''returns a dict of id -> source of its element in gdpr.html at path'''
+    with open(path, encoding='utf-8') as fd:
+        html = fd.read()
+    parser = FragmentParser(html)
+    parser.feed(html)
+    parser.close()
+    return parser.fragments
+
+
+def subjects(nt_path):
+    '''returns a dict of id -> N-Triples lines about it, in the order of
+    the N-Triples at nt_path'''
+    prefix = '<{}'.format(pairings.GDPR_URI)
+    lines = {}
+    with open(nt_path, encoding='utf-8') as fd:
+        for line in fd:
+            subject = line.split(' ', 1)[0]
+            if subject.startswith(prefix):
+                lines.setdefault(subject[len(prefix):-1], []).append(line)
+    return lines
+
+
+def render(lines, extension):
+    '''returns the N-Triples lines serialized in the format for extension'''
+    if extension == 'nt':
+        return ''.join(lines)
+    g = Graph(bind_namespaces='none')
+    for prefix, namespace in shards.PREFIXES:
+        g.bind(prefix, namespace)
+    g.parse(data=''.join(lines), format='nt')
+    return shards.serialize_shard(g, extension)
+
+
+def representation(text):
+    '''returns (body, gzip compressed body, etag) for text'''
+    body = text.encode('utf-8')
+    # mtime is fixed so that the same body is always compressed the same
+    return body, gzip.compress(body, mtime=0), hashlib.sha1(body).hexdigest()
+
+
+def render_resources(resources):
+    '''returns [(id, extension, representation)] for (id, lines) in
+    resources, in every precomputed RDF format'''
+    return [
+        (id, extension, representation(render(lines, extension)))
+        for id, lines in resources
+        for extension in PRECOMPUTED if extension != 'html']
+
+
+def write(nt_path, html_path, path, jobs=None, chunk=64):
+    '''writes the fragments of the N-Triples at nt_path and gdpr.html at
+    html_path to path, with its index at path + .json, using jobs
+    processes for chunks of resources'''
+    resources = list(subjects(nt_path).items())
+    html = html_fragments(html_path)
+    index = {}
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    temp_index_path = '{}.json.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp_path, 'wb') as stream, \
+                ProcessPoolExecutor(
+                    max_workers=jobs,
+                    initializer=instrumentation.detach) as executor:
+            def add(id, extension, rendered):
+                body, compressed, etag = rendered
+                offset = stream.tell()
+                stream.write(body)
+                stream.write(compressed)
+                index.setdefault(id, {})[extension] = [
+                    offset, len(body), offset + len(body), len(compressed),
+                    etag]
+
+            futures = [
+                executor.submit(render_resources, resources[i:i + chunk])
+                for i in range(0, len(resources), chunk)]
+            for future in futures:
+                for id, extension, rendered in future.result():
+                    add(id, extension, rendered)
+            for id, _ in resources:
+                if id in html:
+                    add(id, 'html', representation(html[id]))
+        with open(temp_index_path, 'w') as fd:
+            json.dump(index, fd, separators=(',', ':'))
+        # both are complete before either is replaced
+        os.replace(temp_path, path)
+        os.replace(temp_index_path, path + '.json')
+    except BaseException:
+        for temp in (temp_path, temp_index_path):
+            if os.path.exists(temp):
+                os.remove(temp)
+        raise
+    return index
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='precomputes per-resource fragments for serve.py')
+    parser.add_argument(
+        '--nt', default=pairings.DELIVERABLES + '/gdpr.nt',
+        help='path to gdpr.nt')
+    parser.add_argument(
+        '--html', default='../gdpr.html', help='path to gdpr.html')
+    parser.add_argument(
+        '--output', default=pairings.DELIVERABLES + '/gdpr.fragments',
+        help='path to write the fragments to')
+    parser.add_argument(
+        '--jobs', type=int, default=None,
+        help='number of processes (default: all cores)')
+    args = parser.parse_args()
+    index = write(args.nt, args.html, args.output, args.jobs)
+    print('{} resources, {} with HTML'.format(
+        len(index), sum('html' in formats for formats in index.values())))
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# In-memory model of the GDPR text, loaded directly from gdpr.json
+#
+# Each chapter, section, article, point, subpoint, recital, and citation is
+# a node with the same id that generate_rdf_pairings.py uses for its IRI
+# (e.g. chapterIII, chapterIII-2, article43-1-2, recital147, citation4).
+# Nodes are kept in a dict by id, and know their parent and children, so
+# that looking up the text of an item and navigating around it does not
+# need an RDF library or parsing any of the RDF distributions.
+#
+# Usage:
+#   gdpr = load('../deliverables/gdpr.json')
+#   point = gdpr['article4-25']
+#   point.text, point.parent.id, [node.id for node in point.ancestors()]
+
+##############################################################################
+import json
+
+
+class Node(object):
+    '''an item in the GDPR text'''
+    __slots__ = ('id', 'number', 'title', 'text', 'parent', 'children')
+
+    def __init__(self, id, number, title=None, text=None, parent=None):
+        self.id = id
+        self.number = number
+        self.title = title
+        self.text = text
+        self.parent = parent
+        self.children = []
+        if parent is not None:
+            parent.children.append(self)
+
+    def __repr__(self):
+        return '<{} {}>'.format(type(self).__name__, self.id)
+
+    def ancestors(self):
+        '''yields parent, its parent, and so on up to the chapter'''
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def descendants(self):
+        '''yields all nodes below this one in document order'''
+        for child in self.children:
+            yield child
+            yield from child.descendants()
+
+
+class Chapter(Node):
+    __slots__ = ()
+
+
+class Section(Node):
+    __slots__ = ()
+
+
+class Article(Node):
+    __slots__ = ()
+
+
+class Point(Node):
+    __slots__ = ()
+
+
+class SubPoint(Node):
+    __slots__ = ()
+
+
+class Recital(Node):
+    __slots__ = ()
+
+
+class Citation(Node):
+    __slots__ = ()
+
+
+class GDPRText(object):
+    '''the GDPR text as nodes that can be looked up by id'''
+    __slots__ = ('nodes', 'chapters', 'recitals', 'citations')
+
+    def __init__(self):
+        self.nodes = {}
+        self.chapters = []
+        self.recitals = []
+        self.citations = []
+
+    def __getitem__(self, id):
+        return self.nodes[id]
+
+    def __contains__(self, id):
+        return id in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        '''iterates over chapters, recitals, and citations in document
+        order, with the contents of each chapter following it'''
+        for chapter in self.chapters:
+            yield chapter
+            yield from chapter.descendants()
+        yield from self.recitals
+        yield from self.citations
+
+    def get(self, id, default=None):
+        return self.nodes.get(id, default)
+
+    def add(self, node):
+        self.nodes[node.id] = node
+        return node
+
+    def add_article(self, article, parent):
+        '''adds article with its points and subpoints under parent'''
+        node_article = self.add(Article(
+            'article{}'.format(article['number']), article['number'],
+            article.get('title'), parent=parent))
+        # unnumbered points and subpoints are numbered in the same way
+        # as in generate_rdf_pairings.py
+        point_nos = 1
+        for point in article['contents']:
+            point_number = point['number']
+            if point_number is None:
+                point_number = str(point_nos)
+                point_nos += 1
+            node_point = self.add(Point(
+                '{}-{}'.format(node_article.id, point_number), point_number,
+                text=point['text'], parent=node_article))
+            subpoint_nos = 1
+            for subpoint in point['subpoints']:
+                subpoint_number = subpoint['number']
+                if subpoint_number is None:
+                    subpoint_number = str(subpoint_nos)
+                    subpoint_nos += 1
+                self.add(SubPoint(
+                    '{}-{}'.format(node_point.id, subpoint_number),
+                    subpoint_number, text=subpoint['text'],
+                    parent=node_point))
+
+
+def from_json(gdpr_json):
+    '''creates GDPRText from the parsed contents of gdpr.json'''
+    gdpr = GDPRText()
+    for chapter in gdpr_json['chapters']:
+        node_chapter = gdpr.add(Chapter(
+            'chapter{}'.format(chapter['number']), chapter['number'],
+            chapter['title']))
+        gdpr.chapters.append(node_chapter)
+        contents = chapter['contents']
+        if contents[0]['type'] == 'section':
+            for section in contents:
+                node_section = gdpr.add(Section(
+                    '{}-{}'.format(node_chapter.id, section['number']),
+                    section['number'], section['title'],
+                    parent=node_chapter))
+                for article in section['contents']:
+                    gdpr.add_article(article, node_section)
+        else:
+            for article in contents:
+                gdpr.add_article(article, node_chapter)
+    for recital in gdpr_json['recitals']:
+        gdpr.recitals.append(gdpr.add(Recital(
+            'recital{}'.format(recital['number']), recital['number'],
+            text=recital['text'])))
+    for citation in gdpr_json['citations'].values():
+        gdpr.citations.append(gdpr.add(Citation(
+            'citation{}'.format(citation['number']), citation['number'],
+            text=citation['text'])))
+    return gdpr
+
+
+def load(path='../deliverables/gdpr.json'):
+    '''loads GDPRText from gdpr.json at path'''
+    with open(path) as fd:
+        return from_json(json.load(fd))
+
+
+if __name__ == '__main__':
+    import sys
+    gdpr = load(*sys.argv[1:2])
+    for id in sys.argv[2:]:
+        node = gdpr[id]
+        print(node, '<', ' < '.join(repr(n) for n in node.ancestors()))
+        print(node.title or node.text)
@@ -217,4 +217,5 @@ graph.add((property_has_recital, RDFS.comment, Literal(
     'indicates the legal resource has the Recital', datatype=XSD.string)))
 
 
-graph.serialize(destination='../deliverables/gdpr.owl', format='xml')
+if __name__ == '__main__':
+    graph.serialize(destination='../deliverables/gdpr.owl', format='xml')
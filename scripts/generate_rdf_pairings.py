@@ -34,14 +34,27 @@
 from rdflib import Graph, RDF, RDFS, XSD, Literal, URIRef, BNode
 from rdflib import Namespace
 
-# Load the JSON from file
-with open('../deliverables/gdpr.json') as fd:
-    import json
-    gdpr_json = json.load(fd)
-    # import p# print
-    # p# print.p# print(gdpr_json)
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from rdflib.plugins.serializers.nt import _nt_row
+
+import cross_references
+import gdpr_text
+import instrumentation
+
+GDPR_JSON = '../deliverables/gdpr.json'
+DELIVERABLES = '../deliverables'
 # This will be the graph used to hold the triples as they are being generated
+# In streaming mode it is swapped for an NTriplesWriter, which has the same
+# add() signature but writes every triple straight to a file instead.
 graph = Graph()
+# Stages of the run are recorded by instrument (see instrumentation.py),
+# which does nothing unless it is replaced by an Instrument.
+instrument = instrumentation.OFF
 GDPRtEXT_URI = URIRef('http://purl.org/adaptcentre/ontologies/GDPRtEXT#')
 GDPRtEXT = Namespace(GDPRtEXT_URI)
 graph.namespace_manager.bind('GDPRtEXT', GDPRtEXT)
@@ -59,6 +72,11 @@ PART_OF = ELI.is_part_of
 # graph.add((PART_OF, RDF.type, OWL.TransitiveProperty))
 DESC = ELI.description
 HAS_RECITAL = GDPRtEXT['hasRecital']
+# In compact mode, items are linked only to their direct parent, and the
+# links to the other ancestors (e.g. from a subpoint to its article, section,
+# chapter, and the GDPR) are left out. They can be recovered from the
+# interval index in nested_sets.py, which can also materialize them again.
+COMPACT = False
 
 ##############################################################################
 # GDPR as named individual
@@ -67,60 +85,82 @@ GDPR_URI = URIRef('http://purl.org/adaptcentre/resources/GDPRtEXT#')
 GDPR = Namespace(GDPR_URI)
 graph.namespace_manager.bind('gdpr', GDPR)
 gdpr = GDPR.GDPR
-# graph.add((gdpr, RDF.type, OWL.NamedIndividual))
-graph.add((gdpr, RDF.type, ELI.LR))
-graph.add((gdpr, RDF.type, DCTERMS.Policy))
-graph.add((gdpr, DCTERMS.identifier, Literal(
-    '2016/679', datatype=XSD.string)))
-graph.add((gdpr, DCTERMS.language, Literal(
-    'English', datatype=XSD.string)))
-graph.add((gdpr, DCTERMS.publisher, Literal(
-    'Official Journal of the European Union', datatype=XSD.string)))
-graph.add((gdpr, DCTERMS.source, Literal(
-    'http://eur-lex.europa.eu/eli/reg/2016/679/oj', datatype=XSD.string)))
-graph.add((gdpr, DCTERMS.title, Literal(
-    'General Data Protection Regulation', datatype=XSD.string)))
-graph.add((gdpr, DCTERMS.title_alternative, Literal(
-    'GDPR', datatype=XSD.string)))
-graph.add((gdpr, DCTERMS.title_alternative, Literal(
-    'REGULATION (EU) 2016/679', datatype=XSD.string)))
-graph.add((gdpr, DCTERMS.creator, Literal(
-    'European Parliament', datatype=XSD.string)))
-graph.add((gdpr, DCTERMS.creator, Literal(
-    'Council of the European Union', datatype=XSD.string)))
-graph.add((gdpr, DCTERMS.abstract, Literal((
-    'REGULATION (EU) 2016/679 OF THE EUROPEAN PARLIAMENT AND OF THE COUNCIL '
-    'of 27 April 2016 '
-    'on the protection of natural persons with regard to the processing of '
-    'personal data and on the free movement of such data, '
-    'and repealing Directive 95/46/EC '
-    '(General Data Protection Regulation)'), datatype=XSD.string)))
 gdpr_description = GDPR['description']
-graph.add((gdpr_description, RDF.type, ELI.LRS))
-graph.add((gdpr_description, DCTERMS.description, Literal((
-    'THE EUROPEAN PARLIAMENT AND THE COUNCIL OF THE EUROPEAN UNION, '
-    'Having regard to the Treaty on the Functioning of the European Union, '
-    'and in particular Article 16 thereof, Having regard to the proposal from '
-    'the European Commission, After transmission of the draft legislative act '
-    'to the national parliaments, '
-    'Having regard to the opinion of the European Economic '
-    'and Social Committee, '
-    'Having regard to the opinion of the Committee of the Regions, '
-    'Acting in accordance with the ordinary legislative procedure,'
-    ),  datatype=XSD.string)))
-graph.add((gdpr_description, ELI.cites, GDPR['citation1']))
-graph.add((gdpr_description, ELI.cites, GDPR['citation2']))
-graph.add((gdpr_description, ELI.cites, GDPR['citation3']))
-graph.add((gdpr, DCTERMS.description, gdpr_description))
-graph.add((gdpr, ELI.date_document, Literal('2016-04-27', datatype=XSD.date)))
-graph.add((gdpr, DCTERMS.date, Literal('2016-04-27', datatype=XSD.date)))
-graph.add((gdpr, ELI.date_publication, Literal(
-    '2016-05-04', datatype=XSD.date)))
-graph.add((gdpr, DCTERMS.issued, Literal('2016-05-04', datatype=XSD.date)))
-graph.add((gdpr, ELI.in_force, Literal(
-    '2016-05-24', datatype=XSD.date)))
-graph.add((gdpr, ELI.date_applicability, Literal(
-    '2018-05-25', datatype=XSD.date)))
+
+
+def set_base(base):
+    '''mints the IRIs of everything generated from now on under base
+    returns the previous base'''
+    global GDPR, gdpr, gdpr_description
+    previous = str(GDPR)
+    GDPR = Namespace(base)
+    gdpr = GDPR.GDPR
+    gdpr_description = GDPR['description']
+    return previous
+
+
+def graph_gdpr():
+    '''adds the GDPR as a legal resource to graph'''
+    # graph.add((gdpr, RDF.type, OWL.NamedIndividual))
+    graph.add((gdpr, RDF.type, ELI.LR))
+    graph.add((gdpr, RDF.type, DCTERMS.Policy))
+    graph.add((gdpr, DCTERMS.identifier, Literal(
+        '2016/679', datatype=XSD.string)))
+    graph.add((gdpr, DCTERMS.language, Literal(
+        'English', datatype=XSD.string)))
+    graph.add((gdpr, DCTERMS.publisher, Literal(
+        'Official Journal of the European Union', datatype=XSD.string)))
+    graph.add((gdpr, DCTERMS.source, Literal(
+        'http://eur-lex.europa.eu/eli/reg/2016/679/oj', datatype=XSD.string)))
+    graph.add((gdpr, DCTERMS.title, Literal(
+        'General Data Protection Regulation', datatype=XSD.string)))
+    graph.add((gdpr, DCTERMS.title_alternative, Literal(
+        'GDPR', datatype=XSD.string)))
+    graph.add((gdpr, DCTERMS.title_alternative, Literal(
+        'REGULATION (EU) 2016/679', datatype=XSD.string)))
+    graph.add((gdpr, DCTERMS.creator, Literal(
+        'European Parliament', datatype=XSD.string)))
+    graph.add((gdpr, DCTERMS.creator, Literal(
+        'Council of the European Union', datatype=XSD.string)))
+    graph.add((gdpr, DCTERMS.abstract, Literal((
+        'REGULATION (EU) 2016/679 OF THE EUROPEAN PARLIAMENT '
+        'AND OF THE COUNCIL '
+        'of 27 April 2016 '
+        'on the protection of natural persons with regard to the processing '
+        'of '
+        'personal data and on the free movement of such data, '
+        'and repealing Directive 95/46/EC '
+        '(General Data Protection Regulation)'), datatype=XSD.string)))
+    graph.add((gdpr_description, RDF.type, ELI.LRS))
+    graph.add((gdpr_description, DCTERMS.description, Literal((
+        'THE EUROPEAN PARLIAMENT AND THE COUNCIL OF THE EUROPEAN UNION, '
+        'Having regard to the Treaty on the Functioning of the European '
+        'Union, '
+        'and in particular Article 16 thereof, Having regard to the proposal '
+        'from '
+        'the European Commission, After transmission of the draft '
+        'legislative act '
+        'to the national parliaments, '
+        'Having regard to the opinion of the European Economic '
+        'and Social Committee, '
+        'Having regard to the opinion of the Committee of the Regions, '
+        'Acting in accordance with the ordinary legislative procedure,'
+        ),  datatype=XSD.string)))
+    graph.add((gdpr_description, ELI.cites, GDPR['citation1']))
+    graph.add((gdpr_description, ELI.cites, GDPR['citation2']))
+    graph.add((gdpr_description, ELI.cites, GDPR['citation3']))
+    graph.add((gdpr, DCTERMS.description, gdpr_description))
+    graph.add((gdpr, ELI.date_document, Literal(
+        '2016-04-27', datatype=XSD.date)))
+    graph.add((gdpr, DCTERMS.date, Literal('2016-04-27', datatype=XSD.date)))
+    graph.add((gdpr, ELI.date_publication, Literal(
+        '2016-05-04', datatype=XSD.date)))
+    graph.add((gdpr, DCTERMS.issued, Literal(
+        '2016-05-04', datatype=XSD.date)))
+    graph.add((gdpr, ELI.in_force, Literal(
+        '2016-05-24', datatype=XSD.date)))
+    graph.add((gdpr, ELI.date_applicability, Literal(
+        '2018-05-25', datatype=XSD.date)))
 
 
 class_Chapter = GDPRtEXT['Chapter']
@@ -167,17 +207,19 @@ def graph_subpoint(
         datatype=XSD.string)))
     graph.add((node_subpoint, RDF.type, LRS))
     graph.add((node_subpoint, RDF.type, class_SubPoint))
-    graph.add((node_subpoint, PART_OF, chapter))
-    graph.add((node_subpoint, property_partof_chapter, chapter))
-    if section is not None:
-        graph.add((node_subpoint, PART_OF, section))
-        graph.add((node_subpoint, property_partof_section, section))
-    graph.add((node_subpoint, PART_OF, article))
-    graph.add((node_subpoint, property_partof_article, article))
+    if not COMPACT:
+        graph.add((node_subpoint, PART_OF, chapter))
+        graph.add((node_subpoint, property_partof_chapter, chapter))
+        if section is not None:
+            graph.add((node_subpoint, PART_OF, section))
+            graph.add((node_subpoint, property_partof_section, section))
+        graph.add((node_subpoint, PART_OF, article))
+        graph.add((node_subpoint, property_partof_article, article))
     graph.add((node_subpoint, PART_OF, point))
     graph.add((node_subpoint, property_partof_point, point))
     graph.add((point, property_has_subpoint, node_subpoint))
-    graph.add((node_subpoint, PART_OF, gdpr))
+    if not COMPACT:
+        graph.add((node_subpoint, PART_OF, gdpr))
     graph.add((node_subpoint, DESC, Literal(
         subpoint['text'], datatype=XSD.string)))
 
@@ -194,15 +236,17 @@ def graph_point(point, article_number, article, section=None, chapter=None):
         datatype=XSD.string)))
     graph.add((node_point, RDF.type, LRS))
     graph.add((node_point, RDF.type, class_Point))
-    graph.add((node_point, PART_OF, chapter))
-    graph.add((node_point, property_partof_chapter, chapter))
-    if section is not None:
-        graph.add((node_point, PART_OF, section))
-        graph.add((node_point, property_partof_section, section))
+    if not COMPACT:
+        graph.add((node_point, PART_OF, chapter))
+        graph.add((node_point, property_partof_chapter, chapter))
+        if section is not None:
+            graph.add((node_point, PART_OF, section))
+            graph.add((node_point, property_partof_section, section))
     graph.add((node_point, PART_OF, article))
     graph.add((node_point, property_partof_article, article))
     graph.add((article, property_has_point, node_point))
-    graph.add((node_point, PART_OF, gdpr))
+    if not COMPACT:
+        graph.add((node_point, PART_OF, gdpr))
     graph.add((node_point, DESC, Literal(
         point['text'], datatype=XSD.string)))
     # subpoint number to be used only when they are un-numbered
@@ -226,11 +270,13 @@ def graph_article(article, section=None, chapter=None):
         article['number'], datatype=XSD.string)))
     graph.add((node_article, TITLE_ALT, Literal(
         'Article ' + article['number'], datatype=XSD.string)))
-    graph.add((node_article, PART_OF, chapter))
-    graph.add((node_article, property_partof_chapter, chapter))
-    graph.add((chapter, property_has_article, node_article))
-    graph.add((gdpr, property_has_article, node_article))
-    graph.add((node_article, PART_OF, gdpr))
+    if not COMPACT or section is None:
+        graph.add((node_article, PART_OF, chapter))
+        graph.add((node_article, property_partof_chapter, chapter))
+        graph.add((chapter, property_has_article, node_article))
+    if not COMPACT:
+        graph.add((gdpr, property_has_article, node_article))
+        graph.add((node_article, PART_OF, gdpr))
     if section is not None:
         graph.add((node_article, PART_OF, section))
         graph.add((node_article, property_partof_section, section))
@@ -244,8 +290,9 @@ def graph_article(article, section=None, chapter=None):
         graph_point(point, article['number'], node_article, section, chapter)
 
 
-def graph_section(section, chapter, chapter_number):
-    '''adds section to graph'''
+def graph_section_head(section, chapter, chapter_number):
+    '''adds section, without its articles, to graph
+    returns the node for the section'''
     # print('S', section['number'], section['title'])
     node_section = GDPR[
             'chapter{}-{}'.format(chapter_number, section['number'])]
@@ -258,15 +305,23 @@ def graph_section(section, chapter, chapter_number):
     graph.add((node_section, TITLE_ALT, Literal(
         'Section ' + section['number'], datatype=XSD.string)))
     graph.add((node_section, PART_OF, chapter))
-    graph.add((node_section, PART_OF, gdpr))
+    if not COMPACT:
+        graph.add((node_section, PART_OF, gdpr))
     graph.add((node_section, property_partof_chapter, chapter))
     graph.add((chapter, property_has_section, node_section))
+    return node_section
+
+
+def graph_section(section, chapter, chapter_number):
+    '''adds section to graph'''
+    node_section = graph_section_head(section, chapter, chapter_number)
     for article in section['contents']:
         graph_article(article, node_section, chapter)
 
 
-def graph_chapter(chapter):
-    '''adds chapter to graph'''
+def graph_chapter_head(chapter):
+    '''adds chapter, without its sections or articles, to graph
+    returns the node for the chapter'''
     # print('C', chapter['number'], chapter['title'])
     node_chapter = GDPR['chapter{}'.format(chapter['number'])]
     graph.add((node_chapter, RDF.type, LRS))
@@ -279,7 +334,12 @@ def graph_chapter(chapter):
         'Chapter ' + chapter['number'], datatype=XSD.string)))
     graph.add((node_chapter, PART_OF, gdpr))
     graph.add((gdpr, property_has_chapter, node_chapter))
+    return node_chapter
 
+
+def graph_chapter(chapter):
+    '''adds chapter to graph'''
+    node_chapter = graph_chapter_head(chapter)
     contents = chapter['contents']
     # Section (if any)
     if contents[0]['type'] == 'section':
@@ -290,11 +350,8 @@ def graph_chapter(chapter):
             graph_article(item, None, node_chapter)
 
 
-for chapter in gdpr_json['chapters']:
-    graph_chapter(chapter)
-
-
-for recital in gdpr_json['recitals']:
+def graph_recital(recital):
+    '''adds recital to graph'''
     node_recital = GDPR['recital{}'.format(recital['number'])]
     graph.add((node_recital, RDF.type, LRS))
     graph.add((node_recital, RDF.type, class_Recital))
@@ -306,7 +363,8 @@ for recital in gdpr_json['recitals']:
     graph.add((gdpr, HAS_RECITAL, node_recital))
 
 
-for citation in gdpr_json['citations'].values():
+def graph_citation(citation):
+    '''adds citation to graph'''
     node_citation = GDPR['citation{}'.format(citation['number'])]
     graph.add((node_citation, RDF.type, LRS))
     graph.add((node_citation, RDF.type, class_Citation))
@@ -318,29 +376,374 @@ for citation in gdpr_json['citations'].values():
     graph.add((gdpr, ELI.cites, node_citation))
 
 
-# Add citations
-graph.add((GDPR['recital3'], ELI.cites, GDPR['citation4']))
-graph.add((GDPR['recital13'], ELI.cites, GDPR['citation5']))
-graph.add((GDPR['recital17'], ELI.cites, GDPR['citation6']))
-graph.add((GDPR['recital19'], ELI.cites, GDPR['citation7']))
-graph.add((GDPR['recital21'], ELI.cites, GDPR['citation8']))
-graph.add((GDPR['recital35'], ELI.cites, GDPR['citation9']))
-graph.add((GDPR['recital42'], ELI.cites, GDPR['citation10']))
-graph.add((GDPR['recital54'], ELI.cites, GDPR['citation11']))
-graph.add((GDPR['recital106'], ELI.cites, GDPR['citation12']))
-graph.add((GDPR['recital147'], ELI.cites, GDPR['citation13']))
-graph.add((GDPR['recital154'], ELI.cites, GDPR['citation14']))
-graph.add((GDPR['recital161'], ELI.cites, GDPR['citation15']))
-graph.add((GDPR['recital163'], ELI.cites, GDPR['citation16']))
-graph.add((GDPR['recital172'], ELI.cites, GDPR['citation17']))
-graph.add((GDPR['recital173'], ELI.cites, GDPR['citation18']))
-graph.add((GDPR['article4-25'], ELI.cites, GDPR['citation19']))
-graph.add((GDPR['article43-1-2'], ELI.cites, GDPR['citation20']))
-graph.add((GDPR['article76-2'], ELI.cites, GDPR['citation21']))
-
-# Serialize
-graph.serialize(destination='../deliverables/gdpr.ttl', format='turtle')
-graph.serialize(destination='../deliverables/gdpr.rdf', format='pretty-xml')
-graph.serialize(destination='../deliverables/gdpr.n3', format='n3')
-graph.serialize(destination='../deliverables/gdpr.nt', format='nt')
-graph.serialize(destination='../deliverables/gdpr.jsonld', format='json-ld')
+def graph_cites(gdpr_json):
+    '''adds citations and cross-references found in the text to graph
+    see cross_references.py for how they are found'''
+    gdpr_text_model = gdpr_text.from_json(gdpr_json)
+    for source, predicate, target in cross_references.extract(
+            gdpr_text_model):
+        graph.add((GDPR[source], ELI[predicate], GDPR[target]))
+
+
+def graph_all(gdpr_json, flush=None, head=None):
+    '''adds the whole of gdpr_json to graph
+
+    flush, if given, is called after every chapter, and once after each of
+    the recitals, citations, and cites; head, if given, is called instead
+    of graph_gdpr() to add the act itself'''
+    with instrument.stage('head', graph):
+        if head is None:
+            graph_gdpr()
+        else:
+            head()
+    with instrument.stage('chapters', graph):
+        for chapter in gdpr_json['chapters']:
+            graph_chapter(chapter)
+            if flush is not None:
+                flush()
+    with instrument.stage('recitals', graph):
+        for recital in gdpr_json['recitals']:
+            graph_recital(recital)
+        if flush is not None:
+            flush()
+    with instrument.stage('citations', graph):
+        for citation in gdpr_json['citations'].values():
+            graph_citation(citation)
+        if flush is not None:
+            flush()
+    with instrument.stage('cites', graph):
+        graph_cites(gdpr_json)
+        if flush is not None:
+            flush()
+
+
+def load_json(path=GDPR_JSON):
+    '''loads gdpr.json from path'''
+    with open(path) as fd:
+        return json.load(fd)
+
+
+#############################################################################
+# Streaming
+# Instead of holding every triple in a Graph until the end, the streaming
+# mode writes each triple as an N-Triples (or N-Quads) line as soon as it is
+# generated. Duplicates are only suppressed within a chapter (or within the
+# recitals/citations blocks), which is sufficient since no triple is
+# generated twice across chapters. Memory is thus bounded by the largest
+# chapter, and the output is identical to the Graph serialization once both
+# are sorted.
+
+
+class NTriplesWriter(object):
+    '''stand-in for graph that writes triples to stream as they are added
+
+    if context is given, lines are written as N-Quads in that named graph'''
+
+    def __init__(self, stream, context=None):
+        self.stream = stream
+        self.suffix = ' .\n'
+        if context is not None:
+            self.suffix = ' {} .\n'.format(URIRef(context).n3())
+        self.seen = set()
+        self.count = 0
+
+    def __len__(self):
+        '''number of triples written'''
+        return self.count
+
+    def add(self, triple):
+        if triple in self.seen:
+            return
+        self.seen.add(triple)
+        self.count += 1
+        # _nt_row ends every line in ' .\n'
+        self.stream.write(_nt_row(triple)[:-3] + self.suffix)
+
+    def flush(self):
+        '''forgets the triples seen so far and flushes the stream'''
+        self.seen.clear()
+        self.stream.flush()
+
+
+def stream(gdpr_json, destination, context=None, buffering=1 << 20):
+    '''writes gdpr_json as N-Triples (N-Quads if context) to destination'''
+    global graph
+    graph_backup = graph
+    with open(destination, 'w', encoding='utf-8', buffering=buffering) as fd:
+        graph = NTriplesWriter(fd, context)
+        try:
+            graph_all(gdpr_json, flush=graph.flush)
+        finally:
+            graph = graph_backup
+
+
+#############################################################################
+# Serialization
+# The same graph is written in several formats, of which pretty-xml and
+# json-ld take up most of the time. With more than one job, the graph is
+# first written out as N-Triples, and each of the other formats is then
+# produced by a separate process that parses that N-Triples dump, which is
+# much cheaper than pickling the Graph across to each of them.
+# Every file is written to a temporary file in the same folder and then
+# renamed, so a failure never leaves a partially written deliverable.
+
+# file extension -> rdflib format
+FORMATS = {
+    'ttl': 'turtle',
+    'rdf': 'pretty-xml',
+    'n3': 'n3',
+    'nt': 'nt',
+    'jsonld': 'json-ld',
+}
+
+
+def write_atomic(g, path, format):
+    '''serializes g to path in format via a temporary file'''
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        g.serialize(destination=temp_path, format=format)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def serialize_from_nt(nt_path, destination, extension):
+    '''parses the N-Triples at nt_path and serializes them to destination
+    in the format for extension; returns the time taken in seconds'''
+    start = time.perf_counter()
+    g = Graph()
+    for prefix, namespace in graph.namespaces():
+        g.bind(prefix, namespace)
+    g.parse(nt_path, format='nt')
+    write_atomic(
+        g, '{}/gdpr.{}'.format(destination, extension), FORMATS[extension])
+    return time.perf_counter() - start
+
+
+def serialize(destination=DELIVERABLES, formats=tuple(FORMATS), jobs=None):
+    '''serializes graph in formats to the destination folder
+    formats are file extensions from FORMATS; jobs is the number of
+    processes to use (all cores if None)
+    returns the time taken in seconds for each format'''
+    timings = {}
+    if jobs == 1:
+        for extension in formats:
+            start = time.perf_counter()
+            with instrument.stage('serialize/' + extension):
+                write_atomic(
+                    graph, '{}/gdpr.{}'.format(destination, extension),
+                    FORMATS[extension])
+            timings[extension] = time.perf_counter() - start
+        return timings
+
+    # the N-Triples dump is a deliverable itself if nt is asked for
+    if 'nt' in formats:
+        nt_path = destination + '/gdpr.nt'
+    else:
+        fd, nt_path = tempfile.mkstemp(dir=destination, suffix='.nt')
+        os.close(fd)
+    try:
+        start = time.perf_counter()
+        with instrument.stage('serialize/nt'):
+            write_atomic(graph, nt_path, 'nt')
+        if 'nt' in formats:
+            timings['nt'] = time.perf_counter() - start
+        with instrument.stage('serialize/pool'):
+            from_nt = serialize_formats_from_nt(
+                nt_path, destination, formats, jobs)
+        # each of these ran in its own process, so only its time is known
+        for extension, seconds in from_nt.items():
+            instrument.add('serialize/' + extension, wall=seconds)
+        timings.update(from_nt)
+    finally:
+        if 'nt' not in formats:
+            os.remove(nt_path)
+    return timings
+
+
+def serialize_formats_from_nt(nt_path, destination, formats, jobs=None):
+    '''serializes the N-Triples at nt_path in formats (other than nt) to
+    the destination folder using a pool of jobs processes
+    returns the time taken in seconds for each format'''
+    timings = {}
+    with ProcessPoolExecutor(
+            max_workers=jobs, initializer=instrumentation.detach) as executor:
+        futures = {
+            extension: executor.submit(
+                serialize_from_nt, nt_path, destination, extension)
+            for extension in formats if extension != 'nt'}
+        for extension, future in futures.items():
+            timings[extension] = future.result()
+    return timings
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='generates RDF for GDPR text from gdpr.json')
+    parser.add_argument(
+        '--json', default=GDPR_JSON, help='path to gdpr.json')
+    parser.add_argument(
+        '--output', default=DELIVERABLES, help='folder to write output to')
+    parser.add_argument(
+        '--stream', action='store_true',
+        help='write only N-Triples, without holding the graph in memory')
+    parser.add_argument(
+        '--context', default=None,
+        help='with --stream, write N-Quads in this named graph instead')
+    parser.add_argument(
+        '--formats', default=','.join(FORMATS),
+        help='comma separated file extensions to write, from {}'.format(
+            ', '.join(FORMATS)))
+    parser.add_argument(
+        '--jobs', type=int, default=None,
+        help='number of processes for serialization (default: all cores)')
+    parser.add_argument(
+        '--compact', action='store_true',
+        help='link items only to their direct parent (see nested_sets.py)')
+    parser.add_argument(
+        '--shards', action='store_true',
+        help='also write per-chapter and per-article shards (see shards.py)')
+    parser.add_argument(
+        '--distributions', default='../gdpr_distributions.ttl',
+        help='with --shards, distributions file to describe them in')
+    parser.add_argument(
+        '--fragments', action='store_true',
+        help='also write per-resource fragments for serve.py '
+        '(see fragments.py)')
+    parser.add_argument(
+        '--html', default='../gdpr.html',
+        help='with --fragments, path to gdpr.html')
+    parser.add_argument(
+        '--render-html', action='store_true',
+        help='also render the page and per-article and per-recital HTML '
+        'fragments to html/ (see render_html.py)')
+    parser.add_argument(
+        '--queries', action='store_true',
+        help='also write the answers to common navigation queries to '
+        'gdpr.queries.json (see queries.py)')
+    parser.add_argument(
+        '--instrument', action='store_true',
+        help='record the time, memory, and triples of each stage in '
+        'gdpr.report.json (see instrumentation.py)')
+    parser.add_argument(
+        '--profile', choices=('cprofile', 'pyinstrument'), default=None,
+        help='also profile the run with this profiler')
+    parser.add_argument(
+        '--no-snapshot', action='store_true',
+        help='do not write the binary snapshot (see snapshot.py)')
+    parser.add_argument(
+        '--columnar', action='store_true',
+        help='also write the columnar form of gdpr.nt (see columnar.py)')
+    parser.add_argument(
+        '--intervals', action='store_true',
+        help='also write the interval index to gdpr.intervals.json (see '
+        'nested_sets.py), as is done with --compact and --compressed')
+    parser.add_argument(
+        '--compressed', action='store_true',
+        help='also write gdpr.nt compressed in blocks that can be read by '
+        'id (see compressed.py)')
+    parser.add_argument(
+        '--validate', action='store_true',
+        help='check gdpr.nt against the axioms of gdpr.owl '
+        '(see validate.py)')
+    parser.add_argument(
+        '--no-index', action='store_true',
+        help='do not write the full-text index (see search_index.py)')
+    args = parser.parse_args()
+    formats = args.formats.split(',')
+    for extension in formats:
+        if extension not in FORMATS:
+            parser.error('unknown format: {}'.format(extension))
+
+    COMPACT = args.compact
+    if (args.shards or args.fragments or args.columnar or args.validate or
+            args.compressed) and not (
+                'nt' in formats and not args.stream or
+                args.stream and args.context is None):
+        parser.error(
+            '--shards, --fragments, --columnar, --validate, and --compressed '
+            'need gdpr.nt to be written')
+    if args.instrument or args.profile:
+        instrument = instrumentation.Instrument(profile=args.profile)
+        instrument.start()
+
+    with instrument.stage('load'):
+        gdpr_json = load_json(args.json)
+    if args.stream:
+        if args.context is None:
+            stream(gdpr_json, args.output + '/gdpr.nt')
+        else:
+            stream(gdpr_json, args.output + '/gdpr.nq', args.context)
+    else:
+        graph_all(gdpr_json)
+        timings = serialize(args.output, formats, args.jobs)
+        for extension in formats:
+            print('{:<8} {:>8.3f}s'.format(extension, timings[extension]))
+    if not args.no_snapshot and (
+            'nt' in formats and not args.stream or
+            args.stream and args.context is None):
+        import snapshot
+        with instrument.stage('snapshot'):
+            snapshot.write(
+                args.output + '/gdpr.nt', args.output + '/gdpr.snapshot')
+    if args.validate:
+        import validate
+        with instrument.stage('validate'):
+            ontology = args.output + '/gdpr.owl'
+            report = validate.validate(
+                args.output + '/gdpr.nt', validate.load_axioms(
+                    ontology if os.path.exists(ontology) else None))
+        validate.print_report(report)
+    if args.columnar:
+        import columnar
+        with instrument.stage('columnar'):
+            columnar.write(
+                args.output + '/gdpr.nt', args.output + '/gdpr.columns')
+    if not args.no_index:
+        import search_index
+        with instrument.stage('index'):
+            search_index.write(args.json, args.output + '/gdpr.index.json')
+    if args.render_html:
+        import render_html
+        with instrument.stage('html'):
+            # generating numbers unnumbered points in gdpr_json in place
+            render_html.build(load_json(args.json), args.output + '/html')
+    if args.queries:
+        import queries
+        with instrument.stage('queries'):
+            queries.write(args.json, args.output + '/gdpr.queries.json')
+    if args.intervals or args.compact or args.compressed:
+        import nested_sets
+        with instrument.stage('intervals'):
+            nested_sets.write(
+                args.json, args.output + '/gdpr.intervals.json')
+    if args.compressed:
+        import compressed
+        with instrument.stage('compressed'):
+            compressed.write_all(
+                args.output + '/gdpr.nt',
+                args.output + '/gdpr.intervals.json')
+    if args.shards:
+        import shards
+        with instrument.stage('shards'):
+            report = shards.write(
+                args.output + '/gdpr.nt', args.json, args.output + '/shards',
+                formats, args.jobs)
+            if args.distributions:
+                shards.update_distributions(args.distributions, report)
+    if args.fragments:
+        import fragments
+        with instrument.stage('fragments'):
+            fragments.write(
+                args.output + '/gdpr.nt', args.html,
+                args.output + '/gdpr.fragments', args.jobs)
+
+    if instrument is not instrumentation.OFF:
+        instrument.stop()
+        instrument.print()
+        profile_path = instrument.write(args.output + '/gdpr.report.json')
+        if profile_path is not None:
+            print('profile written to', profile_path)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Incremental build of the RDF for GDPR text (see generate_rdf_pairings.py)
+#
+# gdpr.json is split into blocks: the GDPR itself, the head of each chapter
+# and section, each article (with its points and subpoints), each recital,
+# each citation, and the cites between them. Each block is hashed along
+# with the source of generate_rdf_pairings.py, of the modules it uses to
+# find the cites (cross_references.py, gdpr_text.py), and of this one, and
+# with the base IRI (see set_base()) and mode the IRIs and links depend on,
+# and the N-Triples generated for it are cached on disk under that hash. On
+# the next run, only blocks whose hash is not in the cache are generated
+# again, and gdpr.nt is spliced together from the cached blocks in document
+# order. If nt is not one of the formats asked for, gdpr.nt is kept in the
+# cache rather than written to the output.
+#
+# The other formats cannot be spliced, so they are serialized again from
+# gdpr.nt, but only if its content changed since they were last written.
+# The hash they were written from is kept in manifest.json in the cache.
+
+##############################################################################
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+
+import cross_references
+import gdpr_text
+import generate_rdf_pairings as pairings
+import snapshot
+
+# gdpr.nt in the cache, when it is not one of the formats asked for
+SPLICED = 'gdpr.nt'
+
+
+def generator_hash():
+    '''hash of the source of the generator and the modules it uses for the
+    blocks, and of the base IRI and mode, which invalidates every block'''
+    sha1 = hashlib.sha1()
+    for path in (pairings.__file__, cross_references.__file__,
+                 gdpr_text.__file__, __file__):
+        with open(path, 'rb') as fd:
+            sha1.update(fd.read())
+    sha1.update(str(pairings.GDPR).encode('utf-8'))
+    sha1.update(b'compact' if pairings.COMPACT else b'full')
+    return sha1.hexdigest()
+
+
+def block_key(salt, block_id, material):
+    '''hash for block_id with the JSON in material'''
+    data = json.dumps([block_id, material], sort_keys=True)
+    return hashlib.sha1((salt + data).encode('utf-8')).hexdigest()
+
+
+def without_contents(item):
+    return {k: v for k, v in item.items() if k != 'contents'}
+
+
+def blocks(gdpr_json):
+    '''yields (block_id, material, function, args) for every block
+    function(*args) adds the triples for the block to pairings.graph, and
+    material is the JSON that decides what those triples are'''
+    GDPR = pairings.GDPR
+    # taken before any article is generated, and numbered in place
+    whole = hashlib.sha1(
+        json.dumps(gdpr_json, sort_keys=True).encode('utf-8')).hexdigest()
+    yield 'gdpr', None, pairings.graph_gdpr, ()
+    for chapter in gdpr_json['chapters']:
+        chapter_id = 'chapter{}'.format(chapter['number'])
+        node_chapter = GDPR[chapter_id]
+        yield (
+            chapter_id, without_contents(chapter),
+            pairings.graph_chapter_head, (chapter,))
+        contents = chapter['contents']
+        if contents[0]['type'] == 'section':
+            sections = [
+                (section, '{}-{}'.format(chapter_id, section['number']))
+                for section in contents]
+        else:
+            sections = [(None, None)]
+        for section, section_id in sections:
+            if section is None:
+                node_section = None
+                articles = contents
+            else:
+                node_section = GDPR[section_id]
+                articles = section['contents']
+                yield (
+                    section_id, [chapter_id, without_contents(section)],
+                    pairings.graph_section_head,
+                    (section, node_chapter, chapter['number']))
+            for article in articles:
+                yield (
+                    'article{}'.format(article['number']),
+                    [chapter_id, section_id, article],
+                    pairings.graph_article,
+                    (article, node_section, node_chapter))
+    for recital in gdpr_json['recitals']:
+        yield (
+            'recital{}'.format(recital['number']), recital,
+            pairings.graph_recital, (recital,))
+    for citation in gdpr_json['citations'].values():
+        yield (
+            'citation{}'.format(citation['number']), citation,
+            pairings.graph_citation, (citation,))
+    # cross-references can be to and from anywhere in the text
+    yield 'cites', whole, pairings.graph_cites, (gdpr_json,)
+
+
+def emit(function, args):
+    '''returns the N-Triples added to pairings.graph by function(*args)'''
+    buffer = io.StringIO()
+    graph_backup = pairings.graph
+    pairings.graph = pairings.NTriplesWriter(buffer)
+    try:
+        function(*args)
+    finally:
+        pairings.graph = graph_backup
+    return buffer.getvalue()
+
+
+def write_text_atomic(path, text):
+    '''writes text to path via a temporary file'''
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as stream:
+            stream.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def build(json_path, destination, cache, formats, jobs=None):
+    '''builds formats, and the snapshot, from the gdpr.json at json_path
+    in destination, reusing blocks cached in cache
+    returns a dict describing what was rebuilt'''
+    gdpr_json = pairings.load_json(json_path)
+    os.makedirs(cache, exist_ok=True)
+    salt = generator_hash()
+    used, generated = set(), 0
+    nt_hash = hashlib.sha1()
+    parts = []
+    for block_id, material, function, args in blocks(gdpr_json):
+        # the key must be computed before function runs, as generating
+        # an article numbers its unnumbered points in place
+        key = block_key(salt, block_id, material)
+        used.add(key)
+        path = os.path.join(cache, key + '.nt')
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as fd:
+                text = fd.read()
+        else:
+            text = emit(function, args)
+            write_text_atomic(path, text)
+            generated += 1
+        nt_hash.update(text.encode('utf-8'))
+        parts.append(text)
+    nt_hash = nt_hash.hexdigest()
+    # the other formats and the snapshot are made from it
+    if 'nt' in formats:
+        nt_path = destination + '/gdpr.nt'
+    else:
+        nt_path = os.path.join(cache, SPLICED)
+    write_text_atomic(nt_path, ''.join(parts))
+
+    # stale blocks are removed so that the cache does not grow forever
+    for filename in os.listdir(cache):
+        if filename.endswith('.nt') and filename != SPLICED and \
+                filename[:-3] not in used:
+            os.remove(os.path.join(cache, filename))
+
+    manifest_path = os.path.join(cache, 'manifest.json')
+    manifest = {'formats': {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as fd:
+            manifest = json.load(fd)
+    stale = [
+        extension for extension in formats if extension != 'nt' and (
+            manifest['formats'].get(extension) != nt_hash or
+            not os.path.exists('{}/gdpr.{}'.format(destination, extension)))]
+    timings = {}
+    if stale:
+        timings = pairings.serialize_formats_from_nt(
+            nt_path, destination, stale, jobs)
+    for extension in formats:
+        manifest['formats'][extension] = nt_hash
+    write_text_atomic(manifest_path, json.dumps(manifest, indent=2))
+
+    snapshot_path = destination + '/gdpr.snapshot'
+    current = snapshot.open_snapshot(snapshot_path, nt_path)
+    if current is None:
+        snapshot.write(nt_path, snapshot_path)
+    else:
+        current.close()
+    return {
+        'blocks': len(used),
+        'generated': generated,
+        'serialized': timings,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='incrementally generates RDF for GDPR text')
+    parser.add_argument(
+        '--json', default=pairings.GDPR_JSON, help='path to gdpr.json')
+    parser.add_argument(
+        '--output', default=pairings.DELIVERABLES,
+        help='folder to write output to')
+    parser.add_argument(
+        '--cache', default=None,
+        help='folder to cache blocks in (default: OUTPUT/.cache)')
+    parser.add_argument(
+        '--formats', default=','.join(pairings.FORMATS),
+        help='comma separated file extensions to write')
+    parser.add_argument(
+        '--jobs', type=int, default=None,
+        help='number of processes for serialization (default: all cores)')
+    parser.add_argument(
+        '--compact', action='store_true',
+        help='link items only to their direct parent (see nested_sets.py)')
+    args = parser.parse_args()
+    formats = args.formats.split(',')
+    for extension in formats:
+        if extension not in pairings.FORMATS:
+            parser.error('unknown format: {}'.format(extension))
+    cache = args.cache
+    if cache is None:
+        cache = os.path.join(args.output, '.cache')
+
+    pairings.COMPACT = args.compact
+    start = time.perf_counter()
+    report = build(args.json, args.output, cache, formats, args.jobs)
+    print('generated {} of {} blocks'.format(
+        report['generated'], report['blocks']))
+    for extension, seconds in report['serialized'].items():
+        print('{:<8} {:>8.3f}s'.format(extension, seconds))
+    print('total {:.3f}s'.format(time.perf_counter() - start))
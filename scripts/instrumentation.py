@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Per-stage instrumentation of the RDF generation pipeline
+#
+# The generator marks its stages (loading gdpr.json, building the act
+# itself, its chapters, recitals, citations, and cites, and each
+# serialization) with
+#   with instrument.stage('chapters', graph):
+#       ...
+# and an Instrument records for each stage its wall and CPU time, the peak
+# memory allocated by Python while it ran (tracemalloc), and how many
+# triples were added to graph. The stages, along with the run they are
+# from, are written as a JSON report next to the deliverables, so that
+# reports of different versions can be compared to see which stage a change
+# made slower.
+#
+# Optionally, the whole run is also profiled, with cProfile (written as
+# pstats, see python -m pstats) or pyinstrument (written as HTML) if it is
+# installed.
+#
+# When instrumentation is off, the generator uses OFF, whose stage() returns
+# the same context manager that does nothing, so the overhead is one method
+# call per stage. Worker processes are started with detach(), so that they
+# are not slowed down by the tracing and profiling they inherit on fork.
+
+##############################################################################
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+
+def write_text(path, text):
+    with open(path, 'w') as fd:
+        fd.write(text)
+
+
+def write_atomic(path, write):
+    '''calls write(temporary path) and replaces path with what it wrote'''
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        write(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class Stage(object):
+    '''records a stage of instrument while in its with block'''
+    __slots__ = ('instrument', 'name', 'graph', 'record')
+
+    def __init__(self, instrument, name, graph=None):
+        self.instrument = instrument
+        self.name = name
+        self.graph = graph
+
+    def __enter__(self):
+        self.record = {'name': self.name}
+        if self.graph is not None:
+            self.record['triples'] = -len(self.graph)
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self.record['cpu'] = -time.process_time()
+        self.record['wall'] = -time.perf_counter()
+        return self.record
+
+    def __exit__(self, *exc):
+        record = self.record
+        record['wall'] += time.perf_counter()
+        record['cpu'] += time.process_time()
+        if tracemalloc.is_tracing():
+            record['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        if self.graph is not None:
+            record['triples'] += len(self.graph)
+        self.instrument.stages.append(record)
+
+
+class Instrument(object):
+    '''records stages of a run, and optionally profiles it
+
+    memory enables tracemalloc, which slows down the run; profile is None,
+    'cprofile', or 'pyinstrument' '''
+
+    def __init__(self, memory=True, profile=None):
+        self.memory = memory
+        self.profile = profile
+        self.profiler = None
+        self.stages = []
+        self.started = None
+
+    def stage(self, name, graph=None):
+        return Stage(self, name, graph)
+
+    def add(self, name, **values):
+        '''records a stage that was measured elsewhere, e.g. in another
+        process'''
+        record = {'name': name}
+        record.update(values)
+        self.stages.append(record)
+
+    def start(self):
+        self.started = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.wall = -time.perf_counter()
+        self.cpu = -time.process_time()
+        if self.memory:
+            tracemalloc.start()
+        if self.profile == 'cprofile':
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif self.profile == 'pyinstrument':
+            import pyinstrument
+            self.profiler = pyinstrument.Profiler()
+            self.profiler.start()
+
+    def stop(self):
+        if self.profile == 'cprofile':
+            self.profiler.disable()
+        elif self.profile == 'pyinstrument':
+            self.profiler.stop()
+        if self.memory:
+            # each stage resets the peak
+            self.peak_mb = max(
+                [tracemalloc.get_traced_memory()[1] / 2 ** 20] +
+                [record['peak_mb'] for record in self.stages
+                 if 'peak_mb' in record])
+            tracemalloc.stop()
+        self.wall += time.perf_counter()
+        self.cpu += time.process_time()
+
+    def report(self):
+        report = {
+            'started': self.started,
+            'argv': sys.argv,
+            'python': platform.python_version(),
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'stages': self.stages,
+        }
+        if self.memory:
+            report['peak_mb'] = self.peak_mb
+        return report
+
+    def write(self, path):
+        '''writes the report to path, and the profile, if any, next to it
+        returns the path of the profile'''
+        write_atomic(path, lambda temp_path: write_text(
+            temp_path, json.dumps(self.report(), indent=2)))
+        profile_path = None
+        if self.profile == 'cprofile':
+            profile_path = path.rsplit('.', 1)[0] + '.pstats'
+            write_atomic(profile_path, self.profiler.dump_stats)
+        elif self.profile == 'pyinstrument':
+            profile_path = path.rsplit('.', 1)[0] + '.html'
+            write_atomic(profile_path, lambda temp_path: write_text(
+                temp_path, self.profiler.output_html()))
+        return profile_path
+
+    def print(self):
+        print('{:<18} {:>9} {:>9} {:>9} {:>8}'.format(
+            'stage', 'wall (s)', 'cpu (s)', 'peak MB', 'triples'))
+        for record in self.stages + [
+                {'name': 'total', 'wall': self.wall, 'cpu': self.cpu,
+                 'peak_mb': getattr(self, 'peak_mb', None)}]:
+            print('{:<18} {:>9} {:>9} {:>9} {:>8}'.format(
+                record['name'],
+                *('' if record.get(key) is None else format_value(
+                    record[key]) for key in (
+                        'wall', 'cpu', 'peak_mb', 'triples'))))
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return '{:.3f}'.format(value)
+    return str(value)
+
+
+def detach():
+    '''stops tracing and profiling inherited from the parent process'''
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    sys.setprofile(None)
+
+
+class Off(object):
+    '''stand-in for Instrument when instrumentation is off'''
+    NULL = contextlib.nullcontext({})
+
+    def stage(self, name, graph=None):
+        return self.NULL
+
+    def add(self, name, **values):
+        pass
+
+
+OFF = Off()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Load test for serve.py
+#
+# Opens a number of keep-alive connections to the server and sends requests
+# for random resources over them as fast as the server answers, with a mix
+# of Accept headers (mostly Turtle, N-Triples, JSON-LD, and HTML, and some
+# RDF/XML and N3) and Accept-Encoding, then reports the throughput and the
+# p50/p90/p99 latencies. With --spawn, the server is started locally for the
+# duration of the test, so nothing but the loopback interface is used.
+
+##############################################################################
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+
+# Accept header -> relative frequency
+ACCEPTS = (
+    ('text/turtle', 30),
+    ('application/n-triples', 15),
+    ('application/ld+json', 20),
+    ('text/html,application/xhtml+xml;q=0.9,*/*;q=0.8', 30),
+    ('application/rdf+xml', 3),
+    ('text/n3', 2),
+)
+
+
+def percentile(values, fraction):
+    '''value at fraction (0 to 1) of the sorted values'''
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def client(host, port, requests, latencies, statuses):
+    '''sends requests, as (path, accept, gzip), over one connection'''
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for path, accept, gzip in requests:
+            request = 'GET {} HTTP/1.1\r\nHost: {}\r\nAccept: {}\r\n'.format(
+                path, host, accept)
+            if gzip:
+                request += 'Accept-Encoding: gzip\r\n'
+            start = time.perf_counter()
+            writer.write((request + '\r\n').encode('latin-1'))
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line == b'\r\n':
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+    finally:
+        writer.close()
+
+
+async def run(host, port, ids, total, connections, seed):
+    '''sends total requests over connections; returns the latencies in
+    seconds, status counts, and time taken'''
+    rng = random.Random(seed)
+    accepts = [accept for accept, _ in ACCEPTS]
+    weights = [weight for _, weight in ACCEPTS]
+    requests = [
+        ('/' + rng.choice(ids), rng.choices(accepts, weights)[0],
+         rng.random() < 0.5)
+        for _ in range(total)]
+    latencies, statuses = [], Counter()
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, requests[i::connections], latencies, statuses)
+        for i in range(connections)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+async def wait_for_port(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='load tests serve.py')
+    parser.add_argument(
+        '--fragments', default='../deliverables/gdpr.fragments',
+        help='fragments written by fragments.py, for the ids to request')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument(
+        '--spawn', action='store_true', help='start serve.py for the test')
+    parser.add_argument(
+        '--requests', type=int, default=20000, help='number of requests')
+    parser.add_argument(
+        '--connections', type=int, default=32,
+        help='number of concurrent connections')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.fragments + '.json') as fd:
+        ids = sorted(json.load(fd))
+    server = None
+    if args.spawn:
+        server = subprocess.Popen([
+            sys.executable,
+            os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'serve.py'),
+            '--fragments', args.fragments,
+            '--host', args.host, '--port', str(args.port)],
+            stdout=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_for_port(args.host, args.port))
+        latencies, statuses, seconds = asyncio.run(run(
+            args.host, args.port, ids, args.requests, args.connections,
+            args.seed))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    latencies.sort()
+    print('{} requests in {:.2f}s ({:.0f}/s) over {} connections'.format(
+        len(latencies), seconds, len(latencies) / seconds,
+        args.connections))
+    print('status', ' '.join(
+        '{}:{}'.format(status, count)
+        for status, count in sorted(statuses.items())))
+    for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+        print('{} {:>8.2f} ms'.format(
+            name, 1000 * percentile(latencies, fraction)))
+    print('max {:>8.2f} ms'.format(1000 * latencies[-1]))
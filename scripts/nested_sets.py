@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Interval (nested set) index over the structure of the GDPR text
+#
+# The GDPR, its chapters, sections, articles, points, subpoints, recitals,
+# and citations are numbered in pre-order, i.e. in document order with every
+# item before its contents. The contents of an item are then exactly the
+# items numbered after it up to the last of its descendants, so each item is
+# stored with that interval:
+#   - 'all descendants of chapterIII' is the slice of items in its interval
+#   - 'is article17-3-b inside chapterIII' is a check of whether the number
+#     of article17-3-b is within the interval of chapterIII
+# both of which take constant time, without following any links.
+#
+# This is what makes the compact output of generate_rdf_pairings.py
+# (--compact) usable: it only links items to their direct parent, and the
+# other eli:is_part_of, isPartOfX, and hasArticle links can be regenerated
+# from this index with materialize() (or --materialize) when needed.
+#
+# Usage:
+#   index = IntervalIndex.load('../deliverables/gdpr.intervals.json')
+#   index.contains('chapterIII', 'article17-3-b')
+#   index.descendants('chapterIII')
+
+##############################################################################
+import json
+import os
+
+import gdpr_text
+
+ROOT = 'GDPR'
+# kind of ancestor -> property linking items to it, besides eli:is_part_of
+PART_OF_KIND = {
+    'chapter': 'isPartOfChapter',
+    'section': 'isPartOfSection',
+    'article': 'isPartOfArticle',
+    'point': 'isPartOfPoint',
+}
+
+
+def build(gdpr):
+    '''builds the index for GDPRText gdpr as a JSON-serialisable dict
+    items are in pre-order, and each has its kind, the position of its
+    last descendant (end), and the position of its parent'''
+    ids, kinds, ends, parents = [ROOT], ['gdpr'], [0], [None]
+
+    def visit(node, parent):
+        position = len(ids)
+        ids.append(node.id)
+        kinds.append(type(node).__name__.lower())
+        ends.append(position)
+        parents.append(parent)
+        for child in node.children:
+            visit(child, position)
+        ends[position] = len(ids) - 1
+
+    for node in gdpr.chapters + gdpr.recitals + gdpr.citations:
+        visit(node, 0)
+    ends[0] = len(ids) - 1
+    return {'ids': ids, 'kinds': kinds, 'ends': ends, 'parents': parents}
+
+
+class IntervalIndex(object):
+    '''structure of the GDPR text as intervals, loaded from build()'''
+
+    def __init__(self, data):
+        self.ids = data['ids']
+        self.kinds = data['kinds']
+        self.ends = data['ends']
+        self.parents = data['parents']
+        self.positions = {id: i for i, id in enumerate(self.ids)}
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fd:
+            return cls(json.load(fd))
+
+    def __contains__(self, id):
+        return id in self.positions
+
+    def __len__(self):
+        return len(self.ids)
+
+    def kind(self, id):
+        return self.kinds[self.positions[id]]
+
+    def parent(self, id):
+        '''id of the parent of id, or None for the GDPR'''
+        parent = self.parents[self.positions[id]]
+        return None if parent is None else self.ids[parent]
+
+    def contains(self, ancestor, id):
+        '''whether id is (strictly) inside ancestor'''
+        start = self.positions[ancestor]
+        return start < self.positions[id] <= self.ends[start]
+
+    def interval(self, id):
+        '''(start, end) positions of the descendants of id, which are
+        ids[start:end]'''
+        start = self.positions[id]
+        return start + 1, self.ends[start] + 1
+
+    def descendants(self, id):
+        '''ids of everything inside id in document order'''
+        start, end = self.interval(id)
+        return self.ids[start:end]
+
+    def ancestors(self, id):
+        '''ids of parent, its parent, and so on up to the GDPR'''
+        result = []
+        parent = self.parents[self.positions[id]]
+        while parent is not None:
+            result.append(self.ids[parent])
+            parent = self.parents[parent]
+        return result
+
+
+def closure(index):
+    '''yields (subject, property, object) for the links to ancestors other
+    than the direct parent, i.e. what --compact leaves out
+    subjects and objects are ids, and properties are names of eli or
+    GDPRtEXT properties'''
+    for position, id in enumerate(index.ids):
+        kind = index.kinds[position]
+        parent = index.parents[position]
+        if parent is None:
+            continue
+        ancestor = index.parents[parent]
+        while ancestor is not None:
+            ancestor_id = index.ids[ancestor]
+            yield id, 'is_part_of', ancestor_id
+            ancestor_kind = index.kinds[ancestor]
+            if ancestor_kind in PART_OF_KIND:
+                yield id, PART_OF_KIND[ancestor_kind], ancestor_id
+            # articles are the only items listed by every ancestor
+            if kind == 'article':
+                yield ancestor_id, 'hasArticle', id
+            ancestor = index.parents[ancestor]
+
+
+def materialize(index, nt_path, destination):
+    '''writes the N-Triples at nt_path, generated with --compact, to
+    destination along with the links to ancestors from closure()'''
+    import generate_rdf_pairings as pairings
+    from rdflib.plugins.serializers.nt import _nt_row
+    namespaces = {'is_part_of': pairings.ELI}
+    temp_path = '{}.{}.tmp'.format(destination, os.getpid())
+    try:
+        with open(nt_path, encoding='utf-8') as source, \
+                open(temp_path, 'w', encoding='utf-8') as stream:
+            lines = set()
+            for line in source:
+                lines.add(line)
+                stream.write(line)
+            for subject, name, object in closure(index):
+                namespace = namespaces.get(name, pairings.GDPRtEXT)
+                line = _nt_row((
+                    pairings.GDPR[subject], namespace[name],
+                    pairings.GDPR[object]))
+                if line not in lines:
+                    lines.add(line)
+                    stream.write(line)
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write(json_path, path):
+    '''writes the index for the gdpr.json at json_path to path'''
+    index = build(gdpr_text.load(json_path))
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp_path, 'w') as fd:
+            json.dump(index, fd, separators=(',', ':'))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='builds or queries the interval index of GDPR text')
+    parser.add_argument(
+        '--json', default='../deliverables/gdpr.json',
+        help='path to gdpr.json')
+    parser.add_argument(
+        '--index', default='../deliverables/gdpr.intervals.json',
+        help='path to the index')
+    parser.add_argument(
+        '--build', action='store_true', help='build the index first')
+    parser.add_argument(
+        '--materialize', nargs=2, metavar=('COMPACT', 'OUTPUT'),
+        help='write the N-Triples in COMPACT with all links to ancestors '
+        'to OUTPUT')
+    parser.add_argument(
+        'ids', nargs='*',
+        help='print the descendants of an id, or with two ids, whether the '
+        'second is inside the first')
+    args = parser.parse_args()
+
+    if args.build:
+        write(args.json, args.index)
+    index = IntervalIndex.load(args.index)
+    if args.materialize:
+        materialize(index, *args.materialize)
+    if len(args.ids) == 1:
+        for id in index.descendants(args.ids[0]):
+            print(id)
+    elif len(args.ids) == 2:
+        print(index.contains(*args.ids))
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Parses the text of a regulation from its EUR-Lex HTML into JSON
+#
+# This does what parse_gdpr.js does in a browser, without one, so that acts
+# and their language versions can be (re-)ingested in bulk. It produces the
+# same structure (and, for GDPR_en.html, the same file) as gdpr.json:
+# chapters, containing sections or articles, articles containing points,
+# and points containing subpoints, followed by recitals and citations.
+#
+# EUR-Lex serves these documents as XHTML, which is read incrementally with
+# iterparse (from lxml if installed, otherwise from the standard library)
+# rather than into a DOM. Only one child of body is held at a time: once it
+# has been read, it is fed to the Parser and removed from the tree. The
+# parser is a state machine that keeps only the items it is building, and
+# recognises the items in the way parse_gdpr.js does:
+#   CHAPTER, Section, and Article headings are p with an id of the form
+#   d1eN-1-1, followed by a p with their title
+#   points are p numbered '1.', or tables numbered '(1)' (as in Article 4,
+#   where the rest of the table are its subpoints)
+#   subpoints are tables that follow a point
+#   recitals are the tables that follow the title of the document
+#   citations are p with class note
+# The parser stops collecting articles at the div with class final.
+#
+# Metadata that is in the document (identifier, language, date of the
+# journal, and number of the regulation) is taken from it, the rest (title,
+# abbreviation, etc.) is given, and is that of the GDPR by default.
+
+##############################################################################
+import json
+import os
+import re
+
+try:
+    from lxml.etree import iterparse
+except ImportError:
+    from xml.etree.ElementTree import iterparse
+
+GDPR_HTML = 'GDPR_en.html'
+GDPR_METADATA = {
+    'title': 'General Data Protection Regulation',
+    'abbrv': 'GDPR',
+    'dated': '27/04/2016',
+    'about': (
+        'protection of natural persons with regard to the processing of '
+        'personal data and on the free movement of such data, and repealing '
+        'Directive 95/46/EC (General Data Protection Regulation)'),
+}
+HEADING_ID = re.compile(r'd1e\d+-1-1$')
+
+
+def local_name(element):
+    '''tag of element without its namespace, None for comments etc.'''
+    if not isinstance(element.tag, str):
+        return None
+    return element.tag.rsplit('}', 1)[-1]
+
+
+def classes(element):
+    return (element.get('class') or '').split()
+
+
+def text(element):
+    '''text of element and its descendants, as jQuery's text()
+    with non-breaking spaces as spaces, as they are in gdpr.json'''
+    return ''.join(element.itertext()).replace('\xa0', ' ')
+
+
+def paragraphs(element):
+    '''p elements within element'''
+    return [e for e in element.iter() if local_name(e) == 'p'
+            and e is not element]
+
+
+def elements(path):
+    '''yields the children of body in the document at path in order
+    each is removed from the tree once the next one is read'''
+    depth = 0
+    body = None
+    for event, element in iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if depth == 2 and local_name(element) == 'body':
+                body = element
+            continue
+        depth -= 1
+        if depth == 2 and body is not None and element is not body:
+            yield element
+            element.clear()
+            body.remove(element)
+        elif element is body:
+            body = None
+
+
+class Parser(object):
+    '''builds the JSON of an act from the children of its body'''
+
+    def __init__(self, metadata=GDPR_METADATA):
+        self.metadata = metadata
+        self.document = {}
+        self.chapters = []
+        self.recitals = []
+        self.citations = []
+        # title of the document seen, in recitals, after recitals
+        self.preamble = None
+        # item whose title is the next element
+        self.titled = None
+        self.chapter = self.section = self.article = self.point = None
+        self.final = False
+
+    def feed(self, element):
+        for note in element.iter():
+            if local_name(note) == 'p' and 'note' in classes(note):
+                self.citation(note)
+        name = local_name(element)
+        if name == 'table' and not self.document:
+            self.header(element)
+        elif name == 'p' and 'doc-ti' in classes(element):
+            if self.preamble is None:
+                self.preamble = 'title'
+                match = re.search(r'\d{4}/\d+', text(element))
+                if match is not None:
+                    self.document['regulation'] = match.group()
+        elif self.preamble == 'title' and name == 'table':
+            self.preamble = 'recitals'
+        elif self.preamble == 'recitals' and name == 'p':
+            self.preamble = 'done'
+        if name == 'div' and 'final' in classes(element):
+            self.final = True
+        if self.preamble == 'recitals':
+            self.recital(element)
+        elif self.titled is not None:
+            self.titled['title'] = text(element).strip()
+            self.titled['type'] = self.titled.pop('type')
+            self.titled['contents'] = self.titled.pop('contents')
+            self.titled = None
+        elif name == 'p' and HEADING_ID.match(element.get('id') or '') \
+                and self.heading(element):
+            pass
+        elif self.article is not None and not self.final:
+            if name == 'p':
+                self.paragraph(element)
+            elif name == 'table':
+                self.table(element)
+
+    def header(self, element):
+        '''reads the journal header of the document'''
+        for p in paragraphs(element):
+            value = text(p).strip()
+            if 'hd-date' in classes(p):
+                day, month, year = value.split('.')
+                self.document['updated'] = '{:02d}/{:02d}/{}'.format(
+                    int(day), int(month), year)
+            elif 'hd-lg' in classes(p):
+                self.document['language'] = value
+            elif 'hd-oj' in classes(p):
+                self.document['identifier'] = value
+
+    def heading(self, element):
+        '''starts the chapter, section, or article headed by element
+        returns False if element is not a heading'''
+        value = text(element)
+        if re.match(r'\s*CHAPTER [IVX]+\s*$', value):
+            self.chapter = self.titled = {
+                'number': value.strip()[8:], 'type': 'chapter',
+                'contents': []}
+            self.chapters.append(self.chapter)
+            self.section = self.article = None
+        elif re.match(r'Article \d+$', value):
+            self.article = self.titled = {
+                'number': value[8:], 'type': 'article', 'contents': []}
+            (self.section or self.chapter)['contents'].append(self.article)
+            self.point = None
+        elif [local_name(child) == 'span' and 'expanded' in classes(child)
+              for child in element].count(True) == 1:
+            self.section = self.titled = {
+                'number': value.strip()[7:].strip(), 'type': 'section',
+                'contents': []}
+            self.chapter['contents'].append(self.section)
+            self.article = None
+        else:
+            return False
+        return True
+
+    def paragraph(self, element):
+        '''point, or text without a number, of the current article'''
+        value = text(element).strip()
+        match = re.match(r'(\d+).', value)
+        if match is None:
+            self.point = {
+                'number': None, 'text': value, 'type': 'text',
+                'subpoints': []}
+        else:
+            self.point = {
+                'number': match.group(1), 'type': 'point', 'subpoints': [],
+                'text': re.match(r'\d+.\s+(.*)', value).group(1)}
+        self.article['contents'].append(self.point)
+
+    def table(self, element):
+        '''numbered point with its subpoints (as in Article 4), or subpoint
+        of the current point'''
+        ps = [text(p) for p in paragraphs(element)] + ['', '']
+        match = re.match(r'\((\d+)\)', ps[0])
+        if match is not None:
+            subpoints = []
+            for number, value in zip(ps[2:-2:2], ps[3:-1:2]):
+                match_subpoint = re.match(r'\((\w+)\)', number)
+                subpoints.append({
+                    'number': match_subpoint and match_subpoint.group(1),
+                    'text': value.strip(), 'type': 'subpoint'})
+            self.point = {
+                'number': match.group(1), 'text': ps[1].strip(),
+                'type': 'point', 'subpoints': subpoints}
+            self.article['contents'].append(self.point)
+            return
+        if self.point is None:
+            raise ValueError('subpoint before any point in Article {}'.format(
+                self.article['number']))
+        match = re.search(r'(\w+)', ps[0].strip())
+        self.point['subpoints'].append({
+            'number': match and match.group(1), 'text': ps[1].strip(),
+            'type': 'subpoint'})
+
+    def recital(self, element):
+        ps = [text(p) for p in paragraphs(element)]
+        self.recitals.append({
+            'number': re.match(r'\((\d+)\)', ps[0]).group(1),
+            # recitals of several paragraphs are separated by blank lines
+            'text': ' \n\n '.join(value.strip() for value in ps[1:]),
+            'type': 'recital'})
+
+    def citation(self, element):
+        match = re.match(r'\((\d+)\)\s+(.*)$', text(element).strip())
+        self.citations.append({
+            'number': match.group(1), 'text': match.group(2),
+            'type': 'citation'})
+
+    def result(self):
+        '''the JSON of the act, with keys in the order of gdpr.json'''
+        data = {}
+        for key in ('title', 'abbrv', 'regulation', 'dated', 'updated',
+                    'about', 'identifier', 'language'):
+            if key in self.document:
+                data[key] = self.document[key]
+            elif key in self.metadata:
+                data[key] = self.metadata[key]
+        data['chapters'] = self.chapters
+        data['recitals'] = self.recitals
+        # parse_gdpr.js serializes the citations as a jQuery object
+        data['citations'] = {
+            str(index): citation
+            for index, citation in enumerate(self.citations)}
+        return data
+
+
+def parse(path=GDPR_HTML, metadata=GDPR_METADATA):
+    '''parses the EUR-Lex XHTML at path into the JSON of the act'''
+    parser = Parser(metadata)
+    for element in elements(path):
+        parser.feed(element)
+    return parser.result()
+
+
+def dumps(data):
+    '''data as JSON, formatted as gdpr.json is'''
+    output = json.dumps(data, indent=2, ensure_ascii=False)
+    # empty lists are written over two lines
+    return re.sub(
+        r'(?m)^( *)("[^"]*": )\[\]', '\\1\\2[\n\\1  \n\\1]', output)
+
+
+def write(data, path):
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'w', encoding='utf-8') as fd:
+        fd.write(dumps(data))
+    os.replace(temp_path, path)
+
+
+if __name__ == '__main__':
+    import argparse
+    import difflib
+    import sys
+    parser = argparse.ArgumentParser(
+        description='parses the HTML of a regulation from EUR-Lex into JSON')
+    parser.add_argument('--html', default=GDPR_HTML, help='XHTML to parse')
+    parser.add_argument(
+        '--output', default=None,
+        help='JSON to write (default: ../deliverables/gdpr.json, or none '
+        'with --check; empty to not write any)')
+    parser.add_argument(
+        '--metadata',
+        help='JSON with title, abbrv, dated, and about of the act '
+        '(default: those of the GDPR)')
+    parser.add_argument(
+        '--check',
+        help='JSON to compare the output against, e.g. ../gdpr.json')
+    args = parser.parse_args()
+
+    metadata = GDPR_METADATA
+    if args.metadata:
+        with open(args.metadata) as fd:
+            metadata = json.load(fd)
+    data = parse(args.html, metadata)
+    output = args.output
+    if output is None and not args.check:
+        output = '../deliverables/gdpr.json'
+    if output:
+        write(data, output)
+    if args.check:
+        with open(args.check, encoding='utf-8') as fd:
+            expected = fd.read()
+        diff = list(difflib.unified_diff(
+            expected.splitlines(True), dumps(data).splitlines(True),
+            args.check, args.html))
+        if diff:
+            sys.stdout.writelines(diff)
+            sys.exit(1)
+        print('identical to {}'.format(args.check))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Runs a Python script in a new process and measures its peak memory (RSS)
+#
+# The ru_maxrss that os.wait4 returns for a child, and that the child itself
+# gets from resource.getrusage, includes the peak RSS of the process it was
+# started from, as Linux carries it over on fork and exec. A benchmark that
+# has loaded rdflib (or anything larger) thus reports at least its own size
+# for every process it runs. Instead, the script is run by this module,
+# which at exit writes the high water mark of the RSS of the memory of its
+# own process (VmHWM in /proc/self/status) to a pipe given by the parent.
+#
+# Usage:
+#   wall, rss, output = peak_memory.run(['generate_owl.py'], cwd='.')
+
+##############################################################################
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def peak_rss():
+    '''peak RSS of this process in MB'''
+    try:
+        with open('/proc/self/status') as fd:
+            for line in fd:
+                if line.startswith('VmHWM:'):
+                    # in kB
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(args, cwd=None, stdout=None, stderr=None):
+    '''runs the script args[0] with the arguments args[1:] in a new
+    process, with its output to stdout (or returned if it is PIPE), and
+    its errors to stderr
+    returns wall time in seconds, peak RSS in MB, and the output'''
+    import subprocess
+    import time
+    read_fd, write_fd = os.pipe()
+    start = time.perf_counter()
+    try:
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, 'peak_memory.py'),
+             str(write_fd)] + list(args),
+            cwd=cwd, stdout=stdout, stderr=stderr, pass_fds=(write_fd,))
+    finally:
+        os.close(write_fd)
+    with os.fdopen(read_fd) as fd:
+        output = process.communicate()[0]
+        report = fd.read()
+    wall = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError('{} failed with {}'.format(
+            args, process.returncode))
+    return wall, float(report), output
+
+
+if __name__ == '__main__':
+    import runpy
+    fd = int(sys.argv[1])
+    script = os.path.abspath(sys.argv[2])
+    sys.argv = sys.argv[2:]
+    sys.path[0] = os.path.dirname(script)
+    try:
+        runpy.run_path(script, run_name='__main__')
+    finally:
+        os.write(fd, str(peak_rss()).encode('ascii'))
+        os.close(fd)
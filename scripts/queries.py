@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Precomputed answers to the common navigation queries over the GDPR text
+#
+# Rather than a SPARQL query over the loaded graph for each of
+#   articles(id)   articles of a chapter or section
+#   points(id)     points of an article
+#   citing(id)     items (recitals, points, ...) that cite a citation
+#   subtree(id)    (id, number, title, text) of an item and everything in it
+#                  in document order
+# the answers are computed once from gdpr.json, by the same walk over
+# chapters, sections, articles, and points as graph_chapter() in
+# generate_rdf_pairings.py (through gdpr_text.py, which numbers unnumbered
+# points in the same way), and the cites of cross_references.py. They are
+# written to gdpr.queries.json along with the SHA-1 of the gdpr.json they
+# are from. Items are kept in document order with the position of their
+# last descendant (as in nested_sets.py), so that a subtree is a slice.
+#
+# Queries answers from a bounded LRU cache of the answers asked for, and
+# counts hits, misses, and evictions, so that the size of the cache can be
+# tuned. Before each query the modification time and size of gdpr.json are
+# checked, and if it changed and its hash is different, the answers are
+# computed again and the cache is emptied; if that fails, it is tried again
+# on the next query. The cache is shared by threads under a lock. An id
+# that is not in the text raises KeyError for every query and is not
+# cached, while an item with no answers (e.g. the points of a recital) has
+# an empty one.
+#
+# Usage:
+#   queries = Queries('../deliverables/gdpr.json')
+#   queries.articles('chapterIII-2')
+#   queries.stats()
+
+##############################################################################
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import cross_references
+import gdpr_text
+import snapshot
+
+VERSION = 1
+QUERIES = ('articles', 'points', 'citing', 'subtree')
+
+
+def build(gdpr_json):
+    '''answers to the queries for gdpr_json as a JSON-serialisable dict'''
+    gdpr = gdpr_text.from_json(gdpr_json)
+    ids, items, ends = [], [], []
+    articles, points, citing = {}, {}, {}
+
+    def visit(node):
+        position = len(ids)
+        ids.append(node.id)
+        items.append([node.number, node.title, node.text])
+        ends.append(position)
+        for child in node.children:
+            visit(child)
+        ends[position] = len(ids) - 1
+        if isinstance(node, gdpr_text.Article):
+            points[node.id] = [child.id for child in node.children]
+            for ancestor in node.ancestors():
+                articles.setdefault(ancestor.id, []).append(node.id)
+
+    for node in gdpr.chapters + gdpr.recitals + gdpr.citations:
+        visit(node)
+    for source, predicate, target in cross_references.extract(gdpr):
+        if predicate == 'cites':
+            citing.setdefault(target, []).append(source)
+    return {
+        'ids': ids, 'items': items, 'ends': ends,
+        'articles': articles, 'points': points, 'citing': citing,
+    }
+
+
+def write(json_path, path):
+    '''writes the answers for the gdpr.json at json_path to path'''
+    with open(json_path) as fd:
+        data = build(json.load(fd))
+    data['version'] = VERSION
+    data['json_hash'] = snapshot.file_hash(json_path)
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as fd:
+            json.dump(data, fd, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class Queries(object):
+    '''answers to the queries for the gdpr.json at json_path, read from
+    path if it is current, with an LRU cache of cache_size answers'''
+
+    def __init__(self, json_path, path=None, cache_size=1024):
+        self.json_path = json_path
+        self.path = path
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self.stat = None
+        self.json_hash = None
+        # queries may be answered from several threads
+        self.lock = threading.Lock()
+        self.refresh()
+
+    def load(self, json_hash):
+        '''reads the answers from path if they are for json_hash, and
+        otherwise computes them again (and writes them to path)'''
+        data = None
+        if self.path is not None and os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as fd:
+                data = json.load(fd)
+            if data.get('version') != VERSION or \
+                    data.get('json_hash') != json_hash:
+                data = None
+        if data is None:
+            if self.path is not None:
+                write(self.json_path, self.path)
+                with open(self.path, encoding='utf-8') as fd:
+                    data = json.load(fd)
+            else:
+                with open(self.json_path) as fd:
+                    data = build(json.load(fd))
+        # a few ids are minted twice in the text, the first is used
+        positions = {}
+        for position, id in enumerate(data['ids']):
+            positions.setdefault(id, position)
+        self.data, self.positions = data, positions
+
+    def refresh(self):
+        '''computes the answers again if gdpr.json changed
+        if that fails (e.g. gdpr.json is being written), it is tried again
+        on the next query'''
+        stat = os.stat(self.json_path)
+        stat = stat.st_mtime_ns, stat.st_size
+        if stat == self.stat:
+            return
+        json_hash = snapshot.file_hash(self.json_path)
+        if json_hash != self.json_hash:
+            self.load(json_hash)
+            if self.json_hash is not None:
+                self.invalidations += 1
+            self.json_hash = json_hash
+            self.cache.clear()
+        self.stat = stat
+
+    def query(self, name, id):
+        '''answer to the query name for id, from the cache if it is there
+        raises ValueError for an unknown query, and KeyError for an id that
+        is not in the text (which is not cached)'''
+        if name not in QUERIES:
+            raise ValueError('unknown query: {}'.format(name))
+        key = name, id
+        with self.lock:
+            self.refresh()
+            if key in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            if id not in self.positions:
+                raise KeyError(id)
+            self.misses += 1
+            result = self.answer(name, id)
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def answer(self, name, id):
+        '''answer to the query name for id, from the answers'''
+        if name == 'subtree':
+            start = self.positions[id]
+            end = self.data['ends'][start] + 1
+            return tuple(
+                (item_id, *item) for item_id, item in zip(
+                    self.data['ids'][start:end],
+                    self.data['items'][start:end]))
+        return tuple(self.data[name].get(id, ()))
+
+    def articles(self, id):
+        '''ids of the articles in the chapter or section id'''
+        return self.query('articles', id)
+
+    def points(self, id):
+        '''ids of the points of the article id'''
+        return self.query('points', id)
+
+    def citing(self, id):
+        '''ids of the items that cite the citation id'''
+        return self.query('citing', id)
+
+    def subtree(self, id):
+        '''(id, number, title, text) of id and everything in it'''
+        return self.query('subtree', id)
+
+    def stats(self):
+        '''hits, misses, evictions, and invalidations of the cache'''
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'size': len(self.cache),
+                'capacity': self.cache_size,
+            }
+
+if __name__ == '__main__':
+    import argparse
+    import random
+    import time
+    parser = argparse.ArgumentParser(
+        description='answers navigation queries over the GDPR text')
+    parser.add_argument(
+        '--json', default='../deliverables/gdpr.json',
+        help='path to gdpr.json')
+    parser.add_argument(
+        '--queries', default='../deliverables/gdpr.queries.json',
+        help='path to the precomputed answers')
+    parser.add_argument(
+        '--cache-size', type=int, default=1024,
+        help='number of answers to keep in the cache')
+    parser.add_argument(
+        '--benchmark', type=int, default=0, metavar='N',
+        help='answer N random queries and print the statistics')
+    parser.add_argument('query', nargs='?', choices=QUERIES)
+    parser.add_argument('id', nargs='?')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    queries = Queries(args.json, args.queries, args.cache_size)
+    print('loaded in {:.1f}ms'.format((time.perf_counter() - start) * 1000))
+    if args.query is not None:
+        if args.id is None:
+            parser.error('{} needs an id'.format(args.query))
+        try:
+            answers = queries.query(args.query, args.id)
+        except KeyError:
+            parser.error('unknown id: {}'.format(args.id))
+        for answer in answers:
+            print(answer)
+    if args.benchmark:
+        data = queries.data
+        # queries are skewed towards a few items, as navigation is
+        asked = [
+            ('articles', id) for id in data['articles']] + [
+            ('points', id) for id in data['points']] + [
+            ('citing', id) for id in data['citing']] + [
+            ('subtree', id) for id in data['articles']] + [
+            ('subtree', id) for id in data['points']]
+        generator = random.Random(0)
+        weights = [1 / (rank + 1) for rank in range(len(asked))]
+        generator.shuffle(asked)
+        sample = generator.choices(asked, weights, k=args.benchmark)
+        start = time.perf_counter()
+        for name, id in sample:
+            queries.query(name, id)
+        seconds = time.perf_counter() - start
+        print('{} queries in {:.3f}s, {:.1f}us each'.format(
+            len(sample), seconds, seconds / len(sample) * 1e6))
+        print(json.dumps(queries.stats(), indent=2))
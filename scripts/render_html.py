@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Renders the GDPR text as HTML from gdpr.json, without a browser
+#
+# fancy_format_gdpr.js builds a page of the text, in which every item can be
+# referenced by its HTML id, by emptying the page in the browser and adding
+# elements from data (gdpr.json) with jQuery. This builds the same markup
+# (ids and classes) in Python, as
+#   a fragment for each article (article17.html) and recital (recital71.html)
+#   which can be served or embedded on their own
+#   the full page (gdpr.html) made of the fragments and the rest of the text
+# The only difference is that points are divs rather than paragraphs, as a
+# paragraph cannot contain the paragraphs of its subpoints when parsed.
+# Section ids (section1, ...) repeat in every chapter, as they do there.
+#
+# The ids are those of fancy_format_gdpr.js (recital-1, article17-1-a),
+# while the published ../gdpr.html uses R1, A17-1, and A17-1a. So that
+# links into the published page (#R71, #A17) work on this one too, recitals,
+# articles, points, and subpoints start with an empty anchor with the
+# published id. Only the ids the published page gives to items without them
+# in gdpr.json (A49-6a for the points of Article 50, A53-1a for the dashes
+# of Article 53(1)) are not there.
+#
+# Fragments are written to a folder with an index, index.json, of
+#   fragments: name -> {hash of its JSON, etag (hash of its HTML), path}
+#   page: {etag, path}
+# When the text changes, only the fragments whose JSON (the article or
+# recital and everything in it) has a different hash are rendered again;
+# the rest are read back from the folder to put the page together, and the
+# page is only written if it changed. The etags can be used as is for
+# caching when serving the files.
+
+##############################################################################
+import hashlib
+import html
+import json
+import os
+
+# rendered again when the markup changes
+VERSION = '2'
+STYLE = '''body {
+    max-width: 1024px;
+    margin: auto;
+}
+.point {
+    margin-left: 5px;
+}
+.subpoint {
+    margin-left: 15px;
+}'''
+PAGE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+{style}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+'''
+
+
+def element(tag, text='', id=None, class_=None, children=(), anchor=None):
+    '''HTML of an element with escaped text followed by children
+    starting with an empty anchor with the id anchor, if given'''
+    attributes = ''.join(
+        ' {}="{}"'.format(name, html.escape(value))
+        for name, value in (('id', id), ('class', class_))
+        if value is not None)
+    return '<{}{}>{}{}{}</{}>'.format(
+        tag, attributes,
+        '' if anchor is None else '<a id="{}"></a>'.format(
+            html.escape(anchor)),
+        html.escape(text, quote=False),
+        ''.join('\n' + child for child in children) +
+        ('\n' if children else ''), tag)
+
+
+def render_recital(recital):
+    return element(
+        'p', '({}) {}'.format(recital['number'], recital['text']),
+        'recital-' + recital['number'], 'recital',
+        anchor='R' + recital['number'])
+
+
+def render_article(article):
+    id = 'article' + article['number']
+    # id of the article in the published gdpr.html
+    published = 'A' + article['number']
+    points = []
+    for point in article['contents']:
+        if point['number'] is not None:
+            point_id = '{}-{}'.format(id, point['number'])
+            point_anchor = '{}-{}'.format(published, point['number'])
+            text = '({}) {}'.format(point['number'], point['text'])
+        else:
+            point_id = point_anchor = None
+            text = point['text']
+        subpoints = []
+        for subpoint in point['subpoints']:
+            if subpoint['number'] is None:
+                subpoints.append(element(
+                    'p', '- ' + subpoint['text'], class_='subpoint'))
+                continue
+            subpoint_id = subpoint_anchor = None
+            if point_id is not None:
+                subpoint_id = '{}-{}'.format(point_id, subpoint['number'])
+                subpoint_anchor = point_anchor + subpoint['number']
+            subpoints.append(element(
+                'p', '({}) {}'.format(subpoint['number'], subpoint['text']),
+                subpoint_id, 'subpoint', anchor=subpoint_anchor))
+        points.append(element(
+            'div', text, point_id, 'point', subpoints, point_anchor))
+    return element('div', id=id, class_='article', anchor=published,
+                   children=[element(
+                       'h3', 'Article {} {}'.format(
+                           article['number'], article['title']),
+                       class_='article-title')] + points)
+
+
+def articles(chapter):
+    '''articles of chapter, within sections or not'''
+    for item in chapter['contents']:
+        if item['type'] == 'section':
+            yield from item['contents']
+        else:
+            yield item
+
+
+def fragments(gdpr_json):
+    '''yields (name, item, render) of the recitals and articles in
+    gdpr_json in document order'''
+    for recital in gdpr_json['recitals']:
+        yield 'recital' + recital['number'], recital, render_recital
+    for chapter in gdpr_json['chapters']:
+        for article in articles(chapter):
+            yield 'article' + article['number'], article, render_article
+
+
+def content_hash(item):
+    '''hash of the JSON of item, and of the version of the markup'''
+    material = VERSION + json.dumps(
+        item, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(material.encode('utf-8')).hexdigest()
+
+
+def render_page(gdpr_json, rendered):
+    '''HTML of the whole text, using rendered[name] for the fragments'''
+    body = [
+        element('h1', '{} ({})'.format(
+            gdpr_json['title'], gdpr_json['abbrv']), 'title', 'title'),
+        element('p', gdpr_json['about'], 'about', 'description'),
+        element('div', id='recitals', children=[
+            element('h2', 'Recitals', class_='recital-title')] + [
+            rendered['recital' + recital['number']]
+            for recital in gdpr_json['recitals']])]
+    for chapter in gdpr_json['chapters']:
+        children = [element('h2', 'Chapter {} {}'.format(
+            chapter['number'], chapter['title']), class_='chapter-title')]
+        for item in chapter['contents']:
+            if item['type'] == 'section':
+                children.append(element(
+                    'div', id='section' + item['number'], class_='section',
+                    children=[element('h3', 'Section {} {}'.format(
+                        item['number'], item['title']),
+                        class_='section-title')] + [
+                        rendered['article' + article['number']]
+                        for article in item['contents']]))
+            else:
+                children.append(rendered['article' + item['number']])
+        body.append(element(
+            'div', id='chapter' + chapter['number'], class_='chapter',
+            children=children))
+    body.append(element('div', id='citations', children=[
+        element('h2', 'References', class_='citation-title')] + [
+        element(
+            'p', '({}) {}'.format(citation['number'], citation['text']),
+            'citation-' + citation['number'], 'citation')
+        for citation in gdpr_json['citations'].values()]))
+    return PAGE.format(
+        title=html.escape('{} ({})'.format(
+            gdpr_json['title'], gdpr_json['abbrv'])),
+        style=STYLE, body='\n'.join(body))
+
+
+def etag(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def write_file(path, text):
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as fd:
+            fd.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def build(gdpr_json, folder, page='gdpr.html'):
+    '''renders the fragments of gdpr_json that changed, and the page, to
+    folder
+    returns {'rendered': [names], 'reused': count, 'removed': [names],
+    'page': whether it was written}'''
+    os.makedirs(folder, exist_ok=True)
+    index_path = os.path.join(folder, 'index.json')
+    previous = {'fragments': {}, 'page': {}}
+    if os.path.exists(index_path):
+        with open(index_path) as fd:
+            previous = json.load(fd)
+    index, rendered, report = {}, {}, {'rendered': [], 'reused': 0}
+    for name, item, render in fragments(gdpr_json):
+        hash = content_hash(item)
+        path = os.path.join(folder, name + '.html')
+        entry = previous['fragments'].get(name)
+        if entry is not None and entry['hash'] == hash and \
+                os.path.exists(path):
+            with open(path, encoding='utf-8') as fd:
+                rendered[name] = fd.read()
+            report['reused'] += 1
+        else:
+            rendered[name] = render(item)
+            write_file(path, rendered[name])
+            entry = {'hash': hash, 'etag': etag(rendered[name])}
+            report['rendered'].append(name)
+        index[name] = {
+            'hash': hash, 'etag': entry['etag'], 'path': name + '.html'}
+    report['removed'] = [
+        name for name in previous['fragments'] if name not in index]
+    for name in report['removed']:
+        path = os.path.join(folder, name + '.html')
+        if os.path.exists(path):
+            os.remove(path)
+    text = render_page(gdpr_json, rendered)
+    page_path = os.path.join(folder, page)
+    report['page'] = not os.path.exists(page_path) or \
+        etag(text) != previous['page'].get('etag')
+    if report['page']:
+        write_file(page_path, text)
+    write_file(index_path, json.dumps({
+        'fragments': index,
+        'page': {'etag': etag(text), 'path': page},
+    }, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    import generate_rdf_pairings as pairings
+    parser = argparse.ArgumentParser(
+        description='renders HTML of the GDPR text from gdpr.json')
+    parser.add_argument(
+        '--json', default='../deliverables/gdpr.json',
+        help='path to gdpr.json')
+    parser.add_argument(
+        '--output', default='../deliverables/html',
+        help='folder to write the page and fragments to')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = build(pairings.load_json(args.json), args.output)
+    print('{} rendered, {} unchanged, {} removed, page {}'.format(
+        len(report['rendered']), report['reused'], len(report['removed']),
+        'written' if report['page'] else 'unchanged'))
+    print('total {:.3f}s'.format(time.perf_counter() - start))
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Full-text search over the GDPR text
+#
+# Every item with text (points, subpoints, recitals, citations), i.e. every
+# resource generate_rdf_pairings.py gives an eli:description, is indexed
+# under the same id as its IRI. The index is an inverted index with the
+# positions of each term in each item, so that phrases can be matched, and
+# results are ranked using BM25. It is built once from gdpr.json (see
+# gdpr_text.py) and written as JSON.
+#
+# When loaded, the BM25 score of each term in each item (its impact) is
+# computed, and the items of each term are ordered by it. The best results
+# for words are then found by reading these orderings in parallel, only as
+# far as needed: once the worst of the best results found scores more than
+# the sum of the impacts at the current depth, which no item not yet seen
+# can exceed, the rest are not read. With phrases, only the items that
+# contain them are scored: those with their rarest word if it is rare
+# enough, otherwise those read that turn out to contain them.
+#
+# Queries are words, matched in any item, and "quoted phrases", which an
+# item must contain for it to match, e.g.
+#   "legitimate interest" controller
+# Each result has the id of the item, its score, and the ids of the
+# chapter, section, article, and point it is part of.
+
+##############################################################################
+import heapq
+import json
+import math
+import os
+import re
+
+import gdpr_text
+
+TOKEN = re.compile(r'\w+')
+QUERY = re.compile(r'"([^"]*)"|(\S+)')
+# phrases with a word in at most this many items are matched in those items
+# before scoring, others only in the items read for their words
+PHRASE_SCAN = 100
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def build(gdpr):
+    '''builds the index for GDPRText gdpr as a JSON-serialisable dict'''
+    ids, paths, lengths = [], [], []
+    postings = {}
+    for node in gdpr:
+        if node.text is None:
+            continue
+        doc = len(ids)
+        ids.append(node.id)
+        paths.append([n.id for n in reversed(list(node.ancestors()))])
+        tokens = tokenize(node.text)
+        lengths.append(len(tokens))
+        for position, token in enumerate(tokens):
+            entries = postings.setdefault(token, [])
+            if not entries or entries[-1][0] != doc:
+                entries.append([doc])
+            entries[-1].append(position)
+    return {'ids': ids, 'paths': paths, 'lengths': lengths,
+            'postings': postings}
+
+
+class SearchIndex(object):
+    '''inverted index over the GDPR text, loaded from build()'''
+
+    def __init__(self, data):
+        self.ids = data['ids']
+        self.paths = data['paths']
+        self.lengths = data['lengths']
+        # an index of no items, or of no words, has no average length
+        average_length = sum(self.lengths) / max(len(self.lengths), 1) or 1
+        # length normalisation of BM25 for each doc
+        self.norms = [
+            K1 * (1 - B + B * length / average_length)
+            for length in self.lengths]
+        # term -> {doc: [positions]}
+        self.postings = {
+            term: {entry[0]: entry[1:] for entry in entries}
+            for term, entries in data['postings'].items()}
+        n = len(self.ids)
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()}
+        # term -> {doc: BM25 score of term in doc}, and term -> [(score,
+        # doc)] with the highest scores first
+        self.impacts = {}
+        self.ranked = {}
+        for term, docs in self.postings.items():
+            idf = self.idf[term]
+            impacts = self.impacts[term] = {
+                doc: idf * len(positions) * (K1 + 1) / (
+                    len(positions) + self.norms[doc])
+                for doc, positions in docs.items()}
+            self.ranked[term] = sorted(
+                ((impact, doc) for doc, impact in impacts.items()),
+                key=lambda entry: -entry[0])
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fd:
+            return cls(json.load(fd))
+
+    def contains(self, doc, tokens):
+        '''whether doc contains tokens consecutively'''
+        starts = None
+        for offset, token in enumerate(tokens):
+            positions = self.postings.get(token, {}).get(doc)
+            if positions is None:
+                return False
+            shifted = {position - offset for position in positions}
+            starts = shifted if starts is None else starts & shifted
+            if not starts:
+                return False
+        return True
+
+    def search(self, query, limit=10):
+        '''returns up to limit (id, score, path) for query, best first'''
+        terms, phrases = [], []
+        for phrase, word in QUERY.findall(query):
+            tokens = tokenize(phrase or word)
+            if phrase and len(tokens) > 1:
+                phrases.append(tokens)
+            terms.extend(tokens)
+        terms = [term for term in set(terms) if term in self.impacts]
+        if phrases:
+            rarest = min(
+                (self.postings.get(token, {}) for tokens in phrases
+                 for token in tokens), key=len)
+            if len(rarest) <= PHRASE_SCAN:
+                best = heapq.nlargest(limit, (
+                    (sum(self.impacts[term].get(doc, 0) for term in terms),
+                     -doc) for doc in rarest if all(
+                        self.contains(doc, tokens) for tokens in phrases)))
+            else:
+                best = self.top(terms, limit, lambda doc: all(
+                    self.contains(doc, tokens) for tokens in phrases))
+        else:
+            best = self.top(terms, limit)
+        return [(self.ids[-doc], score, self.paths[-doc])
+                for score, doc in best]
+
+    def top(self, terms, limit, accept=None):
+        '''up to limit (score, -doc) of the docs with the highest scores for
+        terms, best first, reading the docs of each term by impact only
+        until no doc not yet seen can be better
+        only docs for which accept(doc) is true are scored, if given'''
+        best = []
+        if limit < 1:
+            return best
+        seen = set()
+        lists = [self.ranked[term] for term in terms]
+        for depth in range(max(map(len, lists), default=0)):
+            threshold = 0
+            for ranked in lists:
+                if depth >= len(ranked):
+                    continue
+                impact, doc = ranked[depth]
+                threshold += impact
+                if doc in seen:
+                    continue
+                seen.add(doc)
+                if accept is not None and not accept(doc):
+                    continue
+                # equal scores are ordered as the docs are
+                entry = (sum(self.impacts[term].get(doc, 0)
+                             for term in terms), -doc)
+                if len(best) < limit:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+            if len(best) == limit and best[0][0] > threshold:
+                break
+        return sorted(best, reverse=True)
+
+
+def write(json_path, path):
+    '''writes the index for the gdpr.json at json_path to path'''
+    index = build(gdpr_text.load(json_path))
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp_path, 'w') as fd:
+            json.dump(index, fd, separators=(',', ':'))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='builds or searches the full-text index of GDPR text')
+    parser.add_argument(
+        '--json', default='../deliverables/gdpr.json',
+        help='path to gdpr.json')
+    parser.add_argument(
+        '--index', default='../deliverables/gdpr.index.json',
+        help='path to the index')
+    parser.add_argument(
+        '--build', action='store_true', help='build the index first')
+    parser.add_argument(
+        '--limit', type=int, default=10, help='number of results')
+    parser.add_argument('query', nargs='?', help='query to search for')
+    args = parser.parse_args()
+
+    if args.build:
+        write(args.json, args.index)
+    if args.query:
+        index = SearchIndex.load(args.index)
+        for id, score, path in index.search(args.query, args.limit):
+            print('{:>7.3f} {} ({})'.format(score, id, ' > '.join(path)))
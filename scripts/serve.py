@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Linked data server for the resources of the GDPR text
+#
+# Serves every resource minted by generate_rdf_pairings.py at /<id>, e.g.
+#   /article17-3-b  (http://purl.org/adaptcentre/resources/GDPRtEXT#...)
+# as Turtle, N-Triples, JSON-LD, or its fragment of gdpr.html, chosen by the
+# Accept header, or by an extension as in /article17.jsonld. Items without
+# an element of their own in gdpr.html are served the element of the item
+# they are part of. RDF/XML and N3 are also served, but are produced on
+# demand and kept in a bounded LRU cache.
+#
+# Everything else is precomputed by fragments.py: each body, its gzip
+# compressed form (sent if the client accepts gzip), and a strong ETag, so
+# answering a request involves no serialization or compression. Responses
+# vary on Accept and Accept-Encoding, and If-None-Match is answered with
+# 304 Not Modified. The server uses only asyncio from the standard library,
+# speaks HTTP/1.1 with keep-alive, and needs no network access other than
+# the port it listens on.
+
+##############################################################################
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+
+import fragments
+
+# preferred first when the client accepts several equally
+PREFERENCE = tuple(fragments.MEDIA_TYPES)
+REASONS = {
+    200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 406: 'Not Acceptable',
+}
+
+
+def parse_accept(header):
+    '''returns [(media range, q)] for an Accept header'''
+    ranges = []
+    for part in header.split(','):
+        media, *params = [p.strip() for p in part.split(';')]
+        if not media:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        ranges.append((media.lower(), q))
+    return ranges
+
+
+def quality(ranges, media_type):
+    '''q of the most specific range in ranges that matches media_type'''
+    major = media_type.split('/')[0]
+    best, specificity = 0.0, 0
+    for media, q in ranges:
+        if media == media_type:
+            match = 3
+        elif media == major + '/*':
+            match = 2
+        elif media == '*/*':
+            match = 1
+        else:
+            continue
+        if match > specificity:
+            best, specificity = q, match
+    return best
+
+
+def negotiate(header, available):
+    '''extension from available that best matches the Accept header, or
+    None if none is acceptable'''
+    available = [e for e in PREFERENCE if e in available]
+    if not header:
+        return available[0] if available else None
+    ranges = parse_accept(header)
+    best, best_q = None, 0.0
+    for extension in available:
+        q = quality(ranges, fragments.MEDIA_TYPES[extension])
+        if q > best_q:
+            best, best_q = extension, q
+    return best
+
+
+def accepts_gzip(header):
+    for media, q in parse_accept(header or ''):
+        if media in ('gzip', '*') and q > 0:
+            return True
+    return False
+
+
+def etag_matches(header, etag):
+    '''whether the If-None-Match header matches etag (with its quotes),
+    comparing whole tags weakly, as for GET and HEAD'''
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == '*' or tag == etag:
+            return True
+    return False
+
+
+class Fragments(object):
+    '''fragments written by fragments.py, with an LRU cache of the formats
+    that are produced on demand'''
+
+    def __init__(self, path, cache_size=256):
+        with open(path, 'rb') as fd:
+            self.data = memoryview(fd.read())
+        with open(path + '.json') as fd:
+            self.index = json.load(fd)
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = self.misses = 0
+        # get() is called from the threads of the executor
+        self.lock = threading.Lock()
+
+    def __contains__(self, id):
+        return id in self.index
+
+    def available(self, id):
+        '''extensions id can be served in'''
+        formats = set(self.index[id])
+        if 'nt' in formats:
+            formats.update(('rdf', 'n3'))
+        if self.html_id(id) is not None:
+            formats.add('html')
+        return formats
+
+    def html_id(self, id):
+        '''id of the nearest item, from id upwards, with an HTML fragment'''
+        while id not in self.index or 'html' not in self.index[id]:
+            if '-' not in id:
+                return None
+            id = id.rsplit('-', 1)[0]
+        return id
+
+    def stored(self, id, extension):
+        offset, length, gzip_offset, gzip_length, etag = \
+            self.index[id][extension]
+        return (
+            self.data[offset:offset + length],
+            self.data[gzip_offset:gzip_offset + gzip_length], etag)
+
+    def get(self, id, extension):
+        '''returns (body, gzip compressed body, etag) of id in extension'''
+        if extension == 'html':
+            return self.stored(self.html_id(id), extension)
+        if extension in self.index[id]:
+            return self.stored(id, extension)
+        key = id, extension
+        with self.lock:
+            if key in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            self.misses += 1
+        # rendered without the lock, so that other formats are not held up
+        lines = str(self.stored(id, 'nt')[0], 'utf-8').splitlines(True)
+        result = fragments.representation(
+            fragments.render(lines, extension))
+        with self.lock:
+            self.cache[key] = result
+            self.cache.move_to_end(key)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return result
+
+
+class Server(object):
+
+    def __init__(self, fragments):
+        self.fragments = fragments
+
+    async def respond(self, method, target, headers):
+        '''returns (status, headers, body) for a request'''
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, b''
+        path = target.split('?', 1)[0]
+        id = path.rsplit('/', 1)[-1]
+        extension = None
+        if '.' in id:
+            id, extension = id.rsplit('.', 1)
+        if id not in self.fragments or extension is not None and \
+                extension not in fragments.MEDIA_TYPES:
+            return 404, {}, b''
+        available = self.fragments.available(id)
+        if extension is None:
+            extension = negotiate(headers.get('accept'), available)
+        elif extension not in available:
+            extension = None
+        if extension is None:
+            return 406, {}, b''
+
+        if extension in self.fragments.index[id] or extension == 'html':
+            body, compressed, etag = self.fragments.get(id, extension)
+        else:
+            # produced on demand, which is kept off the event loop
+            loop = asyncio.get_running_loop()
+            body, compressed, etag = await loop.run_in_executor(
+                None, self.fragments.get, id, extension)
+        response = {
+            'Content-Type':
+                fragments.MEDIA_TYPES[extension] + '; charset=utf-8',
+            'Content-Location': '/{}.{}'.format(id, extension),
+            'Vary': 'Accept, Accept-Encoding',
+        }
+        if accepts_gzip(headers.get('accept-encoding')):
+            body = compressed
+            response['Content-Encoding'] = 'gzip'
+            etag += '-gzip'
+        response['ETag'] = '"{}"'.format(etag)
+        if etag_matches(headers.get('if-none-match', ''), response['ETag']):
+            return 304, response, b''
+        return 200, response, body
+
+    async def handle(self, reader, writer):
+        '''serves the requests on a connection until it is closed'''
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = \
+                        request_line.decode('latin-1').split()
+                except ValueError:
+                    status, response, body = 400, {}, b''
+                    method, version = None, 'HTTP/1.0'
+                else:
+                    status, response, body = await self.respond(
+                        method, target, headers)
+                keep_alive = (
+                    version == 'HTTP/1.1' and status != 400 and
+                    headers.get('connection', '').lower() != 'close' and
+                    'content-length' not in headers)
+                response['Content-Length'] = str(len(body))
+                response['Connection'] = 'keep-alive' if keep_alive \
+                    else 'close'
+                head = ['HTTP/1.1 {} {}'.format(status, REASONS[status])]
+                head.extend(
+                    '{}: {}'.format(name, value)
+                    for name, value in response.items())
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode(
+                    'latin-1'))
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def main(path, host, port, cache_size):
+    server = Server(Fragments(path, cache_size))
+    listener = await asyncio.start_server(server.handle, host, port)
+    print('serving {} resources on http://{}:{}/'.format(
+        len(server.fragments.index), host, port), flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='serves resources of GDPR text as linked data')
+    parser.add_argument(
+        '--fragments', default='../deliverables/gdpr.fragments',
+        help='fragments written by fragments.py')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument(
+        '--cache-size', type=int, default=256,
+        help='number of on-demand fragments to keep')
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(
+            args.fragments, args.host, args.port, args.cache_size))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Sharded distributions of the RDF for GDPR text
+#
+# gdpr.nt is split into one shard per chapter and per article, and one each
+# for the recitals and the citations, so that clients which only need, say,
+# Chapter III can download and parse just that. A triple is in the shard of
+# every chapter and article its subject is part of, so the shard of a
+# chapter contains those of its articles. Each shard is written in every
+# format to shards/<id>.<extension>, and the Turtle, N3, and JSON-LD shards
+# all start with the same prefixes (or @context), which covers every
+# namespace used in the GDPR text, so they can be concatenated or cached
+# alike. Shards are written in parallel, one process per shard.
+#
+# The shards are described in gdpr_distributions.ttl as void:subset of the
+# annotated dataset, each with its triple count, and a dcat:Distribution per
+# format with its size in bytes. This is kept between the BEGIN and END
+# comments below, which are replaced each time the shards are written.
+
+##############################################################################
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from rdflib import Graph, RDF, RDFS, XSD
+
+import gdpr_text
+import generate_rdf_pairings as pairings
+import instrumentation
+import nested_sets
+
+PREFIXES = (
+    ('GDPRtEXT', pairings.GDPRtEXT),
+    ('dcterms', pairings.DCTERMS),
+    ('eli', pairings.ELI),
+    ('gdpr', pairings.GDPR),
+    ('rdf', RDF),
+    ('rdfs', RDFS),
+    ('xsd', XSD),
+)
+HEADER = ''.join(
+    '@prefix {}: <{}> .\n'.format(prefix, namespace)
+    for prefix, namespace in PREFIXES) + '\n'
+CONTEXT = {prefix: str(namespace) for prefix, namespace in PREFIXES}
+# file extension -> media type, as in gdpr_distributions.ttl
+MEDIA_TYPES = {
+    'ttl': 'text/turtle',
+    'rdf': 'application/rdf+xml',
+    'n3': 'text/n3',
+    'nt': 'application/n_triples',
+    'jsonld': 'application/ld+json',
+}
+DOWNLOAD_URL = 'https://w3id.org/GDPRtEXT/shards/'
+BEGIN = '# BEGIN shards (written by scripts/shards.py)\n'
+END = '# END shards\n'
+
+
+def shard_ids(index):
+    '''returns a dict of id -> ids of the shards triples about it are in'''
+    shards = {}
+    for position, id in enumerate(index.ids):
+        kind = index.kinds[position]
+        if kind in ('recital', 'citation'):
+            shards[id] = [kind + 's']
+            continue
+        shards[id] = [
+            ancestor for ancestor in [id] + index.ancestors(id)
+            if index.kind(ancestor) in ('chapter', 'article')]
+    return shards
+
+
+def split(nt_path, index):
+    '''returns a dict of shard id -> N-Triples lines at nt_path in the
+    shard, with shards in document order'''
+    shards = shard_ids(index)
+    prefix = '<{}'.format(pairings.GDPR_URI)
+    lines = {}
+    for id in index.ids:
+        for shard in shards[id]:
+            lines.setdefault(shard, {})
+    with open(nt_path, encoding='utf-8') as fd:
+        for line in fd:
+            subject = line.split(' ', 1)[0]
+            if not subject.startswith(prefix):
+                continue
+            for shard in shards.get(subject[len(prefix):-1], ()):
+                lines[shard][line] = None
+    return {shard: list(shard_lines) for shard, shard_lines in lines.items()}
+
+
+def serialize_shard(g, extension):
+    '''returns the shard in g serialized in the format for extension'''
+    format = pairings.FORMATS[extension]
+    if extension == 'jsonld':
+        return g.serialize(format=format, context=CONTEXT)
+    text = g.serialize(format=format)
+    if extension in ('ttl', 'n3') and text.startswith('@prefix'):
+        # rdflib only declares the prefixes used in g
+        text = HEADER + text.split('\n\n', 1)[-1]
+    return text
+
+
+def write_shard(folder, shard, lines, formats):
+    '''writes the N-Triples lines of shard in formats to folder
+    returns the number of triples and size in bytes of each file'''
+    sizes = {}
+    g = None
+    for extension in formats:
+        path = '{}/{}.{}'.format(folder, shard, extension)
+        if extension == 'nt':
+            text = ''.join(lines)
+        else:
+            if g is None:
+                g = Graph(bind_namespaces='none')
+                for prefix, namespace in PREFIXES:
+                    g.bind(prefix, namespace)
+                g.parse(data=''.join(lines), format='nt')
+            text = serialize_shard(g, extension)
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as stream:
+                stream.write(text)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        sizes[extension] = os.path.getsize(path)
+    return {'triples': len(lines), 'sizes': sizes}
+
+
+def write(nt_path, json_path, folder, formats=tuple(pairings.FORMATS),
+          jobs=None):
+    '''writes the shards of the N-Triples at nt_path, generated from the
+    gdpr.json at json_path, in formats to folder using jobs processes
+    returns a dict of shard id -> triples and sizes, in document order'''
+    index = nested_sets.IntervalIndex(
+        nested_sets.build(gdpr_text.load(json_path)))
+    os.makedirs(folder, exist_ok=True)
+    with ProcessPoolExecutor(
+            max_workers=jobs, initializer=instrumentation.detach) as executor:
+        futures = {
+            shard: executor.submit(write_shard, folder, shard, lines, formats)
+            for shard, lines in split(nt_path, index).items()}
+        return {shard: future.result() for shard, future in futures.items()}
+
+
+def title(shard):
+    if shard.startswith('chapter'):
+        return 'Chapter ' + shard[len('chapter'):]
+    if shard.startswith('article'):
+        return 'Article ' + shard[len('article'):]
+    return shard.capitalize()
+
+
+def describe(report):
+    '''returns the description of the shards in report, from write(), as
+    Turtle in the style of gdpr_distributions.ttl'''
+    blocks = [BEGIN]
+    subsets = ',\n        '.join(
+        'gdprdist:shard_{}'.format(shard) for shard in report)
+    blocks.append(
+        '\ngdprdist:annotated_dataset void:subset {} .\n'.format(subsets))
+    for shard, result in report.items():
+        distributions = ',\n        '.join(
+            'gdprdist:shard_{}_{}'.format(shard, extension)
+            for extension in result['sizes'])
+        root = ''
+        if shard.startswith(('chapter', 'article')):
+            root = '    void:rootResource <{}{}> ;\n'.format(
+                pairings.GDPR_URI, shard)
+        blocks.append(
+            '\ngdprdist:shard_{shard} a void:Dataset, dcat:Dataset ;\n'
+            '    dcterms:title "{title} of GDPR (GDPRtEXT)"^^xsd:string ;\n'
+            '{root}'
+            '    void:triples {triples} ;\n'
+            '    dcat:distribution {distributions} ;\n'
+            '    dcterms:license '
+            '<https://creativecommons.org/licenses/by/4.0/> .\n'.format(
+                shard=shard, title=title(shard), root=root,
+                triples=result['triples'], distributions=distributions))
+        for extension, size in result['sizes'].items():
+            url = '{}{}.{}'.format(DOWNLOAD_URL, shard, extension)
+            blocks.append(
+                '\ngdprdist:shard_{}_{} a dcat:Distribution ;\n'
+                '    dcat:downloadURL "{}"^^xsd:string ;\n'
+                '    dcterms:mediaType "{}" ;\n'
+                '    dcat:byteSize "{}"^^xsd:decimal .\n'.format(
+                    shard, extension, url, MEDIA_TYPES[extension], size))
+    blocks.append('\n' + END)
+    return ''.join(blocks)
+
+
+def update_distributions(path, report):
+    '''replaces the description of the shards in the distributions file at
+    path with that of report, from write()'''
+    with open(path, encoding='utf-8') as fd:
+        text = fd.read()
+    if BEGIN in text and END in text:
+        before, rest = text.split(BEGIN, 1)
+        after = rest.split(END, 1)[1]
+    else:
+        before, after = text.rstrip('\n') + '\n\n', ''
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as stream:
+            stream.write(before + describe(report) + after)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='writes per-chapter and per-article shards of gdpr.nt')
+    parser.add_argument(
+        '--json', default=pairings.GDPR_JSON, help='path to gdpr.json')
+    parser.add_argument(
+        '--nt', default=pairings.DELIVERABLES + '/gdpr.nt',
+        help='path to gdpr.nt')
+    parser.add_argument(
+        '--output', default=pairings.DELIVERABLES + '/shards',
+        help='folder to write shards to')
+    parser.add_argument(
+        '--formats', default=','.join(pairings.FORMATS),
+        help='comma separated file extensions to write')
+    parser.add_argument(
+        '--jobs', type=int, default=None,
+        help='number of processes (default: all cores)')
+    parser.add_argument(
+        '--distributions', default='../gdpr_distributions.ttl',
+        help='distributions file to describe the shards in (empty for none)')
+    args = parser.parse_args()
+    formats = args.formats.split(',')
+    for extension in formats:
+        if extension not in pairings.FORMATS:
+            parser.error('unknown format: {}'.format(extension))
+
+    report = write(args.nt, args.json, args.output, formats, args.jobs)
+    print('{} shards, {} triples'.format(
+        len(report), sum(result['triples'] for result in report.values())))
+    if args.distributions:
+        update_distributions(args.distributions, report)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Binary snapshot of the RDF for GDPR text, for loading without parsing
+#
+# The snapshot is written from gdpr.nt and contains:
+#   - a header with a magic string, format version, the SHA-1 of the
+#     gdpr.nt it was written from, and the counts below
+#   - the term table: every distinct term in its N-Triples form, sorted,
+#     stored as an array of uint32 offsets into a UTF-8 blob
+#   - the triples as an array of uint32 (subject, predicate, object) term
+#     ids, sorted, so that the triples of a subject are contiguous
+# All integers are little-endian. The file is memory-mapped when opened, so
+# nothing is decoded until used, and worker processes that open the same
+# snapshot share its pages read-only through the page cache.
+#
+# A snapshot is only used if its version and the hash of gdpr.nt match;
+# otherwise (e.g. gdpr.nt was since built from another gdpr.json, or with
+# --compact) load() reparses gdpr.nt and writes the snapshot again.
+
+##############################################################################
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b'GDPRSNAP'
+VERSION = 2
+# magic, version, gdpr.nt sha1 (hex), number of terms, number of triples,
+# length of the term blob
+HEADER = struct.Struct('<8sI40sIII')
+
+
+def file_hash(path):
+    '''SHA-1 of the contents of the file at path'''
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as fd:
+        for chunk in iter(lambda: fd.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def parse_nt_line(line):
+    '''splits an N-Triples line, as written by rdflib, into its three terms
+    subjects and predicates are IRIs, so they cannot contain spaces'''
+    subject, predicate, rest = line.split(' ', 2)
+    return subject, predicate, rest.rstrip()[:-2]
+
+
+def uint32_array(values):
+    data = array('I', values)
+    if data.itemsize != 4:
+        data = array('L', values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data
+
+
+def write(nt_path, path):
+    '''writes the snapshot of the N-Triples at nt_path to path'''
+    triples = set()
+    with open(nt_path, encoding='utf-8') as fd:
+        for line in fd:
+            if line.strip():
+                triples.add(parse_nt_line(line))
+    terms = sorted({term for triple in triples for term in triple})
+    ids = {term: i for i, term in enumerate(terms)}
+    blob = bytearray()
+    offsets = [0]
+    for term in terms:
+        blob += term.encode('utf-8')
+        offsets.append(len(blob))
+    blob += b'\0' * (-len(blob) % 4)
+    encoded = sorted(
+        (ids[subject], ids[predicate], ids[object])
+        for subject, predicate, object in triples)
+
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp_path, 'wb') as stream:
+            stream.write(HEADER.pack(
+                MAGIC, VERSION, file_hash(nt_path).encode('ascii'),
+                len(terms), len(encoded), len(blob)))
+            stream.write(uint32_array(offsets).tobytes())
+            stream.write(blob)
+            stream.write(uint32_array(
+                i for triple in encoded for i in triple).tobytes())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class Snapshot(object):
+    '''read-only view over a memory-mapped snapshot file'''
+
+    def __init__(self, path):
+        with open(path, 'rb') as fd:
+            self.mmap = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.version, nt_hash, self.n_terms, self.n_triples,
+         blob_length) = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError('{} is not a snapshot'.format(path))
+        self.nt_hash = nt_hash.decode('ascii')
+        view = memoryview(self.mmap)
+        start = HEADER.size
+        end = start + 4 * (self.n_terms + 1)
+        self.offsets = view[start:end].cast('I')
+        self.blob = view[end:end + blob_length]
+        start = end + blob_length
+        self.spo = view[start:start + 12 * self.n_triples].cast('I')
+
+    def close(self):
+        for name in ('offsets', 'blob', 'spo'):
+            if hasattr(self, name):
+                getattr(self, name).release()
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.n_triples
+
+    def term(self, i):
+        '''N-Triples form of the term with id i'''
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+    def id_of(self, term):
+        '''id of term (in N-Triples form), or None if it is not present'''
+        low, high = 0, self.n_terms
+        while low < high:
+            middle = (low + high) // 2
+            if self.term(middle) < term:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.n_terms and self.term(low) == term:
+            return low
+        return None
+
+    def triple_ids(self, subject=None):
+        '''yields (subject, predicate, object) ids, only for subject
+        (an id) if given'''
+        spo = self.spo
+        start, end = 0, self.n_triples
+        if subject is not None:
+            # the triples are sorted, so those of subject are contiguous
+            low, high = 0, self.n_triples
+            while low < high:
+                middle = (low + high) // 2
+                if spo[3 * middle] < subject:
+                    low = middle + 1
+                else:
+                    high = middle
+            start = end = low
+            while end < self.n_triples and spo[3 * end] == subject:
+                end += 1
+        for i in range(start, end):
+            yield spo[3 * i], spo[3 * i + 1], spo[3 * i + 2]
+
+    def triples(self, subject=None):
+        '''yields triples of terms in N-Triples form, only for subject
+        (in N-Triples form) if given'''
+        if subject is not None:
+            subject = self.id_of(subject)
+            if subject is None:
+                return
+        term = self.term
+        for s, p, o in self.triple_ids(subject):
+            yield term(s), term(p), term(o)
+
+
+def open_snapshot(path, nt_path):
+    '''opens the snapshot at path if it was written from the N-Triples at
+    nt_path as they are now
+    returns None if it is missing, of another version, or stale'''
+    try:
+        snapshot = Snapshot(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    if snapshot.version != VERSION or \
+            snapshot.nt_hash != file_hash(nt_path):
+        snapshot.close()
+        return None
+    return snapshot
+
+
+def load(path, nt_path):
+    '''opens the snapshot at path, first writing it again from the
+    N-Triples at nt_path if it is not current for them'''
+    snapshot = open_snapshot(path, nt_path)
+    if snapshot is None:
+        write(nt_path, path)
+        snapshot = Snapshot(path)
+    return snapshot
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='writes or queries the binary snapshot of gdpr.nt')
+    parser.add_argument(
+        '--nt', default='../deliverables/gdpr.nt', help='path to gdpr.nt')
+    parser.add_argument(
+        '--snapshot', default='../deliverables/gdpr.snapshot',
+        help='path to the snapshot')
+    parser.add_argument(
+        'subjects', nargs='*',
+        help='IRIs (in N-Triples form) to print the triples of')
+    args = parser.parse_args()
+    with load(args.snapshot, args.nt) as snapshot:
+        print('{} terms, {} triples'.format(snapshot.n_terms, len(snapshot)))
+        for subject in args.subjects:
+            for triple in snapshot.triples(subject):
+                print(*triple, '.')
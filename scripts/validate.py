@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+
+# author: Harshvardhan Pandit
+
+# Validates generated N-Triples against the axioms of the GDPRtEXT ontology
+#
+# The ontology (gdpr.owl, from generate_owl.py) declares which properties
+# are functional, and the domain and range of properties. These are read,
+# along with rdfs:subClassOf, and any N-Triples file is then checked in a
+# single pass for:
+#   functional  a subject with more than one value of a functional property
+#   domain      a subject that is not of the domain class of its property
+#   range       an object that is not of the range class of its property
+#   dangling    an IRI in the namespace of the resources (e.g. citation99)
+#               that is the object of a triple but has no triples of its own
+# Since the types of a resource may come after the triples that use it,
+# all checks are decided at the end. What they need is recorded under the
+# resource it is about, in the order of the triples: that it is a subject,
+# the bitmask of the classes (used in a domain or range) that each of its
+# types is, its values of functional properties, the classes the triples
+# that use it require it to be, and the triples it is the object of. Memory
+# is bounded by the number of records kept (buffer), not by the number of
+# triples or resources: when the buffer is full, it is sorted by resource
+# and written to a temporary file as a run, and every FAN_IN runs are merged
+# into one. At the end, the runs are merged (heapq.merge), and the records
+# of each resource are checked together.
+#
+# The ontology is in https://w3id.org/GDPRtEXT#, while the generator uses
+# http://purl.org/adaptcentre/ontologies/GDPRtEXT# for the same terms, so
+# IRIs of the ontology can be aliased to those of the output.
+
+##############################################################################
+import heapq
+import itertools
+import json
+import operator
+import os
+import pickle
+import tempfile
+
+from rdflib import Graph, OWL, RDF, RDFS, URIRef
+from rdflib.util import guess_format
+
+import generate_rdf_pairings as pairings
+import snapshot
+
+ONTOLOGY_NAMESPACE = 'https://w3id.org/GDPRtEXT#'
+ALIASES = {ONTOLOGY_NAMESPACE: str(pairings.GDPRtEXT_URI)}
+KINDS = ('functional', 'domain', 'range', 'dangling')
+RDF_TYPE = RDF.type.n3()
+# number of records a Validator keeps in memory before writing them out
+BUFFER = 100000
+# number of records written to, and read from, a run at once
+BATCH = 1000
+# number of runs merged at once, so that merging reads at most this many
+# batches at a time
+FAN_IN = 16
+# records are ordered by resource, then by the triple they are from
+KEY = operator.itemgetter(0, 1)
+# ranges that are datatypes rather than classes are not checked
+DATATYPE_NAMESPACES = (
+    'http://www.w3.org/2001/XMLSchema#', str(RDFS.Literal))
+
+
+def write_run(records):
+    '''writes the sorted records to a new run, a batch at a time'''
+    run = tempfile.TemporaryFile()
+    try:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == BATCH:
+                pickle.dump(batch, run, pickle.HIGHEST_PROTOCOL)
+                batch = []
+        if batch:
+            pickle.dump(batch, run, pickle.HIGHEST_PROTOCOL)
+        run.seek(0)
+    except BaseException:
+        run.close()
+        raise
+    return run
+
+
+def read_run(run):
+    '''yields the records of run, a batch at a time'''
+    while True:
+        try:
+            batch = pickle.load(run)
+        except EOFError:
+            return
+        yield from batch
+
+
+def namespace(term):
+    '''namespace of the IRI term in N-Triples form, up to # or the last /'''
+    end = max(term.rfind('#'), term.rfind('/'))
+    if not term.startswith('<') or end < 1:
+        return None
+    return term[1:end + 1]
+
+
+class Axioms(object):
+    '''functional properties, domains, ranges, and superclasses, with
+    every IRI in N-Triples form'''
+
+    def __init__(self, graph, aliases=ALIASES):
+        def term(iri):
+            iri = str(iri)
+            for source, target in aliases.items():
+                if iri.startswith(source):
+                    iri = target + iri[len(source):]
+            return URIRef(iri).n3()
+
+        self.functional = {
+            term(p) for p in graph.subjects(RDF.type, OWL.FunctionalProperty)}
+        self.domains, self.ranges = {}, {}
+        for axiom, found in ((RDFS.domain, self.domains),
+                             (RDFS.range, self.ranges)):
+            for p, c in graph.subject_objects(axiom):
+                if not str(c).startswith(DATATYPE_NAMESPACES):
+                    found.setdefault(term(p), set()).add(term(c))
+        parents = {}
+        for c, parent in graph.subject_objects(RDFS.subClassOf):
+            parents.setdefault(term(c), set()).add(term(parent))
+        # each class used in a domain or range is a bit of the class masks
+        required = set().union(*self.domains.values(), *self.ranges.values())
+        self.bits = {c: 1 << i for i, c in enumerate(sorted(required))}
+        self.parents = parents
+        self.masks = {}
+
+    def mask(self, c):
+        '''bits of the classes that c is, or is a subclass of'''
+        if c not in self.masks:
+            mask, seen, stack = 0, set(), [c]
+            while stack:
+                current = stack.pop()
+                if current in seen:
+                    continue
+                seen.add(current)
+                mask |= self.bits.get(current, 0)
+                stack.extend(self.parents.get(current, ()))
+            self.masks[c] = mask
+        return self.masks[c]
+
+
+def load_axioms(path=None, aliases=ALIASES):
+    '''axioms of the ontology at path, or, if None, of generate_owl.py'''
+    if path is None:
+        import generate_owl
+        return Axioms(generate_owl.graph, aliases)
+    g = Graph()
+    g.parse(path, format=guess_format(path) or 'xml')
+    return Axioms(g, aliases)
+
+
+class Validator(object):
+    '''checks triples against axioms as they are fed to it, keeping at most
+    buffer records in memory and the rest in sorted runs on disk'''
+
+    def __init__(self, axioms, examples=5, buffer=BUFFER):
+        self.axioms = axioms
+        self.examples = examples
+        self.buffer = buffer
+        self.triples = 0
+        self.resources = 0
+        # namespaces of the subjects, for dangling IRIs
+        self.namespaces = set()
+        self.subject = None
+        # (resource, number of the triple, tag, ...)
+        self.records = []
+        self.runs = []
+        self.violations = {kind: {} for kind in KINDS}
+        self.found = {kind: [] for kind in KINDS}
+
+    def violation(self, kind, key, example):
+        counts = self.violations[kind]
+        counts[key] = counts.get(key, 0) + 1
+        if len(self.found[kind]) < self.examples:
+            self.found[kind].append(example)
+
+    def record(self, resource, *data):
+        self.records.append((resource, self.triples) + data)
+        if len(self.records) >= self.buffer:
+            self.spill()
+
+    def spill(self):
+        '''writes the records in memory to a new run, merging the runs
+        into one when there are FAN_IN of them'''
+        self.records.sort(key=KEY)
+        self.runs.append(write_run(self.records))
+        self.records = []
+        if len(self.runs) >= FAN_IN:
+            runs, self.runs = self.runs, []
+            try:
+                self.runs.append(write_run(heapq.merge(
+                    *map(read_run, runs), key=KEY)))
+            finally:
+                for run in runs:
+                    run.close()
+
+    def add(self, s, p, o):
+        '''checks the triple of terms in N-Triples form'''
+        axioms = self.axioms
+        self.triples += 1
+        # the triples of a subject are usually together
+        if s != self.subject:
+            self.subject = s
+            self.namespaces.add(namespace(s))
+            self.record(s, 'subject')
+        if p == RDF_TYPE:
+            self.record(s, 'type', axioms.mask(o))
+            return
+        if o.startswith('<'):
+            self.record(o, 'object', s, p)
+        if p in axioms.functional:
+            self.record(s, 'value', p, o)
+        for kind, node, classes in (
+                ('domain', s, axioms.domains.get(p, ())),
+                ('range', o, axioms.ranges.get(p, ()))):
+            for c in classes:
+                self.record(node, 'requires', axioms.bits[c], kind, c, s, p, o)
+
+    def feed(self, path):
+        '''checks the triples in the file at path, which is streamed if it
+        is N-Triples, and parsed with rdflib otherwise'''
+        if guess_format(path) not in (None, 'nt', 'nt11'):
+            g = Graph()
+            g.parse(path, format=guess_format(path))
+            for triple in g:
+                self.add(*(term.n3() for term in triple))
+            return
+        with open(path, encoding='utf-8') as fd:
+            for line in fd:
+                if line.strip():
+                    self.add(*snapshot.parse_nt_line(line))
+
+    def check(self, resource, records):
+        '''checks the records of resource, in the order of the triples'''
+        subject, mask, referenced = False, 0, None
+        values, required = {}, {}
+        for record in records:
+            tag = record[2]
+            if tag == 'subject':
+                subject = True
+            elif tag == 'type':
+                mask |= record[3]
+            elif tag == 'object':
+                if referenced is None:
+                    referenced = record[3:5]
+            elif tag == 'value':
+                p, o = record[3:5]
+                if values.setdefault(p, o) != o:
+                    self.violation('functional', p, (resource, p, o))
+            else:
+                # only the first triple that requires each class
+                required.setdefault(record[3], record[4:])
+        for bit, (kind, c, s, p, o) in required.items():
+            if not mask & bit:
+                self.violation(kind, '{} {}'.format(p, c), (s, p, o))
+        if referenced is not None and not subject and \
+                namespace(resource) in self.namespaces:
+            s, p = referenced
+            self.violation('dangling', p, (s, p, resource))
+        self.resources += subject
+
+    def finish(self):
+        '''decides the checks, and returns the report'''
+        self.namespaces.discard(None)
+        self.records.sort(key=KEY)
+        runs = [read_run(run) for run in self.runs]
+        try:
+            for resource, records in itertools.groupby(
+                    heapq.merge(self.records, *runs, key=KEY),
+                    key=lambda record: record[0]):
+                self.check(resource, records)
+        finally:
+            for run in self.runs:
+                run.close()
+            self.records, self.runs = [], []
+        return {
+            'triples': self.triples,
+            'resources': self.resources,
+            'violations': self.violations,
+            'examples': self.found,
+        }
+
+
+def validate(path, axioms, examples=5, buffer=BUFFER):
+    '''returns the report of validating the triples at path'''
+    validator = Validator(axioms, examples, buffer)
+    validator.feed(path)
+    return validator.finish()
+
+
+def print_report(report):
+    print('{triples} triples, {resources} resources'.format(**report))
+    for kind in KINDS:
+        counts = report['violations'][kind]
+        print('{:<11} {:>6}'.format(kind, sum(counts.values())))
+        for key, count in sorted(counts.items(), key=lambda kv: -kv[1]):
+            print('    {:>6}  {}'.format(count, key))
+        for example in report['examples'][kind]:
+            print('      e.g. {} {} {}'.format(*example)[:160])
+
+
+def count(report):
+    '''total number of violations in report'''
+    return sum(
+        sum(counts.values()) for counts in report['violations'].values())
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+    parser = argparse.ArgumentParser(
+        description='validates N-Triples against the GDPRtEXT ontology')
+    parser.add_argument(
+        'nt', nargs='*', default=['../deliverables/gdpr.nt'],
+        help='N-Triples to validate')
+    parser.add_argument(
+        '--ontology', default='../deliverables/gdpr.owl',
+        help='ontology to read axioms from (default: the one written by '
+        'generate_owl.py, or generated if it does not exist)')
+    parser.add_argument(
+        '--alias', action='append', default=[], metavar='FROM=TO',
+        help='read IRIs of the ontology starting with FROM as starting '
+        'with TO (default: {}={})'.format(*next(iter(ALIASES.items()))))
+    parser.add_argument(
+        '--examples', type=int, default=5,
+        help='number of violations of each kind to print')
+    parser.add_argument(
+        '--json', default=None, help='file to write the report to')
+    parser.add_argument(
+        '--strict', action='store_true',
+        help='exit with an error if there are any violations')
+    args = parser.parse_args()
+
+    aliases = dict(ALIASES)
+    aliases.update(alias.split('=', 1) for alias in args.alias)
+    ontology = args.ontology if os.path.exists(args.ontology) else None
+    axioms = load_axioms(ontology, aliases)
+    total = 0
+    reports = {}
+    for nt_path in args.nt:
+        start = time.perf_counter()
+        report = reports[nt_path] = validate(nt_path, axioms, args.examples)
+        print('{} ({:.3f}s)'.format(nt_path, time.perf_counter() - start))
+        print_report(report)
+        total += count(report)
+    if args.json:
+        with open(args.json, 'w') as fd:
+            json.dump(reports, fd, indent=2)
+    if args.strict and total:
+        sys.exit(1)